@@ -0,0 +1,225 @@
+"""
+Benchmark suite for every pipeline stage at multiple data scales
+
+Generates seeded synthetic surveys (create_synthetic_dataset) at each scale,
+times the public APIs of data_collection, analysis, visualization and
+product_insights, and compares them against stored baselines.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scales 10k,1m --save-baseline
+    python benchmarks/run_benchmarks.py --scales 10k,1m --threshold 0.25
+
+Exits with status 1 when any case is slower than baseline * (1 + threshold),
+or when importing a pipeline module exceeds --import-budget seconds.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(script_dir, '..', 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+DEFAULT_BASELINE = os.path.join(script_dir, 'baselines.json')
+
+# Modules whose cold import time is checked against --import-budget
+IMPORT_CASES = ['data_collection', 'analysis', 'visualization', 'product_insights']
+
+
+def build_cases(df, memo_dir: str) -> List[Tuple[str, Callable]]:
+    """
+    (name, callable) pairs for one dataset; callables close over fresh state
+
+    memo_dir: scratch directory for the memo-writing case
+    """
+    from data_collection import DataCollector, DataCleaner
+    from analysis import PenetrationAnalyzer, HypothesisTester, StatisticalModeler, run_full_analysis
+    from visualization import (DashboardBuilder, HouseholdAdoptionVisualizer,
+                               create_executive_summary_viz)
+    from product_insights import ProductInsightsGenerator, ProductMemoWriter
+
+    cleaner = DataCleaner(DataCollector())
+    analyzer = PenetrationAnalyzer(df)
+    tester = HypothesisTester(df)
+    results = _quiet(run_full_analysis, df)
+    generator = ProductInsightsGenerator(results, df)
+
+    def write_memo():
+        writer = ProductMemoWriter(generator.generate_all_insights(),
+                                   generator.generate_expansion_strategy(),
+                                   generator.generate_merchandising_matrix(),
+                                   generator.generate_feature_prioritization())
+        writer.write_memo(os.path.join(memo_dir, 'product_memo.md'))
+
+    return [
+        ('data_collection.clean_dataset', lambda: cleaner.clean_dataset(df)),
+        ('data_collection.generate_data_quality_report', lambda: cleaner.generate_data_quality_report(df)),
+        ('analysis.calculate_penetration', lambda: analyzer.calculate_penetration()),
+        ('analysis.state_level_penetration', analyzer.state_level_penetration),
+        ('analysis.household_size_penetration', analyzer.household_size_penetration),
+        ('analysis.urban_rural_penetration', analyzer.urban_rural_penetration),
+        ('analysis.internet_penetration', analyzer.internet_penetration),
+        ('analysis.test_h1_household_size_adoption', tester.test_h1_household_size_adoption),
+        ('analysis.test_h2_category_differences', tester.test_h2_category_differences),
+        ('analysis.test_h3_internet_mediation', tester.test_h3_internet_mediation),
+        ('analysis.fit_logistic_model', StatisticalModeler(df).fit_logistic_model),
+        ('visualization.build_full_dashboard', DashboardBuilder(results).build_full_dashboard),
+        ('visualization.create_scatter_with_trendline_binned',
+         lambda: HouseholdAdoptionVisualizer.create_scatter_with_trendline(df, binned=True)),
+        ('visualization.create_executive_summary_viz', lambda: create_executive_summary_viz(results)),
+        ('product_insights.generate_all_insights', generator.generate_all_insights),
+        ('product_insights.generate_state_insights', generator.generate_state_insights),
+        ('product_insights.generate_expansion_strategy', generator.generate_expansion_strategy),
+        ('product_insights.generate_merchandising_matrix', generator.generate_merchandising_matrix),
+        ('product_insights.write_memo', write_memo),
+    ]
+
+
+def time_case(func: Callable, repeats: int) -> float:
+    """Best-of-N wall time in seconds (stdout from the pipeline is suppressed)"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _quiet(func)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_imports() -> Dict[str, float]:
+    """Cold import time of each pipeline module, measured in a fresh interpreter"""
+    timings = {}
+    for module in IMPORT_CASES:
+        code = (f"import sys, time; sys.path.insert(0, {os.path.abspath(src_path)!r}); "
+                f"t = time.perf_counter(); import {module}; print(time.perf_counter() - t)")
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        timings[module] = float(out.stdout.strip().splitlines()[-1])
+    return timings
+
+
+def run_suite(scales: List[str], repeats: int) -> Dict[str, float]:
+    from data_collection import create_synthetic_dataset
+
+    measurements = {}
+    for scale in scales:
+        n = SCALES[scale]
+        print(f"\n📏 Scale {scale} ({n:,} households)")
+        start = time.perf_counter()
+        df = create_synthetic_dataset(n, seed=42)
+        measurements[f'{scale}/data_collection.create_synthetic_dataset'] = time.perf_counter() - start
+
+        # Large scales run once; the smallest gets repeats to damp noise
+        case_repeats = repeats if n <= 100_000 else 1
+        with tempfile.TemporaryDirectory(prefix='bench_memo_') as memo_dir:
+            for name, func in build_cases(df, memo_dir):
+                elapsed = time_case(func, case_repeats)
+                measurements[f'{scale}/{name}'] = elapsed
+                print(f"   {name:<58}{elapsed:>10.4f}s")
+        del df
+
+    return measurements
+
+
+def compare(measurements: Dict[str, float], baselines: Dict[str, float],
+            threshold: float) -> List[str]:
+    """Return the cases that regressed past the threshold"""
+    regressions = []
+    print(f"\n   {'Case':<70}{'Baseline':>10}{'Current':>10}{'Change':>9}")
+    for key, current in measurements.items():
+        base = baselines.get(key)
+        if base is None:
+            print(f"   {key:<70}{'-':>10}{current:>10.4f}{'new':>9}")
+            continue
+        change = (current - base) / base if base > 0 else 0.0
+        flag = ''
+        # Sub-millisecond cases are dominated by timer noise
+        if change > threshold and current - base > 1e-3:
+            regressions.append(key)
+            flag = '  ❌'
+        print(f"   {key:<70}{base:>10.4f}{current:>10.4f}{change:>+8.0%}{flag}")
+    return regressions
+
+
+def _quiet(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Pipeline benchmark suite')
+    parser.add_argument('--scales', default='10k,1m',
+                        help=f'Comma-separated scales from {", ".join(SCALES)}')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Best-of-N repeats for scales up to 100k')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store this run as the new baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown vs baseline (0.25 = 25%%)')
+    parser.add_argument('--import-budget', type=float, default=1.0,
+                        help='Max seconds to import any pipeline module')
+    parser.add_argument('--output', help='Also write this run\'s measurements to a JSON file')
+    args = parser.parse_args(argv)
+
+    scales = [s.strip().lower() for s in args.scales.split(',') if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"Unknown scale(s): {', '.join(unknown)}")
+
+    print("⏱️  Import times")
+    import_times = time_imports()
+    over_budget = []
+    for module, seconds in import_times.items():
+        flag = '' if seconds <= args.import_budget else '  ❌ over budget'
+        if flag:
+            over_budget.append(module)
+        print(f"   import {module:<50}{seconds:>10.3f}s{flag}")
+
+    measurements = run_suite(scales, args.repeats)
+    measurements.update({f'import/{m}': s for m, s in import_times.items()})
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(measurements, f, indent=2)
+
+    if args.save_baseline:
+        baselines = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baselines = json.load(f).get('measurements', {})
+        baselines.update(measurements)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'machine': platform.node(), 'python': platform.python_version(),
+                       'measurements': baselines}, f, indent=2, sort_keys=True)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return 1 if over_budget else 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n⚠️  No baseline at {args.baseline}; run with --save-baseline first")
+        return 1 if over_budget else 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baselines = json.load(f)['measurements']
+    regressions = compare(measurements, baselines, args.threshold)
+
+    if regressions or over_budget:
+        print(f"\n❌ {len(regressions)} regression(s), {len(over_budget)} import budget breach(es)")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
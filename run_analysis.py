@@ -6,10 +6,21 @@ This script:
 2. Runs all analyses
 3. Creates visualizations
 4. Generates product memo and decision slide
+5. Appends all result tables to the local SQLite warehouse and reports
+   significant changes since the previous comparable run
+
+Stages can be selected or skipped, and upstream work can be reused from a
+results snapshot, e.g. a nightly memo refresh without analysis or charts:
+
+    python run_analysis.py --save-snapshot outputs/results.pkl
+    python run_analysis.py --stages memo --snapshot outputs/results.pkl
 """
 
 import sys
 import os
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 # Add src to path for imports
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,99 +28,555 @@ src_path = os.path.join(script_dir, 'src')
 if src_path not in sys.path:
     sys.path.insert(0, src_path)
 
-import pandas as pd
-from data_collection import create_sample_dataset, DataCollector, DataCleaner  # type: ignore
-from analysis import run_full_analysis  # type: ignore
-from visualization import DashboardBuilder, create_executive_summary_viz  # type: ignore
-from product_insights import ProductInsightsGenerator, ProductMemoWriter  # type: ignore
+# Stage modules are imported inside the stage functions, so heavy libraries
+# (scipy, sklearn, plotly) only load when the stage that needs them runs
 
-def main():
-    print("="*80)
-    print(" INDIA HOUSEHOLD STRUCTURE & E-COMMERCE ANALYSIS")
-    print(" Product Discovery for Quick-Commerce")
-    print("="*80)
-    
-    # Step 1: Load or create data
-    print("\n📊 Step 1: Loading Data...")
-    data_path = 'data/sample_hces_data.csv'
-    
-    if os.path.exists(data_path):
+STAGES = ['load', 'analyze', 'visualize', 'insights', 'memo', 'export']
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='India household structure & e-commerce analysis pipeline'
+    )
+    parser.add_argument('--data', default='data/sample_hces_data.csv',
+                        help='Household-level CSV/Excel input (generated if missing), '
+                             'Parquet file or glob (scanned in place with --backend duckdb), '
+                             'or a partitioned dataset directory (see src/partitions.py)')
+    parser.add_argument('--states',
+                        help='Comma-separated states to analyse (a partitioned --data '
+                             'directory reads only these partitions)')
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f'Comma-separated stages to run (default: all of {",".join(STAGES)})')
+    parser.add_argument('--skip', default='',
+                        help='Comma-separated stages to skip')
+    parser.add_argument('--snapshot',
+                        help='Reuse analysis results (and insights, if present) from this snapshot')
+    parser.add_argument('--save-snapshot',
+                        help='Write a results snapshot for later --snapshot runs')
+    parser.add_argument('--save-cube',
+                        help='Write the aggregate cube (for dashboard_server.py --cube)')
+    parser.add_argument('--preview', nargs='?', type=preview_fraction, const=0.01, metavar='FRACTION',
+                        help='Fast preview: analyse a stratified State x Urban subsample '
+                             '(default 1%%) with sampling-error bounds; omit for the full run')
+    parser.add_argument('--output-dir', default='outputs')
+    parser.add_argument('--state-memos', action='store_true',
+                        help='Also render one memo per state into <output-dir>/state_memos '
+                             '(unchanged memos are skipped)')
+    parser.add_argument('--viz-dir', default='visualizations')
+    parser.add_argument('--warehouse', default='outputs/warehouse.sqlite',
+                        help='SQLite warehouse the export stage appends this run to '
+                             '(see src/warehouse.py)')
+    parser.add_argument('--run-label', help='Label stored with the exported run')
+    parser.add_argument('--store',
+                        help='Shared artifact store directory (e.g. .artifacts): analysis and '
+                             'insight results, charts and memos are cached by input + code '
+                             'digest, and concurrent runs on the same inputs compute them once')
+    parser.add_argument('--backend', choices=['pandas', 'duckdb'], default='pandas',
+                        help='Engine for penetration and hypothesis aggregations '
+                             '(duckdb is optional: pip install duckdb)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Worker processes; >1 renders charts alongside insights + memo')
+    parser.add_argument('--profile',
+                        help='Record per-stage time/memory to this JSON file '
+                             '(a Chrome trace is written next to it as *.trace.json)')
+    parser.add_argument('--profile-memory', action=argparse.BooleanOptionalAction, default=True,
+                        help='Track peak traced memory with tracemalloc while profiling')
+    args = parser.parse_args(argv)
+
+    requested = _parse_stage_list(args.stages)
+    skipped = _parse_stage_list(args.skip)
+    args.stages = [s for s in STAGES if s in requested and s not in skipped]
+    args.states = [s.strip() for s in args.states.split(',') if s.strip()] if args.states else None
+    return args
+
+
+def preview_fraction(value) -> float:
+    """Sampling fraction in (0, 1] (argparse type; also checks manifest values)"""
+    try:
+        fraction = float(value)
+    except (TypeError, ValueError):
+        raise argparse.ArgumentTypeError(f"invalid fraction: {value!r}")
+    if not 0 < fraction <= 1:
+        raise argparse.ArgumentTypeError(f"fraction must be in (0, 1], got {value}")
+    return fraction
+
+
+def _parse_stage_list(value: str) -> list:
+    stages = [s.strip() for s in value.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(unknown)}. Choose from {', '.join(STAGES)}")
+    return stages
+
+
+def is_parquet_source(data_path: str) -> bool:
+    """A Parquet file or glob (e.g. data/hces/*.parquet)"""
+    return not os.path.isdir(data_path) and data_path.endswith('.parquet')
+
+
+def data_digest(data_path: str) -> str | None:
+    """Content digest of the input file(s); None when nothing exists yet"""
+    import glob
+    import hashlib
+    from artifact_store import file_digest  # type: ignore
+
+    if os.path.isfile(data_path):
+        return file_digest(data_path)
+    if os.path.isdir(data_path):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(data_path)
+                       for name in names)
+    else:
+        paths = sorted(glob.glob(data_path))
+    if not paths or not all(os.path.isfile(p) for p in paths):
+        return None
+    base = os.path.dirname(data_path) or '.'
+    digests = '\n'.join(f"{os.path.relpath(p, base)} {file_digest(p)}" for p in paths)
+    return hashlib.sha256(digests.encode()).hexdigest()
+
+
+def stage_load(data_path: str, states: list | None = None, jobs: int = 1):
+    import glob
+    import pandas as pd
+    from data_collection import create_sample_dataset  # type: ignore
+
+    if os.path.isdir(data_path):
+        from partitions import read_partitioned  # type: ignore
+        print(f"   Loading partitioned dataset from {data_path}")
+        df = read_partitioned(data_path, filters={'State': states} if states else None, jobs=jobs)
+    elif is_parquet_source(data_path) and glob.glob(data_path):
+        from backends import read_parquet  # type: ignore
+        print(f"   Loading Parquet data from {data_path}")
+        df = read_parquet(sorted(glob.glob(data_path)))
+    elif os.path.exists(data_path):
         print(f"   Loading existing data from {data_path}")
         df = pd.read_csv(data_path)
     else:
         print("   Generating new sample dataset...")
         df = create_sample_dataset()
-        os.makedirs('data', exist_ok=True)
+        os.makedirs(os.path.dirname(data_path) or '.', exist_ok=True)
         df.to_csv(data_path, index=False)
-    
+
+    if states and not os.path.isdir(data_path):
+        df = df[df['State'].isin(states)].reset_index(drop=True)
+    if df.empty:
+        raise SystemExit(f"No household records for states: {', '.join(states or [])}")
+
     print(f"   ✅ Loaded {len(df):,} household records from {df['State'].nunique()} states")
-    
-    # Step 2: Run analysis
-    print("\n🔬 Step 2: Running Analysis...")
-    analysis_results = run_full_analysis(df)
-    
-    # Step 3: Create visualizations
-    print("\n📈 Step 3: Creating Visualizations...")
+    return df
+
+
+def stage_analyze(df, backend: str = 'pandas', preview=None, source: str | None = None,
+                  states: list | None = None):
+    """source: Parquet path/glob the backend scans in place (df is None then)"""
+    from analysis import run_full_analysis  # type: ignore
+
+    engine = None
+    if source is not None:
+        from backends import DuckDBBackend  # type: ignore
+        engine = DuckDBBackend(source, where={'State': states} if states else None)
+        print(f"   Scanning {source} in place with the {backend} backend "
+              f"({engine.count():,} households)")
+        if engine.count() == 0:
+            raise SystemExit(f"No household records for states: {', '.join(states or [])}")
+    elif backend != 'pandas':
+        from backends import make_backend  # type: ignore
+        engine = make_backend(df, backend)
+        print(f"   Using the {backend} backend for penetration and hypothesis queries")
+    if preview is not None:
+        from preview import run_preview_analysis  # type: ignore
+        return run_preview_analysis(df, preview, backend=engine)
+    return run_full_analysis(df, backend=engine)
+
+
+def stage_visualize(analysis_results: dict, viz_dir: str):
+    from artifact_store import atomic_write_text  # type: ignore
+    from visualization import DashboardBuilder, create_executive_summary_viz  # type: ignore
+
     dashboard = DashboardBuilder(analysis_results)
-    
-    os.makedirs('visualizations', exist_ok=True)
-    dashboard.save_all_figures('visualizations')
-    
+
+    os.makedirs(viz_dir, exist_ok=True)
+    figures = dashboard.save_all_figures(viz_dir)
+
     # Executive summary
     exec_summary = create_executive_summary_viz(analysis_results)
-    exec_summary.write_html('visualizations/executive_summary.html')
+    atomic_write_text(f'{viz_dir}/executive_summary.html', exec_summary.to_html(), suffix='.html')
     print("   ✅ Saved executive_summary.html")
-    
-    # Step 4: Generate product insights
-    print("\n💡 Step 4: Generating Product Insights...")
+
+    # Single-file dashboard with compact encoded payload
+    dashboard.write_dashboard(f'{viz_dir}/dashboard.html',
+                              extra_figures={'executive_summary': exec_summary},
+                              figures=figures)
+
+
+def stage_insights(analysis_results: dict, df=None) -> dict:
+    from product_insights import ProductInsightsGenerator  # type: ignore
+
     insight_gen = ProductInsightsGenerator(analysis_results, df)
-    
+
     insights = insight_gen.generate_all_insights()
     print(f"   ✅ Generated {len(insights)} key insights")
-    
+
     expansion_strategy = insight_gen.generate_expansion_strategy()
     print(f"   ✅ Created expansion strategy with {len(expansion_strategy.get('tier_1_states', []))} tier-1 states")
-    
+
+    sensitivity = insight_gen.expansion_sensitivity()
+    if sensitivity:
+        summary = sensitivity['summary']
+        stable = (summary[['P_Tier_1', 'P_Tier_2', 'P_Tier_3']].max(axis=1) >= 0.8).sum()
+        print(f"   ✅ Tier sensitivity: {stable}/{len(summary)} states keep their tier in ≥80% of scenarios")
+
     merchandising_matrix = insight_gen.generate_merchandising_matrix()
     print(f"   ✅ Built merchandising matrix with {len(merchandising_matrix)} categories")
-    
+
     features = insight_gen.generate_feature_prioritization()
     print(f"   ✅ Prioritized {len(features)} product features")
-    
-    # Step 5: Write product memo
-    print("\n📝 Step 5: Writing Product Memo...")
-    os.makedirs('outputs', exist_ok=True)
-    
-    memo_writer = ProductMemoWriter(insights, expansion_strategy, merchandising_matrix, features)
-    memo_writer.write_memo('outputs/product_memo.md')
-    
-    # Step 6: Summary
+
+    # Per-state insight sets need household data (not available from a snapshot)
+    state_insights = None
+    regional_merchandising = None
+    if df is not None:
+        state_insights = insight_gen.generate_state_insights()
+        print(f"   ✅ Generated insight sets for {len(state_insights)} states")
+        regional_merchandising = insight_gen.generate_regional_merchandising()
+        print(f"   ✅ Built regional merchandising table with {len(regional_merchandising):,} cells")
+
+    return {
+        'insights': insights,
+        'expansion_strategy': expansion_strategy,
+        'expansion_sensitivity': sensitivity,
+        'merchandising': merchandising_matrix,
+        'features': features,
+        'state_insights': state_insights,
+        'regional_merchandising': regional_merchandising
+    }
+
+
+def stage_memo(bundle: dict, output_dir: str, state_memos: bool = False, jobs: int = 1):
+    from product_insights import ProductMemoWriter  # type: ignore
+
+    os.makedirs(output_dir, exist_ok=True)
+    memo_writer = ProductMemoWriter(bundle['insights'], bundle['expansion_strategy'],
+                                    bundle['merchandising'], bundle['features'])
+    memo_writer.write_memo(f'{output_dir}/product_memo.md')
+
+    if state_memos:
+        if not bundle.get('state_insights'):
+            print("   ⚠️  No per-state insights available (run insights with household data)")
+            return
+        from memo_engine import MemoBatchRenderer, state_memo_variants  # type: ignore
+        variants = state_memo_variants(bundle['state_insights'], bundle['expansion_strategy'],
+                                       bundle['merchandising'], bundle['features'])
+        MemoBatchRenderer(f'{output_dir}/state_memos', jobs=jobs).render_all(variants)
+
+
+def stage_export(analysis_results: dict, bundle: dict | None, df, warehouse_path: str,
+                 metadata: dict, output_dir: str = 'outputs') -> str:
+    from warehouse import Warehouse  # type: ignore
+
+    cube = None
+    if df is not None:
+        from aggregates import AggregateCube  # type: ignore
+        cube = AggregateCube.from_dataframe(df)
+    else:
+        print("   ⚠️  No household data in memory (snapshot or in-place scan): "
+              "cube sufficient statistics not exported")
+
+    with Warehouse(warehouse_path) as warehouse:
+        run_id = warehouse.export_run(analysis_results, bundle, cube, metadata)
+        print(f"   ✅ Exported run {run_id} to {warehouse_path}")
+        drift, base_run = (None, None)
+        if cube is not None:
+            from drift import detect_run_drift  # type: ignore
+            drift, base_run = detect_run_drift(warehouse, run_id)
+
+    if drift is not None:
+        from drift import drift_report  # type: ignore
+        from artifact_store import atomic_write_text  # type: ignore
+        os.makedirs(output_dir, exist_ok=True)
+        atomic_write_text(f'{output_dir}/drift_report.md', drift_report(drift, base_run, run_id),
+                          suffix='.md')
+        print(f"   ✅ Drift vs {base_run}: {int(drift['Changed'].sum())} of "
+              f"{int(drift['P_Value'].notna().sum()):,} cells changed significantly "
+              f"({output_dir}/drift_report.md)")
+    return run_id
+
+
+def render_memo(bundle: dict, state_memos: bool, jobs: int, output_dir: str):
+    # stage_memo with the output directory last, for publish_rendered
+    stage_memo(bundle, output_dir, state_memos, jobs)
+
+
+def publish_rendered(store_root: str, stage: str, key: str, output_dir: str, func, *func_args) -> bool:
+    """
+    Render a stage's files once per key into the artifact store, then publish
+    them to output_dir; func(*func_args, directory) writes the files.
+    Returns True if this call rendered (False if another run's render was reused).
+    """
+    from artifact_store import ArtifactStore  # type: ignore
+
+    store = ArtifactStore(store_root)
+    rendered = []
+
+    def render(directory):
+        rendered.append(stage)
+        func(*func_args, directory)
+
+    manifest = store.cached_files(stage, key, render)
+    changed = store.publish_files(manifest, output_dir)
+    print(f"   {'✅ Rendered' if rendered else '♻️  Reused'} {len(manifest)} {stage} files "
+          f"({changed} updated in {output_dir})")
+    return bool(rendered)
+
+
+def _print_timing_table(timings: list):
+    print("\n⏱️  Stage Timings:")
+    print(f"   {'Stage':<12}{'Status':<12}{'Seconds':>10}")
+    print(f"   {'-' * 34}")
+    for stage, status, seconds in timings:
+        elapsed = f"{seconds:.2f}" if seconds is not None else '-'
+        print(f"   {stage:<12}{status:<12}{elapsed:>10}")
+    total = sum(s for _, _, s in timings if s is not None)
+    print(f"   {'-' * 34}")
+    print(f"   {'total':<24}{total:>10.2f}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("="*80)
+    print(" INDIA HOUSEHOLD STRUCTURE & E-COMMERCE ANALYSIS")
+    print(" Product Discovery for Quick-Commerce")
+    print("="*80)
+
+    import pandas as pd
+    from profiling import enable_profiling, disable_profiling, profile_stage  # type: ignore
+
+    if args.profile:
+        enable_profiling(memory=args.profile_memory)
+
+    stages = list(args.stages)
+    timings = []
+    df = None
+    analysis_results = None
+    bundle = None
+    preview_design = None
+
+    if args.snapshot:
+        snapshot = pd.read_pickle(args.snapshot)
+        analysis_results = snapshot['analysis_results']
+        bundle = snapshot.get('insights')
+        print(f"\n♻️  Reusing results snapshot {args.snapshot}")
+
+    # Resolve upstream dependencies the snapshot doesn't already cover
+    if 'memo' in stages and bundle is None and 'insights' not in stages:
+        stages.append('insights')
+    if analysis_results is None and any(s in stages for s in ('visualize', 'insights', 'export')):
+        stages.extend(s for s in ('load', 'analyze') if s not in stages)
+    if analysis_results is None and 'analyze' in stages and 'load' not in stages:
+        stages.append('load')
+    if args.save_cube and 'load' not in stages:
+        stages.append('load')
+    stages = [s for s in STAGES if s in stages]
+
+    store = None
+    if args.store:
+        from artifact_store import ArtifactStore  # type: ignore
+        store = ArtifactStore(args.store)
+    run_key = None
+
+    def run(stage, func, *func_args):
+        start = time.perf_counter()
+        with profile_stage(stage):
+            result = func(*func_args)
+        timings.append((stage, 'ran', time.perf_counter() - start))
+        return result
+
+    def run_cached(stage, func, *func_args):
+        # Same inputs + same code -> reuse (or wait for) another run's result
+        if store is None or run_key is None:
+            return run(stage, func, *func_args)
+        start = time.perf_counter()
+        computed = []
+
+        def compute():
+            computed.append(stage)
+            return func(*func_args)
+
+        with profile_stage(stage):
+            result = store.cached(stage, run_key, compute)
+        timings.append((stage, 'ran' if computed else 'cached', time.perf_counter() - start))
+        if not computed:
+            print(f"   ♻️  Reused cached {stage} results from {args.store}")
+        return result
+
+    def run_rendered(stage, key, output_dir, func, *func_args):
+        # Rendered outputs: content-addressed in the store, published from there
+        if store is None or run_key is None:
+            return run(stage, func, *func_args, output_dir)
+        start = time.perf_counter()
+        with profile_stage(stage):
+            rendered = publish_rendered(args.store, stage, key, output_dir, func, *func_args)
+        timings.append((stage, 'ran' if rendered else 'cached', time.perf_counter() - start))
+
+    # --backend duckdb queries a Parquet input where it lies instead of loading it
+    scan_source = None
+    if args.backend == 'duckdb' and is_parquet_source(args.data) and 'load' in stages:
+        if args.preview is not None or args.save_cube:
+            raise SystemExit("--preview and --save-cube need household rows in memory; "
+                             "use --backend pandas for this Parquet input")
+        scan_source = args.data
+
+    # Step 1: Load or create data
+    if scan_source is not None:
+        print("\n📊 Step 1: Loading Data...")
+        print("   Parquet input is scanned in place by DuckDB; rows are not loaded")
+        timings.append(('load', 'in place', None))
+        if store is not None:
+            from artifact_store import code_version  # type: ignore
+            run_key = store.key(data_digest(args.data), code_version(), states=args.states,
+                                preview=args.preview, backend=args.backend)
+    elif 'load' in stages:
+        print("\n📊 Step 1: Loading Data...")
+        df = run('load', stage_load, args.data, args.states, args.jobs)
+        if args.save_cube:
+            from aggregates import AggregateCube  # type: ignore
+            AggregateCube.from_dataframe(df).save(args.save_cube)
+            print(f"   ✅ Saved aggregate cube to {args.save_cube}")
+        if args.preview is not None:
+            from preview import stratified_sample  # type: ignore
+            df, preview_design = stratified_sample(df, fraction=args.preview)
+        if store is not None:
+            from artifact_store import code_version  # type: ignore
+            run_key = store.key(data_digest(args.data), code_version(), states=args.states,
+                                preview=args.preview, backend=args.backend)
+
+    # Step 2: Run analysis
+    if 'analyze' in stages:
+        print("\n🔬 Step 2: Running Analysis...")
+        analysis_results = run_cached('analyze', stage_analyze, df, args.backend, preview_design,
+                                      scan_source, args.states)
+    elif analysis_results is not None:
+        timings.append(('analyze', 'snapshot', None))
+
+    # Steps 3-5: charts are independent of insights + memo, so with --jobs > 1
+    # they render in a worker process while the main process writes the memo
+    pool = None
+    chart_future = None
+    chart_start = None
+    if 'visualize' in stages:
+        print("\n📈 Step 3: Creating Visualizations...")
+        if args.jobs > 1 and ('insights' in stages or 'memo' in stages):
+            pool = ProcessPoolExecutor(max_workers=min(args.jobs, 2))
+            chart_start = time.perf_counter()
+            if store is not None and run_key is not None:
+                chart_future = pool.submit(publish_rendered, args.store, 'visualize', run_key,
+                                           args.viz_dir, stage_visualize, analysis_results)
+            else:
+                chart_future = pool.submit(stage_visualize, analysis_results, args.viz_dir)
+            print("   (rendering in a worker process)")
+        else:
+            run_rendered('visualize', run_key, args.viz_dir, stage_visualize, analysis_results)
+
+    if 'insights' in stages:
+        print("\n💡 Step 4: Generating Product Insights...")
+        bundle = run_cached('insights', stage_insights, analysis_results, df)
+    elif bundle is not None and 'memo' in stages:
+        timings.append(('insights', 'snapshot', None))
+
+    if 'memo' in stages:
+        print("\n📝 Step 5: Writing Product Memo...")
+        if store is not None and run_key is not None:
+            # The memo is dated, so a cached render is reused on the same day only
+            from datetime import date
+            memo_key = store.key(run_key, state_memos=args.state_memos, date=date.today().isoformat())
+            run_rendered('memo', memo_key, args.output_dir, render_memo, bundle, args.state_memos,
+                         args.jobs)
+        else:
+            run('memo', stage_memo, bundle, args.output_dir, args.state_memos, args.jobs)
+
+    if 'export' in stages:
+        print("\n🗄️  Step 6: Exporting Results to Warehouse...")
+        from artifact_store import code_version  # type: ignore
+        households = None
+        if preview_design is not None:
+            households = preview_design.full_rows
+        elif df is not None:
+            households = len(df)
+        elif scan_source is not None:
+            households = int(analysis_results['overall_penetration']['Sample_Size'].iloc[0])
+        metadata = {
+            'label': args.run_label,
+            'data_path': args.data,
+            'data_digest': data_digest(args.data),
+            'code_version': code_version(),
+            'states': args.states,
+            'preview': args.preview,
+            'backend': args.backend,
+            'households': households
+        }
+        run('export', stage_export, analysis_results, bundle, df, args.warehouse, metadata,
+            args.output_dir)
+
+    if chart_future is not None:
+        chart_future.result()
+        timings.append(('visualize', 'parallel', time.perf_counter() - chart_start))
+        pool.shutdown()
+
+    for stage in STAGES:
+        if stage not in [t[0] for t in timings]:
+            timings.append((stage, 'skipped', None))
+    timings.sort(key=lambda t: STAGES.index(t[0]))
+
+    if args.save_snapshot and analysis_results is not None:
+        os.makedirs(os.path.dirname(args.save_snapshot) or '.', exist_ok=True)
+        pd.to_pickle({'analysis_results': analysis_results, 'insights': bundle},
+                     args.save_snapshot)
+        print(f"\n💾 Results snapshot saved to {args.save_snapshot}")
+
+    # Step 7: Summary
     print("\n" + "="*80)
     print(" ✅ ANALYSIS COMPLETE!")
     print("="*80)
     print("\n📦 Deliverables Generated:")
-    print("   1. Product Memo: outputs/product_memo.md")
-    print("   2. Product Decision Slide: outputs/product_decision_slide.md")
-    print("   3. Visualizations: visualizations/ (HTML files)")
-    print("   4. Analysis notebook: notebooks/main_analysis.ipynb")
-    print("\n🎯 Next Steps:")
-    print("   - Review product memo with leadership")
-    print("   - Present decision slide in strategy meeting")
-    print("   - Prioritize experiments from feature list")
-    print("   - Validate insights with real customer data")
-    
-    print("\n📊 Key Findings Summary:")
-    for i, insight in enumerate(insights[:3], 1):
-        print(f"   {i}. {insight['insight']}")
-    
+    if 'memo' in stages:
+        print(f"   - Product Memo: {args.output_dir}/product_memo.md")
+        if args.state_memos:
+            print(f"   - State Memos: {args.output_dir}/state_memos/")
+    if 'export' in stages:
+        print(f"   - Warehouse: {args.warehouse} (run history, one row set per run_id)")
+        print(f"   - Drift Report: {args.output_dir}/drift_report.md (when an earlier comparable run exists)")
+    if 'visualize' in stages:
+        print(f"   - Visualizations: {args.viz_dir}/ (HTML files, combined in dashboard.html)")
+    print("   - Analysis notebook: notebooks/main_analysis.ipynb")
+
+    if bundle is not None:
+        print("\n🎯 Next Steps:")
+        print("   - Review product memo with leadership")
+        print("   - Present decision slide in strategy meeting")
+        print("   - Prioritize experiments from feature list")
+        print("   - Validate insights with real customer data")
+
+        print("\n📊 Key Findings Summary:")
+        for i, insight in enumerate(bundle['insights'][:3], 1):
+            print(f"   {i}. {insight['insight']}")
+
+    _print_timing_table(timings)
+
+    profiler = disable_profiling()
+    if profiler is not None:
+        profiler.print_summary()
+        profiler.write_json(args.profile)
+        profiler.write_chrome_trace(os.path.splitext(args.profile)[0] + '.trace.json')
+
     print("\n" + "="*80)
-    
+
+    bundle = bundle or {}
     return {
         'analysis_results': analysis_results,
-        'insights': insights,
-        'expansion_strategy': expansion_strategy,
-        'merchandising': merchandising_matrix,
-        'features': features
+        'insights': bundle.get('insights'),
+        'expansion_strategy': bundle.get('expansion_strategy'),
+        'merchandising': bundle.get('merchandising'),
+        'features': bundle.get('features')
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,303 @@
+"""
+Batch runner - the analysis pipeline over many datasets in one warm process pool
+
+Client panels, scenario variants and per-quarter extracts run through the
+same stages as run_analysis.py (load -> analyze -> insights, optionally memo
+and dashboard), but:
+1. Worker processes import the pipeline modules (pandas, scipy, sklearn,
+   plotly, the compiled memo templates) once and reuse them for every
+   dataset they pick up
+2. plotly.js is written once to <output-dir>/plotly.min.js and every
+   dataset's dashboard links it instead of embedding a 3.5 MB copy
+3. Each worker's console output goes to <output-dir>/<name>/run.log, and a
+   failing dataset is reported in the table instead of stopping the batch
+4. One comparison table (overall penetration, H1-H3 statistics, model
+   accuracy and odds ratios, tier-1 states) is written for all datasets as
+   <output-dir>/batch_comparison.csv and .md
+
+The manifest is JSON (a list of datasets, or {"defaults": {...}, "datasets":
+[...]}) or CSV with one dataset per row. Fields: name, data (required),
+states (list or comma-separated), preview (fraction), backend.
+
+    [{"name": "panel_a", "data": "data/panel_a.csv"},
+     {"name": "q3_south", "data": "data/hces_partitioned", "states": "Kerala,Tamil Nadu"},
+     {"name": "quick_look", "data": "data/panel_b.csv", "preview": 0.05}]
+
+Usage:
+    python run_batch.py manifest.json --jobs 4
+    python run_batch.py manifest.csv --memos --charts --store .artifacts
+"""
+
+import sys
+import os
+import argparse
+import contextlib
+import io
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(script_dir, 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from run_analysis import (data_digest, preview_fraction, stage_load, stage_analyze,  # noqa: E402
+                          stage_insights, stage_memo)
+
+MANIFEST_FIELDS = ['name', 'data', 'states', 'preview', 'backend']
+
+SHARED_PLOTLYJS = 'plotly.min.js'
+
+
+def load_manifest(path: str) -> list:
+    """Dataset entries from a JSON or CSV manifest (relative data paths resolve against it)"""
+    if path.endswith('.csv'):
+        import pandas as pd
+        table = pd.read_csv(path, dtype=str, keep_default_na=False)
+        entries = [{k: v for k, v in row.items() if v != ''} for row in table.to_dict(orient='records')]
+        defaults = {}
+    else:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict):
+            defaults, entries = manifest.get('defaults', {}), manifest.get('datasets', [])
+        else:
+            defaults, entries = {}, manifest
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    datasets, names = [], set()
+    for i, entry in enumerate(entries):
+        entry = {**defaults, **entry}
+        unknown = [k for k in entry if k not in MANIFEST_FIELDS]
+        if unknown:
+            raise SystemExit(f"Manifest entry {i + 1}: unknown field(s) {', '.join(unknown)}")
+        if 'data' not in entry:
+            raise SystemExit(f"Manifest entry {i + 1}: 'data' is required")
+
+        data = entry['data'] if os.path.isabs(entry['data']) else os.path.join(base_dir, entry['data'])
+        name = entry.get('name') or os.path.splitext(os.path.basename(entry['data'].rstrip('/')))[0]
+        if name in names:
+            raise SystemExit(f"Manifest entry {i + 1}: duplicate dataset name '{name}'")
+        names.add(name)
+
+        states = entry.get('states')
+        if isinstance(states, str):
+            states = [s.strip() for s in states.split(',') if s.strip()]
+        preview = entry.get('preview')
+        if preview in (None, ''):
+            preview = None
+        else:
+            try:
+                preview = preview_fraction(preview)
+            except argparse.ArgumentTypeError as exc:
+                raise SystemExit(f"Manifest entry {i + 1}: preview {exc}")
+        datasets.append({
+            'name': name,
+            'data': data,
+            'states': states or None,
+            'preview': preview,
+            'backend': entry.get('backend') or 'pandas'
+        })
+    return datasets
+
+
+def warm_worker(charts: bool = False):
+    """Process pool initializer: import the pipeline once per worker"""
+    import scipy.stats  # noqa: F401
+    import sklearn.linear_model  # noqa: F401
+    import analysis  # type: ignore # noqa: F401
+    import preview  # type: ignore # noqa: F401
+    import product_insights  # type: ignore # noqa: F401
+    import memo_engine  # type: ignore # noqa: F401
+    if charts:
+        import visualization  # type: ignore # noqa: F401
+
+
+def run_dataset(dataset: dict, output_dir: str, memos: bool = False, charts: bool = False,
+                store_dir: str | None = None) -> dict:
+    """Run one manifest entry; returns its comparison row (errors are captured in the row)"""
+    dataset_dir = os.path.join(output_dir, dataset['name'])
+    os.makedirs(dataset_dir, exist_ok=True)
+    log = io.StringIO()
+    start = time.perf_counter()
+    row = {'Dataset': dataset['name']}
+
+    try:
+        with contextlib.redirect_stdout(log):
+            results, bundle, df = _run_stages(dataset, dataset_dir, memos, charts, store_dir)
+        row.update(summarize_run(results, bundle, len(df)))
+        row['Status'] = 'ok'
+    except (Exception, SystemExit) as exc:
+        log.write(traceback.format_exc())
+        row['Status'] = f'failed: {type(exc).__name__}: {exc}'
+    row['Seconds'] = round(time.perf_counter() - start, 2)
+    row['Worker'] = os.getpid()
+
+    with open(os.path.join(dataset_dir, 'run.log'), 'w', encoding='utf-8') as f:
+        f.write(log.getvalue())
+    return row
+
+
+def _run_stages(dataset: dict, dataset_dir: str, memos: bool, charts: bool,
+                store_dir: str | None):
+    digest = data_digest(dataset['data'])
+    if digest is None:
+        # run_analysis.py generates sample data for a missing path; a batch shouldn't
+        raise FileNotFoundError(dataset['data'])
+    df = stage_load(dataset['data'], dataset['states'])
+    design = None
+    if dataset['preview'] is not None:
+        from preview import stratified_sample  # type: ignore
+        df, design = stratified_sample(df, fraction=dataset['preview'])
+
+    if store_dir:
+        # Same key as run_analysis.py --store, so batch and single runs share results
+        from artifact_store import ArtifactStore, code_version  # type: ignore
+        store = ArtifactStore(store_dir)
+        key = store.key(digest, code_version(), states=dataset['states'],
+                        preview=dataset['preview'], backend=dataset['backend'])
+        results = store.cached('analyze', key,
+                               lambda: stage_analyze(df, dataset['backend'], design))
+        bundle = store.cached('insights', key, lambda: stage_insights(results, df))
+    else:
+        results = stage_analyze(df, dataset['backend'], design)
+        bundle = stage_insights(results, df)
+
+    if memos:
+        stage_memo(bundle, dataset_dir)
+    if charts:
+        from visualization import DashboardBuilder  # type: ignore
+        DashboardBuilder(results).write_dashboard(os.path.join(dataset_dir, 'dashboard.html'),
+                                                  include_plotlyjs=f'../{SHARED_PLOTLYJS}')
+    return results, bundle, df
+
+
+def summarize_run(results: dict, bundle: dict, households: int) -> dict:
+    """One comparison-table row from analysis results + insight bundle"""
+    h1, h3, model = results.get('h1', {}), results.get('h3', {}), results.get('model', {})
+    row = {
+        'Households': households,
+        'States': len(results['state_penetration']),
+        'Overall_Penetration_%': float(results['overall_penetration']['Penetration_%'].iloc[0]),
+    }
+    if 'preview' in results:
+        row['Overall_Margin_%'] = float(results['preview']['overall_penetration']['Margin_%'].iloc[0])
+    row.update({
+        'H1_Correlation': h1.get('correlation'),
+        'H1_p_value': h1.get('correlation_p_value'),
+        'H1_Chi_Square_p_value': h1.get('chi_square_p_value'),
+        'H3_Correlation_With_Internet': h3.get('correlation_with_internet'),
+        'H3_Correlation_Without_Internet': h3.get('correlation_without_internet'),
+        'Model_Accuracy': model.get('accuracy'),
+    })
+    for feature, odds in model.get('odds_ratios', {}).items():
+        row[f'OR_{feature}'] = float(odds)
+
+    skew = results.get('h2', {}).get('category_skew_index', {})
+    if skew:
+        # Category leaning furthest towards any one household type
+        category, segments = max(skew.items(), key=lambda kv: max(abs(v - 1) for v in kv[1].values()))
+        row['Most_Skewed_Category'] = category
+    row['Tier_1_States'] = ', '.join(bundle['expansion_strategy'].get('tier_1_states', []))
+    return row
+
+
+def comparison_table(rows: list, order: list):
+    """Rows in manifest order, with penetration deltas against the first dataset"""
+    import pandas as pd
+
+    table = pd.DataFrame(rows).set_index('Dataset').reindex(order).reset_index()
+    if 'Overall_Penetration_%' in table.columns:
+        baseline = table['Overall_Penetration_%'].iloc[0]
+        table.insert(table.columns.get_loc('Overall_Penetration_%') + 1,
+                     'Delta_vs_First_pp', table['Overall_Penetration_%'] - baseline)
+    leading = ['Dataset', 'Status', 'Households', 'States', 'Overall_Penetration_%',
+               'Overall_Margin_%', 'Delta_vs_First_pp']
+    leading = [c for c in leading if c in table.columns]
+    return table[leading + [c for c in table.columns if c not in leading]]
+
+
+def write_comparison(table, output_dir: str) -> tuple:
+    """CSV (full precision) and a markdown version for the memo/wiki"""
+    from artifact_store import atomic_write_text  # type: ignore
+
+    csv_path = os.path.join(output_dir, 'batch_comparison.csv')
+    md_path = os.path.join(output_dir, 'batch_comparison.md')
+    atomic_write_text(csv_path, table.to_csv(index=False), suffix='.csv')
+
+    lines = ['| ' + ' | '.join(table.columns) + ' |',
+             '|' + '|'.join('---' for _ in table.columns) + '|']
+    for _, row in table.iterrows():
+        cells = []
+        for value in row:
+            if isinstance(value, float):
+                cells.append('' if value != value else f'{value:.4g}')
+            else:
+                cells.append(str(value).replace('|', '\\|'))
+        lines.append('| ' + ' | '.join(cells) + ' |')
+    atomic_write_text(md_path, '# Batch Comparison\n\n' + '\n'.join(lines) + '\n', suffix='.md')
+    return csv_path, md_path
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Run the analysis pipeline over a manifest of datasets')
+    parser.add_argument('manifest', help='JSON or CSV manifest of datasets')
+    parser.add_argument('--output-dir', default='outputs/batch',
+                        help='Comparison table plus one sub-directory per dataset')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (each stays warm across datasets)')
+    parser.add_argument('--memos', action='store_true', help='Write a product memo per dataset')
+    parser.add_argument('--charts', action='store_true',
+                        help='Write a dashboard per dataset (sharing one plotly.min.js)')
+    parser.add_argument('--store',
+                        help='Shared artifact store directory (same cache as run_analysis.py --store)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    datasets = load_manifest(args.manifest)
+    if not datasets:
+        raise SystemExit(f"No datasets in {args.manifest}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = max(1, min(args.jobs, len(datasets)))
+
+    print("="*80)
+    print(f" BATCH ANALYSIS: {len(datasets)} datasets, {jobs} warm worker(s)")
+    print("="*80)
+
+    if args.charts:
+        from artifact_store import atomic_write_text  # type: ignore
+        from plotly.offline import get_plotlyjs
+        atomic_write_text(os.path.join(args.output_dir, SHARED_PLOTLYJS), get_plotlyjs(), suffix='.js')
+
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=warm_worker,
+                             initargs=(args.charts,)) as pool:
+        futures = {
+            pool.submit(run_dataset, dataset, args.output_dir, args.memos, args.charts, args.store):
+                dataset['name']
+            for dataset in datasets
+        }
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            marker = '✅' if row['Status'] == 'ok' else '❌'
+            print(f"   {marker} {row['Dataset']:<24}{row['Status']:<12}{row['Seconds']:>8.2f}s")
+
+    table = comparison_table(rows, [d['name'] for d in datasets])
+    csv_path, md_path = write_comparison(table, args.output_dir)
+
+    failed = (table['Status'] != 'ok').sum()
+    print(f"\n📊 Comparison table: {csv_path} (+ {os.path.basename(md_path)})")
+    print(f"⏱️  {len(datasets)} datasets in {time.perf_counter() - start:.2f}s"
+          + (f" ({failed} failed, see <dataset>/run.log)" if failed else ''))
+    print("="*80)
+    return table
+
+
+if __name__ == "__main__":
+    main()
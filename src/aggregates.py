@@ -0,0 +1,211 @@
+"""
+Aggregate Cube for Household Penetration Metrics
+
+Collapses household records into additive weighted sufficient statistics over
+a small set of dimensions (State x Urban x Internet x Household_Size by default).
+Cubes can be:
+1. Rolled up to any subset of dimensions (penetration, category skew, contingency)
+2. Filtered for drill-down queries
+3. Combined with other cubes (incremental updates, partitions, waves)
+4. Saved and reloaded instead of re-reading household-level data
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, List
+
+
+DEFAULT_DIMENSIONS = ['State', 'Urban', 'Internet_Access', 'Household_Size']
+
+# Dimensions that are derived from Household_Size on demand
+DERIVED_DIMENSIONS = ['HH_Size_Bucket', 'HH_Type']
+
+BASE_MEASURES = ['Households', 'Weight', 'Weight_Sq']
+
+
+def bucket_household_size(sizes: pd.Series) -> pd.Series:
+    """Vectorized equivalent of PenetrationAnalyzer._bucket_hh_size"""
+    return pd.Series(
+        np.select(
+            [sizes == 1, sizes.isin([2, 3]), sizes.isin([4, 5])],
+            ['1 (Single-person)', '2-3 (Small)', '4-5 (Medium)'],
+            default='6+ (Large)'
+        ),
+        index=sizes.index
+    )
+
+
+def household_type(sizes: pd.Series) -> pd.Series:
+    """Vectorized equivalent of the H2 'Single/Small' vs 'Family' split"""
+    return pd.Series(np.where(sizes <= 2, 'Single/Small', 'Family'), index=sizes.index)
+
+
+class AggregateCube:
+    """Additive weighted sufficient statistics for penetration and category metrics"""
+
+    def __init__(self, table: pd.DataFrame, dimensions: List[str],
+                 outcomes: List[str], weighted: bool = True):
+        self.table = table
+        self.dimensions = dimensions
+        self.outcomes = outcomes
+        self.weighted = weighted
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame,
+                       dimensions: List[str] | None = None,
+                       weight_col: str = 'Sample_Weight') -> 'AggregateCube':
+        """
+        Build a cube from household-level data
+
+        Outcomes are Online_Purchase plus every Online_* category flag. For each
+        outcome the cube stores the count of positive households and their weight.
+        """
+        dimensions = [d for d in (dimensions or DEFAULT_DIMENSIONS) if d in df.columns]
+        outcomes = [col for col in df.columns if col.startswith('Online_')]
+        weighted = weight_col in df.columns
+
+        weight = (df[weight_col].astype(float) if weighted
+                  else pd.Series(1.0, index=df.index)).to_numpy()
+
+        # Group ids once, then one bincount per measure (no per-outcome frame copies)
+        # (categoricals are grouped by value so cells sort the same for any input dtype)
+        keys = [df[d].astype(object) if isinstance(df[d].dtype, pd.CategoricalDtype) else df[d]
+                for d in dimensions]
+        groups = df.groupby(keys, dropna=False)
+        codes = groups.ngroup().to_numpy()
+        table = groups.size().reset_index(name='Households')
+        n_cells = len(table)
+
+        table['Households'] = table['Households'].astype(np.int64)
+        table['Weight'] = np.bincount(codes, weights=weight, minlength=n_cells)
+        table['Weight_Sq'] = np.bincount(codes, weights=weight ** 2, minlength=n_cells)
+        for col in outcomes:
+            positive = (df[col] == 1).to_numpy()
+            table[col] = np.bincount(codes[positive], minlength=n_cells).astype(np.int64)
+            table[f'{col}_Weight'] = np.bincount(codes[positive], weights=weight[positive],
+                                                 minlength=n_cells)
+
+        return cls(table, dimensions, outcomes, weighted)
+
+    @property
+    def measure_columns(self) -> List[str]:
+        """All additive measure columns in the table"""
+        return BASE_MEASURES + [c for o in self.outcomes for c in (o, f'{o}_Weight')]
+
+    def combine(self, other: 'AggregateCube') -> 'AggregateCube':
+        """Add another cube with the same dimensions (e.g. a new micro-batch)"""
+        if other.dimensions != self.dimensions:
+            raise ValueError("Cannot combine cubes with different dimensions")
+        outcomes = self.outcomes + [o for o in other.outcomes if o not in self.outcomes]
+        stacked = pd.concat([self.table, other.table], ignore_index=True)
+        measures = BASE_MEASURES + [c for o in outcomes for c in (o, f'{o}_Weight')]
+        stacked[measures] = stacked[measures].fillna(0)
+        table = stacked.groupby(self.dimensions, dropna=False)[measures].sum().reset_index()
+        return AggregateCube(table, self.dimensions, outcomes, self.weighted and other.weighted)
+
+    def filter(self, **filters) -> 'AggregateCube':
+        """
+        Restrict the cube to matching cells
+
+        Values may be scalars or lists; derived dimensions (HH_Size_Bucket,
+        HH_Type) are accepted as well.
+        """
+        table = self._with_derived(self.table, list(filters))
+        mask = pd.Series(True, index=table.index)
+        for dim, value in filters.items():
+            if dim not in table.columns:
+                raise KeyError(f"Unknown dimension: {dim}")
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= table[dim].isin(values)
+        return AggregateCube(self.table[mask.to_numpy()].reset_index(drop=True),
+                             self.dimensions, self.outcomes, self.weighted)
+
+    def rollup(self, by: List[str] | None = None) -> pd.DataFrame:
+        """Sum the measures over all dimensions except `by`"""
+        if not by:
+            return pd.DataFrame([self.table[self.measure_columns].sum()])
+        table = self._with_derived(self.table, by)
+        return table.groupby(by, observed=True)[self.measure_columns].sum().reset_index()
+
+    def penetration(self, by: List[str] | None = None,
+                    outcome: str = 'Online_Purchase',
+                    weighted: bool | None = None) -> pd.DataFrame:
+        """
+        Penetration table in the same layout as PenetrationAnalyzer.calculate_penetration
+        """
+        weighted = self.weighted if weighted is None else weighted
+        rolled = self.rollup(by)
+        if weighted:
+            share = rolled[f'{outcome}_Weight'] / rolled['Weight']
+        else:
+            share = rolled[outcome] / rolled['Households']
+        share = share.where(rolled['Weight'] > 0, 0.0)
+
+        if not by:
+            return pd.DataFrame({
+                'Group': ['Overall'],
+                'Penetration_%': [float(share.iloc[0]) * 100],
+                'Sample_Size': [int(rolled['Households'].iloc[0])]
+            })
+
+        result = rolled[by].copy()
+        result['Penetration_%'] = share.to_numpy() * 100
+        result['Sample_Size'] = rolled['Households'].astype(int).to_numpy()
+        return result
+
+    def category_penetration(self, by: str = 'HH_Type',
+                             weighted: bool = False) -> Dict[str, Dict]:
+        """Category penetration per segment, shaped like HypothesisTester H2 output"""
+        rolled = self.rollup([by])
+        denominator = rolled['Weight'] if weighted else rolled['Households']
+        result = {}
+        for cat in self.categories:
+            numerator = rolled[f'{cat}_Weight'] if weighted else rolled[cat]
+            result[cat] = dict(zip(rolled[by], numerator / denominator))
+        return result
+
+    def category_skew(self, by: str = 'HH_Type', weighted: bool = False) -> Dict[str, Dict]:
+        """Category Skew Index per segment (segment rate / mean segment rate)"""
+        skew = {}
+        for cat, rates in self.category_penetration(by, weighted).items():
+            national_avg = np.mean(list(rates.values()))
+            skew[cat] = {
+                group: (rate / national_avg if national_avg > 0 else 1.0)
+                for group, rate in rates.items()
+            }
+        return skew
+
+    @property
+    def categories(self) -> List[str]:
+        """Category outcome columns (every Online_* flag except Online_Purchase)"""
+        return [o for o in self.outcomes if o != 'Online_Purchase']
+
+    def save(self, path: str):
+        """Persist the cube (pickle) for reuse by later pipeline stages"""
+        pd.to_pickle({
+            'table': self.table,
+            'dimensions': self.dimensions,
+            'outcomes': self.outcomes,
+            'weighted': self.weighted
+        }, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'AggregateCube':
+        """Load a cube written by save()"""
+        state = pd.read_pickle(path)
+        return cls(state['table'], state['dimensions'], state['outcomes'], state['weighted'])
+
+    @staticmethod
+    def _with_derived(table: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        """Attach derived dimensions needed by a query"""
+        needed = [c for c in columns if c in DERIVED_DIMENSIONS and c not in table.columns]
+        if not needed:
+            return table
+        if 'Household_Size' not in table.columns:
+            raise KeyError("Derived household dimensions require Household_Size in the cube")
+        table = table.copy()
+        if 'HH_Size_Bucket' in needed:
+            table['HH_Size_Bucket'] = bucket_household_size(table['Household_Size'])
+        if 'HH_Type' in needed:
+            table['HH_Type'] = household_type(table['Household_Size'])
+        return table
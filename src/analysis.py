@@ -10,18 +10,26 @@ Implements:
 
 import pandas as pd
 import numpy as np
-from scipy import stats
 from typing import Dict, List, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+from profiling import profile_stage
+from backends import PandasBackend
+
 
 class PenetrationAnalyzer:
     """Calculate online purchase penetration metrics"""
     
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame | None = None, backend=None):
+        """
+        Args:
+            df: household-level data (pandas backend)
+            backend: a backends.PandasBackend / DuckDBBackend; overrides df
+        """
+        self.backend = backend if backend is not None else PandasBackend(df)
         self.df = df
-        self.weighted = 'Sample_Weight' in df.columns
+        self.weighted = 'Sample_Weight' in self.backend.columns
     
     def calculate_penetration(self, 
                             groupby_cols: List[str] | None = None,
@@ -31,38 +39,7 @@ class PenetrationAnalyzer:
         
         Penetration = (Households with ≥1 online purchase) / (Total households)
         """
-        if groupby_cols is None:
-            # Overall penetration
-            if self.weighted:
-                total_weight = self.df[weight_col].sum()
-                online_weight = self.df[self.df['Online_Purchase'] == 1][weight_col].sum()
-                penetration = online_weight / total_weight
-            else:
-                penetration = self.df['Online_Purchase'].mean()
-            
-            return pd.DataFrame({
-                'Group': ['Overall'],
-                'Penetration_%': [penetration * 100],
-                'Sample_Size': [len(self.df)]
-            })
-        
-        # Grouped penetration
-        results = []
-        for name, group in self.df.groupby(groupby_cols):
-            if self.weighted:
-                total_weight = group[weight_col].sum()
-                online_weight = group[group['Online_Purchase'] == 1][weight_col].sum()
-                penetration = online_weight / total_weight if total_weight > 0 else 0
-            else:
-                penetration = group['Online_Purchase'].mean()
-            
-            results.append({
-                **dict(zip(groupby_cols, name if isinstance(name, tuple) else [name])),
-                'Penetration_%': penetration * 100,
-                'Sample_Size': len(group)
-            })
-        
-        return pd.DataFrame(results)
+        return self.backend.penetration(groupby_cols, weight_col if self.weighted else None)
     
     def state_level_penetration(self) -> pd.DataFrame:
         """Calculate penetration by state"""
@@ -70,24 +47,19 @@ class PenetrationAnalyzer:
     
     def household_size_penetration(self) -> pd.DataFrame:
         """Calculate penetration by household size bucket"""
-        # Create buckets if not exists
-        if 'HH_Size_Bucket' not in self.df.columns:
-            self.df['HH_Size_Bucket'] = self.df['Household_Size'].apply(
-                lambda x: self._bucket_hh_size(x)
-            )
-        
+        # Buckets are derived by the backend if the data doesn't have them
         return self.calculate_penetration(groupby_cols=['HH_Size_Bucket'])
     
     def urban_rural_penetration(self) -> pd.DataFrame:
         """Calculate penetration by urban/rural"""
-        if 'Urban' not in self.df.columns:
+        if 'Urban' not in self.backend.columns:
             return pd.DataFrame()
         
         return self.calculate_penetration(groupby_cols=['Urban'])
     
     def internet_penetration(self) -> pd.DataFrame:
         """Calculate penetration by internet availability"""
-        if 'Internet_Access' not in self.df.columns:
+        if 'Internet_Access' not in self.backend.columns:
             return pd.DataFrame()
         
         return self.calculate_penetration(groupby_cols=['Internet_Access'])
@@ -108,7 +80,8 @@ class PenetrationAnalyzer:
 class HypothesisTester:
     """Test the three main hypotheses"""
     
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame | None = None, backend=None):
+        self.backend = backend if backend is not None else PandasBackend(df)
         self.df = df
     
     def test_h1_household_size_adoption(self) -> Dict:
@@ -120,12 +93,17 @@ class HypothesisTester:
         2. Chi-square test for independence
         3. Trend analysis across size buckets
         """
+        from scipy import stats
+
+        columns = self.backend.columns
+        has_columns = 'Household_Size' in columns and 'Online_Purchase' in columns
+        
         # Correlation
-        if 'Household_Size' in self.df.columns and 'Online_Purchase' in self.df.columns:
-            correlation = self.df[['Household_Size', 'Online_Purchase']].corr().iloc[0, 1]
+        if has_columns:
+            correlation = self.backend.correlation('Household_Size', 'Online_Purchase')
             
             # Statistical significance
-            n = len(self.df)
+            n = self.backend.count()
             corr_val = float(correlation)  # type: ignore
             t_stat = corr_val * np.sqrt(n - 2) / np.sqrt(1 - corr_val**2)
             p_value = float(2 * (1 - stats.t.cdf(abs(t_stat), n - 2)))
@@ -133,12 +111,12 @@ class HypothesisTester:
             correlation, p_value = np.nan, np.nan
         
         # Penetration by size bucket
-        analyzer = PenetrationAnalyzer(self.df)
+        analyzer = PenetrationAnalyzer(self.df, backend=self.backend)
         penetration_by_size = analyzer.household_size_penetration()
         
         # Chi-square test
-        if 'Household_Size' in self.df.columns and 'Online_Purchase' in self.df.columns:
-            contingency = pd.crosstab(self.df['Household_Size'], self.df['Online_Purchase'])
+        if has_columns:
+            contingency = self.backend.contingency('Household_Size', 'Online_Purchase')
             chi2, chi_p, _, _ = stats.chi2_contingency(contingency)
         else:
             chi2, chi_p = np.nan, np.nan
@@ -161,22 +139,16 @@ class HypothesisTester:
         H2: Family-heavy regions over-index on essentials/bulk,
             Single-heavy regions over-index on convenience
         """
-        category_cols = [col for col in self.df.columns if col.startswith('Online_')]
-        if not category_cols or 'Household_Size' not in self.df.columns:
+        columns = self.backend.columns
+        category_cols = [col for col in columns if col.startswith('Online_')]
+        if not category_cols or 'Household_Size' not in columns:
             return {'error': 'Category data not available'}
         
-        # Define household type
-        self.df['HH_Type'] = self.df['Household_Size'].apply(
-            lambda x: 'Single/Small' if x <= 2 else 'Family'
+        # Category penetration by household type (Single/Small vs Family)
+        category_penetration = self.backend.category_rates(
+            [cat for cat in category_cols if cat != 'Online_Purchase'], by='HH_Type'
         )
         
-        # Calculate category penetration by household type
-        category_penetration = {}
-        for cat in category_cols:
-            if cat != 'Online_Purchase':
-                cat_penetration = self.df[self.df[cat] == 1].groupby('HH_Type').size() / self.df.groupby('HH_Type').size()
-                category_penetration[cat] = cat_penetration.to_dict()
-        
         # Calculate Category Skew Index
         skew_indices = self._calculate_category_skew(category_penetration)
         
@@ -191,45 +163,34 @@ class HypothesisTester:
         H3: Household structure impacts e-commerce adoption primarily when
             internet access is present
         """
-        if 'Internet_Access' not in self.df.columns:
+        if 'Internet_Access' not in self.backend.columns:
             return {'error': 'Internet access data not available'}
         
-        # Analyze household size effect WITH and WITHOUT internet
-        with_internet = self.df[self.df['Internet_Access'] == 1]
-        without_internet = self.df[self.df['Internet_Access'] == 0]
-        
-        # Correlation for each group
-        corr_with = with_internet[['Household_Size', 'Online_Purchase']].corr().iloc[0, 1] if len(with_internet) > 0 else np.nan
-        corr_without = without_internet[['Household_Size', 'Online_Purchase']].corr().iloc[0, 1] if len(without_internet) > 0 else np.nan
+        # Correlation WITH and WITHOUT internet
+        corr_with = self.backend.correlation('Household_Size', 'Online_Purchase', where={'Internet_Access': 1})
+        corr_without = self.backend.correlation('Household_Size', 'Online_Purchase', where={'Internet_Access': 0})
         
         # Convert to float
         corr_with_val = float(corr_with) if not pd.isna(corr_with) else np.nan  # type: ignore
         corr_without_val = float(corr_without) if not pd.isna(corr_without) else np.nan  # type: ignore
         
-        # Penetration by size for each internet group
-        results_with = []
-        results_without = []
-        
-        for size_bucket in ['1 (Single-person)', '2-3 (Small)', '4-5 (Medium)', '6+ (Large)']:
-            # With internet
-            subset_with = with_internet[with_internet['Household_Size'].apply(
-                lambda x: PenetrationAnalyzer._bucket_hh_size(x)) == size_bucket]
-            if len(subset_with) > 0:
-                pen_with = subset_with['Online_Purchase'].mean() * 100
-                results_with.append({'HH_Size': size_bucket, 'Penetration': pen_with})
-            
-            # Without internet
-            subset_without = without_internet[without_internet['Household_Size'].apply(
-                lambda x: PenetrationAnalyzer._bucket_hh_size(x)) == size_bucket]
-            if len(subset_without) > 0:
-                pen_without = subset_without['Online_Purchase'].mean() * 100
-                results_without.append({'HH_Size': size_bucket, 'Penetration': pen_without})
+        # Unweighted penetration by size for each internet group
+        def by_size(access: int) -> pd.DataFrame:
+            table = self.backend.penetration(['HH_Size_Bucket'], weight_col=None,
+                                             where={'Internet_Access': access})
+            if table.empty:
+                return pd.DataFrame()
+            return pd.DataFrame({'HH_Size': table['HH_Size_Bucket'].tolist(),
+                                 'Penetration': table['Penetration_%'].tolist()})
+        
+        results_with = by_size(1)
+        results_without = by_size(0)
         
         return {
             'correlation_with_internet': corr_with_val,
             'correlation_without_internet': corr_without_val,
-            'penetration_with_internet': pd.DataFrame(results_with),
-            'penetration_without_internet': pd.DataFrame(results_without),
+            'penetration_with_internet': results_with,
+            'penetration_without_internet': results_without,
             'conclusion': self._interpret_h3(corr_with_val, corr_without_val)
         }
     
@@ -299,8 +260,14 @@ class HypothesisTester:
 class StatisticalModeler:
     """Optional logistic regression for deeper insights"""
     
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame = None, backend=None):
+        """
+        df: household rows; without them (backend only) the model is fitted
+        on the backend's per-cell outcome counts, which gives the same
+        maximum-likelihood fit because every feature is discrete
+        """
         self.df = df
+        self.backend = backend if backend is not None else PandasBackend(df)
     
     def fit_logistic_model(self) -> Dict:
         """
@@ -312,17 +279,21 @@ class StatisticalModeler:
         from sklearn.preprocessing import StandardScaler
         
         # Prepare features
+        columns = self.backend.columns
         feature_cols = []
-        if 'Household_Size' in self.df.columns:
+        if 'Household_Size' in columns:
             feature_cols.append('Household_Size')
-        if 'Internet_Access' in self.df.columns:
+        if 'Internet_Access' in columns:
             feature_cols.append('Internet_Access')
-        if 'Urban' in self.df.columns:
+        if 'Urban' in columns:
             feature_cols.append('Urban')
         
-        if not feature_cols or 'Online_Purchase' not in self.df.columns:
+        if not feature_cols or 'Online_Purchase' not in columns:
             return {'error': 'Insufficient features for modeling'}
         
+        if self.df is None:
+            return self._fit_from_cells(feature_cols)
+        
         # Remove NaN
         model_df = self.df[feature_cols + ['Online_Purchase']].dropna()
         
@@ -351,9 +322,81 @@ class StatisticalModeler:
             'odds_ratios': odds_ratios,
             'accuracy': accuracy,
             'n_samples': len(model_df),
-            'interpretation': self._interpret_model(odds_ratios, feature_cols)
+            'interpretation': self._interpret_model(odds_ratios, feature_cols),
+            # Needed to score new data and simulate coefficient uncertainty
+            'features': feature_cols,
+            'intercept': float(model.intercept_[0]),
+            'feature_means': dict(zip(feature_cols, scaler.mean_)),
+            'feature_scales': dict(zip(feature_cols, scaler.scale_)),
+            'covariance': self._coefficient_covariance(model, X_scaled)
+        }
+    
+    def _fit_from_cells(self, feature_cols: List[str]) -> Dict:
+        """Same model as fit_logistic_model, fitted on backend outcome counts"""
+        from sklearn.linear_model import LogisticRegression
+        
+        cells = self.backend.outcome_cells(feature_cols)
+        if cells.empty:
+            return {'error': 'Insufficient features for modeling'}
+        
+        X = cells[feature_cols].to_numpy(dtype=float)
+        n = cells['n'].to_numpy(dtype=float)
+        positives = cells['positives'].to_numpy(dtype=float)
+        total = n.sum()
+        
+        # StandardScaler statistics over the households each cell stands for
+        means = (X * n[:, None]).sum(axis=0) / total
+        scales = np.sqrt((((X - means) ** 2) * n[:, None]).sum(axis=0) / total)
+        scales[scales == 0] = 1.0
+        X_scaled = (X - means) / scales
+        
+        # Each cell enters twice: once as buyers, once as non-buyers
+        X_fit = np.vstack([X_scaled, X_scaled])
+        y_fit = np.concatenate([np.ones(len(cells)), np.zeros(len(cells))])
+        weights = np.concatenate([positives, n - positives])
+        keep = weights > 0
+        
+        model = LogisticRegression(random_state=42, max_iter=1000)
+        model.fit(X_fit[keep], y_fit[keep], sample_weight=weights[keep])
+        
+        coefficients = dict(zip(feature_cols, model.coef_[0]))
+        odds_ratios = {feat: np.exp(coef) for feat, coef in coefficients.items()}
+        predicted = model.predict(X_scaled)
+        correct = np.where(predicted == 1, positives, n - positives).sum()
+        
+        return {
+            'coefficients': coefficients,
+            'odds_ratios': odds_ratios,
+            'accuracy': correct / total,
+            'n_samples': int(total),
+            'interpretation': self._interpret_model(odds_ratios, feature_cols),
+            'features': feature_cols,
+            'intercept': float(model.intercept_[0]),
+            'feature_means': dict(zip(feature_cols, means)),
+            'feature_scales': dict(zip(feature_cols, scales)),
+            'covariance': self._coefficient_covariance(model, X_scaled, weights=n)
         }
     
+    @staticmethod
+    def _coefficient_covariance(model, X_scaled: np.ndarray,
+                                weights: np.ndarray | None = None) -> np.ndarray:
+        """
+        Approximate covariance of [intercept, coefficients] on the scaled features
+        
+        Inverse of the penalized log-likelihood Hessian (sklearn's L2 penalty
+        1/C applies to the coefficients, not the intercept). weights: rows
+        each line of X_scaled stands for (default 1).
+        """
+        design = np.column_stack([np.ones(len(X_scaled)), X_scaled])
+        p = model.predict_proba(X_scaled)[:, 1]
+        if weights is not None:
+            p_weight = weights * p * (1 - p)
+        else:
+            p_weight = p * (1 - p)
+        hessian = design.T @ (design * p_weight[:, None])
+        hessian[1:, 1:] += np.eye(X_scaled.shape[1]) / model.C
+        return np.linalg.inv(hessian)
+    
     def _interpret_model(self, odds_ratios: Dict, features: List[str]) -> str:
         """Generate plain English interpretation"""
         interpretations = []
@@ -388,50 +431,66 @@ class StatisticalModeler:
         return "\n".join(interpretations)
 
 
-def run_full_analysis(df: pd.DataFrame) -> Dict:
-    """Run all analyses and return comprehensive results"""
+def run_full_analysis(df: pd.DataFrame = None, backend=None) -> Dict:
+    """
+    Run all analyses and return comprehensive results
+    
+    backend: optional backends.DuckDBBackend for the penetration and
+    hypothesis aggregations (default: pandas over df). With df=None every
+    analysis, the logistic model included, runs on the backend alone, e.g.
+    run_full_analysis(backend=DuckDBBackend('data/hces/*.parquet')).
+    """
+    if df is None and backend is None:
+        raise ValueError("run_full_analysis needs a DataFrame or a backend")
     
     print("🔬 Running Comprehensive Analysis...")
     print("=" * 60)
     
     results = {}
+    rows = len(df) if df is not None else backend.count()
     
-    # 1. Penetration Analysis
-    print("\n📊 1. Calculating Penetration Metrics...")
-    analyzer = PenetrationAnalyzer(df)
-    results['overall_penetration'] = analyzer.calculate_penetration()
-    results['state_penetration'] = analyzer.state_level_penetration()
-    results['household_size_penetration'] = analyzer.household_size_penetration()
-    results['urban_rural_penetration'] = analyzer.urban_rural_penetration()
-    results['internet_penetration'] = analyzer.internet_penetration()
-    
-    print(f"   ✓ Overall penetration: {results['overall_penetration']['Penetration_%'].values[0]:.1f}%")
-    
-    # 2. Hypothesis Testing
-    print("\n🧪 2. Testing Hypotheses...")
-    tester = HypothesisTester(df)
-    
-    print("   Testing H1: Household Size vs Adoption...")
-    results['h1'] = tester.test_h1_household_size_adoption()
-    print(f"   {results['h1']['conclusion']}")
-    
-    print("   Testing H2: Category Differences...")
-    results['h2'] = tester.test_h2_category_differences()
-    if 'conclusion' in results['h2']:
-        print(f"   {results['h2']['conclusion']}")
-    
-    print("   Testing H3: Internet Mediation...")
-    results['h3'] = tester.test_h3_internet_mediation()
-    if 'conclusion' in results['h3']:
-        print(f"   {results['h3']['conclusion']}")
-    
-    # 3. Statistical Modeling
-    print("\n📈 3. Fitting Logistic Model...")
-    modeler = StatisticalModeler(df)
-    results['model'] = modeler.fit_logistic_model()
-    if 'interpretation' in results['model']:
-        print(f"   Model Accuracy: {results['model']['accuracy']:.1%}")
-        print(f"   {results['model']['interpretation']}")
+    with profile_stage('run_full_analysis', rows=rows):
+        # 1. Penetration Analysis
+        print("\n📊 1. Calculating Penetration Metrics...")
+        analyzer = PenetrationAnalyzer(df, backend=backend)
+        with profile_stage('penetration', rows=rows):
+            results['overall_penetration'] = analyzer.calculate_penetration()
+            results['state_penetration'] = analyzer.state_level_penetration()
+            results['household_size_penetration'] = analyzer.household_size_penetration()
+            results['urban_rural_penetration'] = analyzer.urban_rural_penetration()
+            results['internet_penetration'] = analyzer.internet_penetration()
+        
+        print(f"   ✓ Overall penetration: {results['overall_penetration']['Penetration_%'].values[0]:.1f}%")
+        
+        # 2. Hypothesis Testing
+        print("\n🧪 2. Testing Hypotheses...")
+        tester = HypothesisTester(df, backend=backend)
+        
+        print("   Testing H1: Household Size vs Adoption...")
+        with profile_stage('h1_household_size', rows=rows):
+            results['h1'] = tester.test_h1_household_size_adoption()
+        print(f"   {results['h1']['conclusion']}")
+        
+        print("   Testing H2: Category Differences...")
+        with profile_stage('h2_category_differences', rows=rows):
+            results['h2'] = tester.test_h2_category_differences()
+        if 'conclusion' in results['h2']:
+            print(f"   {results['h2']['conclusion']}")
+        
+        print("   Testing H3: Internet Mediation...")
+        with profile_stage('h3_internet_mediation', rows=rows):
+            results['h3'] = tester.test_h3_internet_mediation()
+        if 'conclusion' in results['h3']:
+            print(f"   {results['h3']['conclusion']}")
+        
+        # 3. Statistical Modeling
+        print("\n📈 3. Fitting Logistic Model...")
+        modeler = StatisticalModeler(df, backend=backend)
+        with profile_stage('logistic_model', rows=rows):
+            results['model'] = modeler.fit_logistic_model()
+        if 'interpretation' in results['model']:
+            print(f"   Model Accuracy: {results['model']['accuracy']:.1%}")
+            print(f"   {results['model']['interpretation']}")
     
     print("\n" + "=" * 60)
     print("✅ Analysis Complete!")
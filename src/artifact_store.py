@@ -0,0 +1,282 @@
+"""
+Concurrency-Safe Artifact Store
+
+Several analysts and scheduled jobs can run the pipeline on the same box at
+once. This module gives them:
+1. Atomic writes: temp file in the target directory + os.replace, so readers
+   see either the old or the new file, never a partial one
+2. File locks (fcntl.flock on .<name>.lock; an O_EXCL lock file where fcntl
+   is unavailable) around writes and computations
+3. A content-addressed store (<root>/objects/ab/cdef...) for cached results
+   and rendered outputs; identical content is stored once
+4. Keyed computations (<root>/refs/<namespace>/<key>.json -> object digest):
+   the first run with a given input key computes while holding the key's
+   lock, concurrent runs with the same key wait and then reuse its result
+5. Keyed renders: a stage's output files are rendered once per key into
+   the object store and published from there (unchanged files aren't
+   rewritten)
+
+Usage:
+    store = ArtifactStore('.artifacts')
+    key = store.key(file_digest('data/sample_hces_data.csv'), code_version(), preview=None)
+    results = store.cached('analysis', key, lambda: run_full_analysis(df))
+    store.publish_text('outputs/product_memo.md', memo)
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from typing import Callable, Dict, Iterable
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SRC_DIR)
+
+# Top-level scripts whose stage functions feed cached results
+RUNNER_SCRIPTS = ['run_analysis.py', 'run_batch.py']
+
+
+def _current_umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def atomic_write_bytes(path: str, data: bytes, suffix: str = '.tmp'):
+    """Write via a temp file in the same directory + rename"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    # mkstemp creates 0600; give the result the target's mode (or the umask default)
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~_current_umask()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_text(path: str, text: str, suffix: str = '.tmp'):
+    atomic_write_bytes(path, text.encode('utf-8'), suffix)
+
+
+def make_staging_dir(directory: str, prefix: str = '.tmp-') -> str:
+    """
+    Temporary directory to fill and then rename into place
+
+    mkdtemp creates 0700; the directory gets the umask default instead, as
+    os.makedirs would give the final path.
+    """
+    path = tempfile.mkdtemp(dir=directory, prefix=prefix)
+    os.chmod(path, 0o777 & ~_current_umask())
+    return path
+
+
+@contextlib.contextmanager
+def file_lock(path: str, shared: bool = False, timeout: float | None = None,
+              poll_interval: float = 0.05):
+    """
+    Hold a lock on a hidden .<name>.lock next to path for the duration of the block
+
+    shared=True allows concurrent readers (fcntl only). Raises TimeoutError
+    if the lock isn't acquired within timeout seconds.
+    """
+    directory, name = os.path.split(path)
+    lock_path = os.path.join(directory, f'.{name}.lock')
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    if fcntl is not None:
+        with open(lock_path, 'a+') as handle:
+            mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            while True:
+                try:
+                    fcntl.flock(handle.fileno(), mode | (0 if deadline is None else fcntl.LOCK_NB))
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Timed out waiting for {lock_path}")
+                    time.sleep(poll_interval)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        return
+
+    # Fallback: exclusive lock file (no shared mode)
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}")
+            time.sleep(poll_interval)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """sha256 of a file's contents (or of every file under a directory)"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for name in sorted(filenames):
+                full = os.path.join(dirpath, name)
+                digest.update(os.path.relpath(full, path).encode('utf-8'))
+                digest.update(file_digest(full).encode('ascii'))
+        return digest.hexdigest()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_version(paths: Iterable[str] | None = None) -> str:
+    """
+    Digest of the pipeline source, so cached results expire when code changes
+
+    Covers src/*.py and the top-level runners (run_analysis.py defines the
+    analyze/insights stages that are cached).
+    """
+    if paths is None:
+        paths = [os.path.join(SRC_DIR, name) for name in sorted(os.listdir(SRC_DIR))
+                 if name.endswith('.py')]
+        paths += [path for path in (os.path.join(REPO_DIR, name) for name in RUNNER_SCRIPTS)
+                  if os.path.exists(path)]
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(file_digest(path).encode('ascii'))
+    return digest.hexdigest()[:16]
+
+
+class ArtifactStore:
+    """Content-addressed objects plus keyed, lock-protected computations"""
+
+    def __init__(self, root: str = '.artifacts'):
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'refs'), exist_ok=True)
+
+    @staticmethod
+    def key(*parts, **named) -> str:
+        """Stable key for a computation's inputs (JSON-serializable parts)"""
+        payload = json.dumps([parts, named], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:])
+
+    def put(self, data: bytes) -> str:
+        """Store bytes once; returns their sha256"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            atomic_write_bytes(path, data)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with open(self.object_path(digest), 'rb') as f:
+            return f.read()
+
+    def ref_path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.root, 'refs', namespace, f'{key}.json')
+
+    def lookup(self, namespace: str, key: str) -> str | None:
+        """Object digest recorded for a key, if its object still exists"""
+        try:
+            with open(self.ref_path(namespace, key), encoding='utf-8') as f:
+                digest = json.load(f)['digest']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+        return digest if os.path.exists(self.object_path(digest)) else None
+
+    def cached(self, namespace: str, key: str, compute: Callable,
+               dumps: Callable = pickle.dumps, loads: Callable = pickle.loads,
+               timeout: float | None = None):
+        """
+        Value for a key, computing it at most once across concurrent runs
+
+        The key's lock is held while computing, so a second run with the same
+        key blocks and then loads the stored result instead of recomputing.
+        """
+        digest = self.lookup(namespace, key)
+        if digest is not None:
+            return loads(self.get(digest))
+
+        ref_path = self.ref_path(namespace, key)
+        with file_lock(ref_path, timeout=timeout):
+            digest = self.lookup(namespace, key)
+            if digest is not None:
+                return loads(self.get(digest))
+            value = compute()
+            digest = self.put(dumps(value))
+            atomic_write_text(ref_path, json.dumps({'digest': digest, 'created': time.time()}))
+            return value
+
+    def cached_files(self, namespace: str, key: str, render: Callable[[str], None],
+                     timeout: float | None = None) -> Dict[str, str]:
+        """
+        {relative path: object digest} of the files render(directory) writes
+
+        Rendering happens at most once per key (in a scratch directory under
+        the store); concurrent runs wait and reuse the stored objects. Hidden
+        files (locks, temp files, renderer manifests) are not kept.
+        """
+        def compute():
+            with tempfile.TemporaryDirectory(dir=self.root, prefix='.render-') as directory:
+                render(directory)
+                manifest = {}
+                for dirpath, dirnames, filenames in os.walk(directory):
+                    dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+                    for name in filenames:
+                        if name.startswith('.'):
+                            continue
+                        full = os.path.join(dirpath, name)
+                        with open(full, 'rb') as f:
+                            manifest[os.path.relpath(full, directory)] = self.put(f.read())
+                return manifest
+
+        return self.cached(namespace, key, compute,
+                           dumps=lambda manifest: json.dumps(manifest, sort_keys=True).encode('utf-8'),
+                           loads=json.loads, timeout=timeout)
+
+    def publish_files(self, manifest: Dict[str, str], directory: str) -> int:
+        """Place every file of a cached_files manifest under directory; returns how many changed"""
+        return sum(self.publish(os.path.join(directory, relative), self.get(digest))
+                   for relative, digest in sorted(manifest.items()))
+
+    def publish(self, path: str, data: bytes) -> bool:
+        """
+        Store data and place it at path (atomic, under the path's lock)
+
+        Returns False if the file already had exactly this content.
+        """
+        digest = self.put(data)
+        with file_lock(path):
+            if os.path.exists(path) and os.path.getsize(path) == len(data) and file_digest(path) == digest:
+                return False
+            atomic_write_bytes(path, data)
+        return True
+
+    def publish_text(self, path: str, text: str) -> bool:
+        return self.publish(path, text.encode('utf-8'))
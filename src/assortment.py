@@ -0,0 +1,165 @@
+"""
+Batch Assortment Optimizer
+
+Turns per-store category demand from the merchandising table (see
+merchandising.merchandising_cube and catchment.catchment_metrics) into shelf
+facings under each store's capacity. Every store solves
+
+    maximize   sum_c demand_c * log(1 + facings_c / saturation)
+    subject to sum_c facings_c = capacity,  min_c <= facings_c <= max_c
+
+whose optimum is a water-filling rule, facings_c = clip(demand_c / lambda -
+saturation, min_c, max_c). The multiplier lambda is found by bisection for all
+stores at once on (stores x categories) arrays, then facings are rounded to
+integers with the largest-remainder method.
+
+Usage:
+    optimizer = AssortmentOptimizer(capacity=120, min_facings=4)
+    plan = optimizer.optimize(metrics['merchandising'])
+"""
+
+import numpy as np
+import pandas as pd
+
+from merchandising import REC_HIGH, REC_LOW
+
+
+def category_demand(merchandising: pd.DataFrame, id_col: str = 'Store_ID') -> pd.DataFrame:
+    """
+    Expected category buyers per store (rows) and category (columns)
+
+    Sums Households x Category_Rate over household segments, so a store's
+    segment mix drives its assortment.
+    """
+    buyers = merchandising['Households'].to_numpy(dtype=float) * merchandising['Category_Rate'].to_numpy(dtype=float)
+    frame = pd.DataFrame({
+        id_col: merchandising[id_col].to_numpy(),
+        'Category': merchandising['Category'].astype(str).to_numpy(),
+        'Buyers': buyers
+    })
+    return frame.pivot_table(index=id_col, columns='Category', values='Buyers',
+                             aggfunc='sum', fill_value=0.0, sort=False)
+
+
+def allocate_shelf_space(demand: np.ndarray, capacity: np.ndarray,
+                         min_facings: np.ndarray, max_facings: np.ndarray,
+                         saturation: float = 1.0, iterations: int = 60) -> np.ndarray:
+    """
+    Continuous water-filling allocation for all stores at once
+
+    demand, min_facings, max_facings: (stores, categories); capacity: (stores,)
+    Stores whose bounds cannot meet capacity get their lower (or upper) bounds.
+    """
+    demand = np.maximum(demand, 0.0) + 1e-12          # keeps lambda bounds positive
+    capacity = capacity[:, None]
+
+    def allocation(lam):
+        return np.clip(demand / lam - saturation, min_facings, max_facings)
+
+    # f(lambda) = sum(allocation) decreases in lambda: bracket, then bisect in log space
+    lam_low = np.min(demand / (saturation + max_facings), axis=1, keepdims=True)
+    lam_high = np.max(demand / (saturation + min_facings), axis=1, keepdims=True)
+    log_low, log_high = np.log(lam_low), np.log(lam_high)
+    for _ in range(iterations):
+        log_mid = (log_low + log_high) / 2
+        over = allocation(np.exp(log_mid)).sum(axis=1, keepdims=True) > capacity
+        log_low = np.where(over, log_mid, log_low)
+        log_high = np.where(over, log_high, log_mid)
+
+    return allocation(np.exp((log_low + log_high) / 2))
+
+
+def round_facings(allocation: np.ndarray, capacity: np.ndarray,
+                  max_facings: np.ndarray) -> np.ndarray:
+    """Largest-remainder rounding that keeps each store's total at capacity"""
+    facings = np.floor(allocation + 1e-9)
+    remainder = allocation - facings
+    # Categories already at their upper bound can't take the extra facing
+    remainder = np.where(facings >= max_facings, -1.0, remainder)
+    missing = np.clip(capacity - facings.sum(axis=1), 0, None).astype(np.int64)
+
+    order = np.argsort(-remainder, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(order.shape[1]), order.shape), axis=1)
+    facings += (ranks < missing[:, None]) & (remainder >= 0)
+    return facings.astype(np.int32)
+
+
+class AssortmentOptimizer:
+    """Capacity-constrained shelf-space allocation for many stores in one pass"""
+
+    def __init__(self, capacity: float | pd.Series = 100, min_facings: int = 2,
+                 max_share: float = 0.5, saturation: float = 2.0,
+                 rec_bounds: bool = True):
+        """
+        Args:
+            capacity: facings per store (scalar or Series indexed by store)
+            min_facings: minimum facings for every listed category
+            max_share: maximum share of a store's capacity for one category
+            saturation: facings at which a category's marginal value halves
+            rec_bounds: HIGH STOCK categories get 2x min facings; LOW STOCK
+                        categories are capped at half of max_share
+        """
+        self.capacity = capacity
+        self.min_facings = min_facings
+        self.max_share = max_share
+        self.saturation = saturation
+        self.rec_bounds = rec_bounds
+
+    def optimize(self, merchandising: pd.DataFrame, id_col: str = 'Store_ID') -> pd.DataFrame:
+        """
+        Facings per store and category
+
+        Returns a long table: Store_ID, Category, Buyers, Facings, Share_%
+        """
+        demand = category_demand(merchandising, id_col)
+        stores = demand.index.to_numpy()
+        categories = demand.columns.to_numpy()
+        n_stores, n_categories = demand.shape
+
+        if isinstance(self.capacity, pd.Series):
+            capacity = self.capacity.reindex(stores).to_numpy(dtype=float)
+            if np.isnan(capacity).any():
+                raise ValueError("capacity is missing for some stores")
+        else:
+            capacity = np.full(n_stores, float(self.capacity))
+        capacity = np.floor(capacity)
+
+        min_facings = np.full((n_stores, n_categories), float(self.min_facings))
+        max_facings = np.broadcast_to(np.floor(capacity * self.max_share)[:, None],
+                                      (n_stores, n_categories)).copy()
+        if self.rec_bounds:
+            codes = self._store_rec_codes(merchandising, demand, id_col)
+            min_facings = np.where(codes == REC_HIGH, 2 * min_facings, min_facings)
+            max_facings = np.where(codes == REC_LOW, np.floor(max_facings / 2), max_facings)
+        max_facings = np.maximum(max_facings, min_facings)
+
+        infeasible = (min_facings.sum(axis=1) > capacity) | (max_facings.sum(axis=1) < capacity)
+        if infeasible.any():
+            print(f"⚠️  {infeasible.sum()} store(s) cannot meet capacity within category bounds; "
+                  f"they get their bounds")
+
+        allocation = allocate_shelf_space(demand.to_numpy(), capacity, min_facings,
+                                          max_facings, self.saturation)
+        facings = round_facings(allocation, capacity, max_facings)
+
+        totals = np.maximum(facings.sum(axis=1, keepdims=True), 1)
+        return pd.DataFrame({
+            id_col: np.repeat(stores, n_categories),
+            'Category': np.tile(categories, n_stores),
+            'Buyers': demand.to_numpy().ravel(),
+            'Facings': facings.ravel(),
+            'Share_%': (facings / totals * 100).ravel()
+        })
+
+    @staticmethod
+    def _store_rec_codes(merchandising: pd.DataFrame, demand: pd.DataFrame,
+                         id_col: str) -> np.ndarray:
+        """Recommendation code of each store's dominant segment, per category"""
+        households = merchandising.groupby([id_col, 'Segment'], observed=True)['Households'].first()
+        dominant = households.unstack('Segment').idxmax(axis=1)
+        rows = merchandising[merchandising['Segment'].to_numpy() ==
+                             dominant.reindex(merchandising[id_col]).to_numpy()]
+        codes = rows.pivot_table(index=id_col, columns=rows['Category'].astype(str),
+                                 values='Rec_Code', aggfunc='first', sort=False)
+        return codes.reindex(index=demand.index, columns=demand.columns).fillna(1).to_numpy()
@@ -0,0 +1,340 @@
+"""
+Compute Backends for Penetration and Hypothesis Queries
+
+PenetrationAnalyzer and HypothesisTester ask a backend for a handful of
+aggregations (grouped penetration, correlations, contingency tables and
+category rates) instead of touching a DataFrame directly:
+
+- PandasBackend: in-memory DataFrame (default, the original behaviour)
+- DuckDBBackend: embedded columnar SQL engine (in-process, no server) over a
+  DataFrame or Parquet file(s). Queries run as multi-threaded scans with the
+  filters and group-bys pushed down, so Parquet inputs larger than RAM work.
+  duckdb is optional and imported only when this backend is created.
+
+Both backends return the same layouts; values agree up to floating-point
+summation order. read_parquet loads Parquet into pandas with pyarrow (or
+fastparquet) when installed and through duckdb otherwise.
+
+Usage:
+    analyzer = PenetrationAnalyzer(backend=DuckDBBackend('data/hces/*.parquet'))
+    tester = HypothesisTester(backend=DuckDBBackend(df, threads=8))
+"""
+
+import importlib.util
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from aggregates import bucket_household_size, household_type
+
+BACKENDS = ['pandas', 'duckdb']
+
+# SQL equivalents of the derived dimensions in aggregates.py
+_DERIVED_SQL = {
+    'HH_Size_Bucket': (
+        "CASE WHEN \"Household_Size\" = 1 THEN '1 (Single-person)' "
+        "WHEN \"Household_Size\" IN (2, 3) THEN '2-3 (Small)' "
+        "WHEN \"Household_Size\" IN (4, 5) THEN '4-5 (Medium)' "
+        "ELSE '6+ (Large)' END"
+    ),
+    'HH_Type': "CASE WHEN \"Household_Size\" <= 2 THEN 'Single/Small' ELSE 'Family' END"
+}
+
+
+class PandasBackend:
+    """Aggregations over an in-memory DataFrame"""
+
+    name = 'pandas'
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.df.columns)
+
+    def count(self) -> int:
+        return len(self.df)
+
+    def penetration(self, groupby_cols: List[str] | None = None,
+                    weight_col: str | None = 'Sample_Weight',
+                    where: Dict | None = None) -> pd.DataFrame:
+        """
+        Online purchase penetration, overall or per group
+
+        weight_col=None (or a missing column) gives the unweighted share.
+        where: {column: value} equality filters applied first.
+        """
+        if groupby_cols is not None:
+            self._add_derived(groupby_cols)
+        df = self._filter(where)
+        weighted = weight_col is not None and weight_col in df.columns
+
+        if groupby_cols is None:
+            if weighted:
+                total_weight = df[weight_col].sum()
+                online_weight = df[df['Online_Purchase'] == 1][weight_col].sum()
+                penetration = online_weight / total_weight
+            else:
+                penetration = df['Online_Purchase'].mean()
+
+            return pd.DataFrame({
+                'Group': ['Overall'],
+                'Penetration_%': [penetration * 100],
+                'Sample_Size': [len(df)]
+            })
+
+        results = []
+        for name, group in df.groupby(groupby_cols):
+            if weighted:
+                total_weight = group[weight_col].sum()
+                online_weight = group[group['Online_Purchase'] == 1][weight_col].sum()
+                penetration = online_weight / total_weight if total_weight > 0 else 0
+            else:
+                penetration = group['Online_Purchase'].mean()
+
+            results.append({
+                **dict(zip(groupby_cols, name if isinstance(name, tuple) else [name])),
+                'Penetration_%': penetration * 100,
+                'Sample_Size': len(group)
+            })
+
+        return pd.DataFrame(results)
+
+    def correlation(self, x: str, y: str, where: Dict | None = None) -> float:
+        """Pearson correlation of two columns (pairwise complete rows)"""
+        df = self._filter(where)
+        if len(df) == 0:
+            return np.nan
+        return df[[x, y]].corr().iloc[0, 1]
+
+    def contingency(self, rows: str, columns: str) -> pd.DataFrame:
+        """Household counts, rows x columns (as pd.crosstab)"""
+        return pd.crosstab(self.df[rows], self.df[columns])
+
+    def category_rates(self, categories: List[str], by: str = 'HH_Type') -> Dict[str, Dict]:
+        """Unweighted share of households buying each category, per segment"""
+        self._add_derived([by])
+        totals = self.df.groupby(by).size()
+        return {
+            cat: (self.df[self.df[cat] == 1].groupby(by).size() / totals).to_dict()
+            for cat in categories
+        }
+
+    def outcome_cells(self, features: List[str],
+                      outcome: str = 'Online_Purchase') -> pd.DataFrame:
+        """
+        Households ('n') and positive outcomes ('positives') per distinct
+        feature combination, over rows with no missing values
+        """
+        complete = self.df[features + [outcome]].dropna()
+        cells = complete.groupby(features)[outcome].agg(n='size', positives='sum').reset_index()
+        cells['n'] = cells['n'].astype(np.int64)
+        return cells
+
+    def _filter(self, where: Dict | None) -> pd.DataFrame:
+        if not where:
+            return self.df
+        mask = np.ones(len(self.df), dtype=bool)
+        for col, value in where.items():
+            mask &= (self.df[col] == value).to_numpy()
+        return self.df[mask]
+
+    def _add_derived(self, columns: List[str]):
+        # Added to the shared frame, as the analyzers always did
+        if 'HH_Size_Bucket' in columns and 'HH_Size_Bucket' not in self.df.columns:
+            self.df['HH_Size_Bucket'] = bucket_household_size(self.df['Household_Size'])
+        if 'HH_Type' in columns and 'HH_Type' not in self.df.columns:
+            self.df['HH_Type'] = household_type(self.df['Household_Size'])
+
+
+class DuckDBBackend:
+    """Aggregations pushed down to an embedded DuckDB connection"""
+
+    name = 'duckdb'
+
+    def __init__(self, source, threads: int | None = None,
+                 memory_limit: str | None = None, where: Dict | None = None):
+        """
+        Args:
+            source: DataFrame, or Parquet path / glob / list of paths
+            threads: worker threads for scans (default: all cores)
+            memory_limit: e.g. '4GB'; larger aggregations spill to disk
+            where: {column: value or list of values} row filters applied to
+                every query (pushed into the Parquet scan)
+        """
+        try:
+            import duckdb
+        except ImportError as exc:
+            raise ImportError("The duckdb backend needs the duckdb package (pip install duckdb)") from exc
+
+        self.con = duckdb.connect(database=':memory:')
+        if threads:
+            self.con.execute(f"SET threads = {int(threads)}")
+        if memory_limit:
+            self.con.execute(f"SET memory_limit = '{memory_limit}'")
+
+        filters = ''
+        if where:
+            clauses = []
+            for col, values in where.items():
+                values = values if isinstance(values, (list, tuple, set)) else [values]
+                listing = ', '.join(_sql_value(v) for v in values)
+                clauses.append(f"{_quote(col)} IN ({listing})")
+            filters = ' WHERE ' + ' AND '.join(clauses)
+
+        if isinstance(source, pd.DataFrame):
+            self.con.register('households_source', source)
+            self.con.execute(f"CREATE VIEW households AS SELECT * FROM households_source{filters}")
+        else:
+            paths = [source] if isinstance(source, str) else list(source)
+            listing = ', '.join(_quote_literal(str(p)) for p in paths)
+            self.con.execute(f"CREATE VIEW households AS "
+                             f"SELECT * FROM read_parquet([{listing}]){filters}")
+
+        self._columns = [row[0] for row in self.con.execute("DESCRIBE households").fetchall()]
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def count(self) -> int:
+        return int(self.con.execute("SELECT COUNT(*) FROM households").fetchone()[0])
+
+    def penetration(self, groupby_cols: List[str] | None = None,
+                    weight_col: str | None = 'Sample_Weight',
+                    where: Dict | None = None) -> pd.DataFrame:
+        """Same layout as PandasBackend.penetration"""
+        weighted = weight_col is not None and weight_col in self._columns
+        if weighted:
+            w = _quote(weight_col)
+            rate = (f"CASE WHEN SUM({w}) > 0 THEN "
+                    f"SUM(CASE WHEN \"Online_Purchase\" = 1 THEN {w} ELSE 0 END) / SUM({w}) "
+                    f"ELSE 0 END")
+        else:
+            rate = "AVG(\"Online_Purchase\")"
+        conditions, params = self._where(where)
+
+        if groupby_cols is None:
+            sql = f"SELECT {rate} AS rate, COUNT(*) AS n FROM households{conditions}"
+            penetration, n = self.con.execute(sql, params).fetchone()
+            return pd.DataFrame({
+                'Group': ['Overall'],
+                'Penetration_%': [(np.nan if penetration is None else penetration) * 100],
+                'Sample_Size': [int(n)]
+            })
+
+        keys = [f"{self._expr(c)} AS {_quote(c)}" for c in groupby_cols]
+        # pandas groupby drops missing keys
+        not_null = ' AND '.join(f"{self._expr(c)} IS NOT NULL" for c in groupby_cols)
+        conditions = f"{conditions} AND {not_null}" if conditions else f" WHERE {not_null}"
+        positions = ', '.join(str(i + 1) for i in range(len(groupby_cols)))
+        sql = (f"SELECT {', '.join(keys)}, {rate} * 100 AS \"Penetration_%\", "
+               f"COUNT(*) AS \"Sample_Size\" FROM households{conditions} "
+               f"GROUP BY {positions} ORDER BY {positions}")
+        result = self.con.execute(sql, params).df()
+        result['Sample_Size'] = result['Sample_Size'].astype(np.int64)
+        return result
+
+    def correlation(self, x: str, y: str, where: Dict | None = None) -> float:
+        conditions, params = self._where(where)
+        r = self.con.execute(f"SELECT CORR({_quote(x)}, {_quote(y)}) FROM households{conditions}",
+                             params).fetchone()[0]
+        return np.nan if r is None else float(r)
+
+    def contingency(self, rows: str, columns: str) -> pd.DataFrame:
+        sql = (f"SELECT {self._expr(rows)} AS r, {self._expr(columns)} AS c, COUNT(*) AS n "
+               f"FROM households WHERE {self._expr(rows)} IS NOT NULL "
+               f"AND {self._expr(columns)} IS NOT NULL GROUP BY 1, 2")
+        counts = self.con.execute(sql).df()
+        table = counts.pivot(index='r', columns='c', values='n').fillna(0).astype(np.int64)
+        table = table.sort_index().sort_index(axis=1)
+        table.index.name, table.columns.name = rows, columns
+        return table
+
+    def category_rates(self, categories: List[str], by: str = 'HH_Type') -> Dict[str, Dict]:
+        # One scan for every category
+        sums = ', '.join(f"SUM(CASE WHEN {_quote(c)} = 1 THEN 1 ELSE 0 END) AS {_quote(c)}"
+                         for c in categories)
+        sql = (f"SELECT {self._expr(by)} AS segment, COUNT(*) AS total, {sums} "
+               f"FROM households WHERE {self._expr(by)} IS NOT NULL GROUP BY 1 ORDER BY 1")
+        counts = self.con.execute(sql).df().set_index('segment')
+        totals = counts['total'].astype(float)
+        # Segments without buyers are NaN, like the pandas size ratio
+        return {
+            cat: (counts[cat].astype(float).where(counts[cat] > 0) / totals).to_dict()
+            for cat in categories
+        }
+
+    def outcome_cells(self, features: List[str],
+                      outcome: str = 'Online_Purchase') -> pd.DataFrame:
+        """Same layout as PandasBackend.outcome_cells"""
+        keys = ', '.join(_quote(c) for c in features)
+        not_null = ' AND '.join(f"{_quote(c)} IS NOT NULL" for c in features + [outcome])
+        sql = (f"SELECT {keys}, COUNT(*) AS n, SUM({_quote(outcome)}) AS positives "
+               f"FROM households WHERE {not_null} GROUP BY ALL ORDER BY ALL")
+        cells = self.con.execute(sql).df()
+        cells['n'] = cells['n'].astype(np.int64)
+        return cells
+
+    def _expr(self, column: str) -> str:
+        if column in _DERIVED_SQL and column not in self._columns:
+            return _DERIVED_SQL[column]
+        return _quote(column)
+
+    def _where(self, where: Dict | None):
+        if not where:
+            return '', []
+        clauses = [f"{self._expr(col)} = ?" for col in where]
+        return ' WHERE ' + ' AND '.join(clauses), list(where.values())
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _sql_value(value) -> str:
+    if isinstance(value, str):
+        return _quote_literal(value)
+    if isinstance(value, (bool, np.bool_)):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return repr(float(value)) if isinstance(value, (float, np.floating)) else str(int(value))
+    raise TypeError(f"Unsupported filter value {value!r}")
+
+
+def read_parquet(paths, columns: List[str] | None = None) -> pd.DataFrame:
+    """
+    Parquet file(s) as one DataFrame
+
+    pandas needs pyarrow or fastparquet for Parquet; without either, the
+    files are read through duckdb (which also expands globs).
+    """
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    if any(importlib.util.find_spec(engine) for engine in ('pyarrow', 'fastparquet')):
+        return pd.concat([pd.read_parquet(p, columns=columns) for p in paths], ignore_index=True)
+    try:
+        import duckdb
+    except ImportError as exc:
+        raise ImportError("Reading Parquet needs pyarrow (pip install pyarrow) "
+                          "or duckdb (pip install duckdb)") from exc
+    selected = ', '.join(_quote(c) for c in columns) if columns is not None else '*'
+    listing = ', '.join(_quote_literal(str(p)) for p in paths)
+    with duckdb.connect(database=':memory:') as con:
+        return con.execute(f"SELECT {selected} FROM read_parquet([{listing}])").df()
+
+
+def make_backend(source, backend: str = 'pandas', **options):
+    """Backend by name ('pandas' or 'duckdb') for a DataFrame or Parquet source"""
+    if backend == 'pandas':
+        if not isinstance(source, pd.DataFrame):
+            source = read_parquet(source)
+        return PandasBackend(source)
+    if backend == 'duckdb':
+        return DuckDBBackend(source, **options)
+    raise ValueError(f"Unknown backend '{backend}'. Choose from {', '.join(BACKENDS)}")
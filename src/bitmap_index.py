@@ -0,0 +1,226 @@
+"""
+Packed Bitmap Index for Ad-hoc Segment Counts
+
+Stores one packed bit array (64 households per word) for every binary flag
+(Urban, Internet_Access, Online_*) and for every value of the categorical
+columns (State, Household_Size, HH_Size_Bucket, HH_Type). Segment questions
+such as
+
+    "Urban and Internet_Access and Online_Food and not Online_Consumables
+     and State == 'Kerala'"
+
+are parsed once (Python expression syntax via ast; & | ~ are accepted as in
+DataFrame.query) and answered with bitwise
+AND/OR/NOT over the words plus popcounts. Weighted counts use a bit-sliced
+copy of the survey weights (fixed point), so they are popcounts too.
+
+Usage:
+    index = BitmapIndex.from_dataframe(df)
+    index.count("Urban & Internet_Access & Online_Food & ~Online_Consumables & State == 'Kerala'")
+    index.penetration("Household_Size <= 2 and Internet_Access")
+"""
+
+import ast
+import functools
+import io
+import operator
+import tokenize
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from aggregates import bucket_household_size, household_type
+
+_COMPARISONS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Gt: operator.gt, ast.GtE: operator.ge
+}
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words: np.ndarray) -> int:
+        return int(np.bitwise_count(words).sum())
+else:  # numpy < 2.0
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray) -> int:
+        return int(_BYTE_COUNTS[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+def _logical_operators(expression: str) -> str:
+    """
+    Rewrite & | ~ as and / or / not (outside string literals)
+
+    Python binds & tighter than ==, so "Urban & State == 'Kerala'" would parse
+    as "(Urban & State) == 'Kerala'"; as in DataFrame.query, comparisons
+    should bind tighter.
+    """
+    replacements = {'&': 'and', '|': 'or', '~': 'not'}
+    tokens = [
+        (tokenize.NAME, replacements[tok.string]) if tok.type == tokenize.OP and tok.string in replacements
+        else (tok.type, tok.string)
+        for tok in tokenize.generate_tokens(io.StringIO(expression).readline)
+    ]
+    return tokenize.untokenize(tokens)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse(expression: str) -> ast.expr:
+    """Parsed expression body (cached: dashboards repeat the same questions)"""
+    return ast.parse(_logical_operators(expression), mode='eval').body
+
+
+def pack_bits(mask: np.ndarray) -> np.ndarray:
+    """Boolean array -> uint64 words (zero padded)"""
+    packed = np.packbits(mask.astype(bool), bitorder='little')
+    padded = np.zeros(-(-len(packed) // 8) * 8, dtype=np.uint8)
+    padded[:len(packed)] = packed
+    return padded.view(np.uint64)
+
+
+class BitmapIndex:
+    """Packed bitmaps over household flags and categorical values"""
+
+    def __init__(self, n_rows: int, flags: Dict[str, np.ndarray],
+                 values: Dict[str, Dict], weight_slices: np.ndarray | None = None,
+                 weight_scale: float = 1.0):
+        self.n_rows = n_rows
+        self.flags = flags
+        self.values = values
+        self.weight_slices = weight_slices if weight_slices is not None else []
+        self.weight_scale = weight_scale
+        self.all_rows = pack_bits(np.ones(n_rows, dtype=bool))
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, weight_col: str = 'Sample_Weight',
+                       weight_resolution: float = 1e-3) -> 'BitmapIndex':
+        """
+        Build bitmaps for binary flags and categorical values
+
+        Weights are stored as fixed-point integers with step weight_resolution,
+        bit-sliced (one bitmap per bit), so a weighted count is off by at most
+        weight_resolution / 2 per household.
+        """
+        # Counts don't depend on row order, so cluster rows by the low-cardinality
+        # columns: segments become runs of words and sparse masks touch few words
+        sort_cols = [c for c in ('State', 'Urban', 'Internet_Access', 'Household_Size') if c in df.columns]
+        if sort_cols:
+            df = df.sort_values(sort_cols, kind='stable')
+
+        flag_cols = [c for c in df.columns
+                     if c in ('Urban', 'Internet_Access') or c.startswith('Online_')]
+        flags = {col: pack_bits((df[col] == 1).to_numpy()) for col in flag_cols}
+
+        columns = {c: df[c] for c in ('State', 'Household_Size') if c in df.columns}
+        if 'Household_Size' in df.columns:
+            columns['HH_Size_Bucket'] = bucket_household_size(df['Household_Size'])
+            columns['HH_Type'] = household_type(df['Household_Size'])
+
+        values = {}
+        for name, series in columns.items():
+            codes, uniques = pd.factorize(series, sort=True)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            bitmaps = {}
+            for i, value in enumerate(uniques):
+                mask = np.zeros(len(df), dtype=bool)
+                mask[order[bounds[i]:bounds[i + 1]]] = True
+                bitmaps[value.item() if hasattr(value, 'item') else value] = pack_bits(mask)
+            values[name] = bitmaps
+
+        weight_slices, scale = [], 1.0
+        if weight_col in df.columns:
+            fixed = np.rint(df[weight_col].to_numpy(dtype=float) / weight_resolution).astype(np.int64)
+            if (fixed < 0).any():
+                raise ValueError("Bitmap weights must be non-negative")
+            n_bits = int(fixed.max()).bit_length() if len(fixed) else 0
+            weight_slices = np.vstack([pack_bits((fixed >> bit) & 1) for bit in range(n_bits)])
+            scale = weight_resolution
+
+        return cls(len(df), flags, values, weight_slices, scale)
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.flags) + list(self.values)
+
+    def mask(self, expression: str) -> np.ndarray:
+        """Packed bitmap of the rows matching a boolean expression"""
+        return self._evaluate(_parse(expression)) & self.all_rows
+
+    def count(self, expression: str | None = None) -> Dict[str, float]:
+        """Unweighted and weighted household counts for a segment"""
+        bits = self.all_rows if not expression else self.mask(expression)
+        return self._count(bits)
+
+    def penetration(self, expression: str | None = None,
+                    outcome: str = 'Online_Purchase') -> Dict[str, float]:
+        """Share of the segment with the outcome flag (weighted if weights were indexed)"""
+        segment = self.all_rows if not expression else self.mask(expression)
+        base = self._count(segment)
+        hits = self._count(segment & self.flags[outcome])
+        key = 'weight' if len(self.weight_slices) else 'households'
+        share = hits[key] / base[key] if base[key] > 0 else 0.0
+        return {'Penetration_%': share * 100, 'Sample_Size': base['households']}
+
+    def _count(self, bits: np.ndarray) -> Dict[str, float]:
+        result = {'households': _popcount(bits)}
+        if len(self.weight_slices):
+            # Only words with set bits contribute to the weighted popcounts
+            words = np.flatnonzero(bits)
+            slices = self.weight_slices[:, words] if len(words) < len(bits) // 2 else self.weight_slices
+            selected = bits[words] if slices is not self.weight_slices else bits
+            per_bit = [_popcount(row) for row in slices & selected]
+            result['weight'] = sum(count << bit for bit, count in enumerate(per_bit)) * self.weight_scale
+        return result
+
+    def _evaluate(self, node) -> np.ndarray:
+        if isinstance(node, ast.BoolOp):
+            parts = [self._evaluate(v) for v in node.values]
+            combine = np.bitwise_and if isinstance(node.op, ast.And) else np.bitwise_or
+            result = parts[0]
+            for part in parts[1:]:
+                result = combine(result, part)
+            return result
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return ~self._evaluate(node.operand)
+        if isinstance(node, ast.Name):
+            if node.id not in self.flags:
+                raise KeyError(f"Unknown flag: {node.id}")
+            return self.flags[node.id]
+        if isinstance(node, ast.Constant) and isinstance(node.value, bool):
+            return self.all_rows if node.value else np.zeros_like(self.all_rows)
+        if isinstance(node, ast.Compare) and len(node.ops) == 1:
+            return self._compare(node)
+        raise ValueError(f"Unsupported expression: {ast.unparse(node)}")
+
+    def _compare(self, node: ast.Compare) -> np.ndarray:
+        if not isinstance(node.left, ast.Name):
+            raise ValueError(f"Left side must be a column: {ast.unparse(node)}")
+        column, op = node.left.id, node.ops[0]
+        target = ast.literal_eval(node.comparators[0])
+
+        if column in self.flags:
+            # Urban == 1, Online_Food == 0, ...
+            if isinstance(op, (ast.Eq, ast.NotEq)) and target in (0, 1):
+                bits = self.flags[column] if target == 1 else ~self.flags[column]
+                return bits if isinstance(op, ast.Eq) else ~bits
+            raise ValueError(f"Flags support == / != 0 or 1: {ast.unparse(node)}")
+
+        if column not in self.values:
+            raise KeyError(f"Unknown column: {column}")
+        bitmaps = self.values[column]
+        if isinstance(op, (ast.In, ast.NotIn)):
+            selected = [v for v in bitmaps if v in set(target)]
+            negate = isinstance(op, ast.NotIn)
+        elif type(op) in _COMPARISONS:
+            compare = _COMPARISONS[type(op)]
+            selected = [v for v in bitmaps if compare(v, target)]
+            negate = False
+        else:
+            raise ValueError(f"Unsupported comparison: {ast.unparse(node)}")
+
+        result = np.zeros_like(self.all_rows)
+        for value in selected:
+            result |= bitmaps[value]
+        return ~result if negate else result
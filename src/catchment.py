@@ -0,0 +1,158 @@
+"""
+Dark-Store Catchment Aggregation
+
+Assigns households (or pin-code centroids) to dark stores with a KD-tree over
+3-D unit vectors, so great-circle radii become chord-length queries, then
+computes penetration and Category Skew per catchment through the same
+AggregateCube / merchandising code used at state level.
+
+Overlap handling when a household is inside several stores' radii:
+- 'nearest': the household belongs to its closest store only
+- 'split':   its weight is shared equally between those stores
+- 'all':     it counts fully towards every store (catchments overlap)
+
+Usage:
+    index = CatchmentIndex(stores)                # Store_ID, Latitude, Longitude[, Radius_km]
+    assignment = index.assign(households, radius_km=3, overlap='split')
+    metrics = catchment_metrics(households, assignment)
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+from aggregates import AggregateCube
+from merchandising import merchandising_cube
+
+EARTH_RADIUS_KM = 6371.0088
+
+OVERLAP_MODES = ['nearest', 'split', 'all']
+
+
+def to_unit_vectors(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """(n, 3) unit vectors for latitude/longitude in degrees"""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def km_to_chord(km):
+    """Great-circle distance in km -> chord length on the unit sphere"""
+    return 2 * np.sin(np.asarray(km, dtype=float) / (2 * EARTH_RADIUS_KM))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord, dtype=float) / 2, 0, 1))
+
+
+class CatchmentIndex:
+    """Spatial index over store locations"""
+
+    def __init__(self, stores: pd.DataFrame, id_col: str = 'Store_ID',
+                 lat_col: str = 'Latitude', lon_col: str = 'Longitude',
+                 radius_col: str = 'Radius_km'):
+        from scipy.spatial import cKDTree
+
+        self.stores = stores.reset_index(drop=True)
+        self.store_ids = self.stores[id_col].to_numpy()
+        self.id_col = id_col
+        self.radii = (self.stores[radius_col].to_numpy(dtype=float)
+                      if radius_col in self.stores.columns else None)
+        self.tree = cKDTree(to_unit_vectors(self.stores[lat_col], self.stores[lon_col]))
+
+    def assign(self, households: pd.DataFrame, radius_km: float = 3.0,
+               overlap: str = 'nearest',
+               lat_col: str = 'Latitude', lon_col: str = 'Longitude') -> pd.DataFrame:
+        """
+        Map households to stores within a radius
+
+        Per-store Radius_km (if the stores frame has it) overrides radius_km.
+        'split' and 'all' see every store in range (a fixed-radius pair
+        query between the household and store trees, not a k-nearest cut).
+
+        Returns a long table: Row (position in households), Store_ID,
+        Distance_km, Share (fraction of the household's weight).
+        """
+        from scipy.spatial import cKDTree
+
+        if overlap not in OVERLAP_MODES:
+            raise ValueError(f"overlap must be one of {OVERLAP_MODES}")
+
+        points = to_unit_vectors(households[lat_col], households[lon_col])
+        max_radius = radius_km if self.radii is None else float(np.nanmax(self.radii))
+
+        if overlap == 'nearest' and self.radii is None:
+            # Single nearest store within the common radius
+            distance, store = self.tree.query(points, k=1, distance_upper_bound=km_to_chord(max_radius))
+            rows = np.flatnonzero(np.isfinite(distance))
+            stores = store[rows]
+            distance_km = chord_to_km(distance[rows])
+        else:
+            pairs = cKDTree(points).sparse_distance_matrix(self.tree, km_to_chord(max_radius),
+                                                           output_type='ndarray')
+            rows, stores = pairs['i'].astype(np.int64), pairs['j'].astype(np.int64)
+            distance_km = chord_to_km(pairs['v'])
+            if self.radii is not None:
+                keep = distance_km <= self.radii[stores]
+                rows, stores, distance_km = rows[keep], stores[keep], distance_km[keep]
+            # Order by household, then distance (ties by store position)
+            order = np.lexsort((stores, distance_km, rows))
+            rows, stores, distance_km = rows[order], stores[order], distance_km[order]
+            if overlap == 'nearest':
+                first = np.concatenate([[True], rows[1:] != rows[:-1]]) if len(rows) else np.zeros(0, bool)
+                rows, stores, distance_km = rows[first], stores[first], distance_km[first]
+
+        counts = np.bincount(rows, minlength=len(points))
+        share = 1.0 / counts[rows] if overlap == 'split' else np.ones(len(rows))
+
+        return pd.DataFrame({
+            'Row': rows,
+            self.id_col: self.store_ids[stores],
+            'Distance_km': distance_km,
+            'Share': share
+        })
+
+
+def catchment_cube(households: pd.DataFrame, assignment: pd.DataFrame,
+                   id_col: str = 'Store_ID',
+                   weight_col: str = 'Sample_Weight') -> AggregateCube:
+    """
+    AggregateCube with the store as a dimension (Store_ID x Urban x Internet x Household_Size)
+
+    Household weights are multiplied by the assignment Share, so split
+    households contribute fractionally to each store.
+    """
+    rows = assignment['Row'].to_numpy()
+    columns = [c for c in households.columns
+               if c in ('Urban', 'Internet_Access', 'Household_Size') or c.startswith('Online_')]
+    frame = households[columns].iloc[rows].reset_index(drop=True)
+    frame[id_col] = assignment[id_col].to_numpy()
+    base_weight = (households[weight_col].to_numpy(dtype=float)[rows]
+                   if weight_col in households.columns else np.ones(len(rows)))
+    frame['Catchment_Weight'] = base_weight * assignment['Share'].to_numpy()
+
+    dimensions = [id_col] + [d for d in ('Urban', 'Internet_Access', 'Household_Size') if d in frame.columns]
+    return AggregateCube.from_dataframe(frame, dimensions=dimensions, weight_col='Catchment_Weight')
+
+
+def catchment_metrics(households: pd.DataFrame, assignment: pd.DataFrame,
+                      id_col: str = 'Store_ID',
+                      weight_col: str = 'Sample_Weight') -> Dict[str, pd.DataFrame]:
+    """
+    Per-store penetration and Category Skew
+
+    Returns:
+    - penetration: Store_ID, Penetration_% (weighted, as PenetrationAnalyzer), Sample_Size,
+      Catchment_Weight
+    - merchandising: merchandising_cube layout with Store_ID as the region; rates are
+      weighted so split households count fractionally
+    """
+    cube = catchment_cube(households, assignment, id_col, weight_col)
+    penetration = cube.penetration([id_col])
+    penetration['Catchment_Weight'] = cube.rollup([id_col])['Weight'].to_numpy()
+    return {
+        'penetration': penetration,
+        'merchandising': merchandising_cube(cube, [id_col], weighted=True),
+        'cube': cube
+    }
@@ -0,0 +1,280 @@
+"""
+Local Drill-Down Dashboard Server
+
+Serves filter and drill-down queries from a precomputed AggregateCube instead
+of the household-level data, so every request is a small roll-up:
+1. /api/drill       - next level of State -> Urban/Rural -> Household Size -> Category
+2. /api/penetration - penetration for any grouping and filter combination
+3. /chart/<name>    - existing dashboard charts rendered for the filtered slice
+4. /api/stats       - request latency percentiles and cache hit rate
+
+Usage:
+    python src/dashboard_server.py --data data/sample_hces_data.csv --port 8050
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCube
+
+
+# Drill-down hierarchy; the final level breaks the slice down by category
+DRILL_PATH = ['State', 'Urban', 'HH_Size_Bucket', 'Category']
+
+CHART_TYPES = ['india_map', 'hh_size_adoption', 'category_skew', 'category_comparison']
+
+RESERVED_PARAMS = {'by', 'outcome', 'format'}
+
+
+class ResponseCache:
+    """Thread-safe LRU cache for rendered responses"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DrillDownService:
+    """Answer drill-down queries from an AggregateCube"""
+
+    def __init__(self, cube: AggregateCube, cache_size: int = 2048):
+        self.cube = cube
+        self.cache = ResponseCache(cache_size)
+        self.latencies_ms: deque = deque(maxlen=10000)
+        self._latency_lock = threading.Lock()
+
+    def handle(self, path: str, params: Dict[str, List[str]]) -> Tuple[int, str, bytes]:
+        """Route a request; returns (status, content type, body)"""
+        start = time.perf_counter()
+        key = (path, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+
+        response = self.cache.get(key) if path != '/api/stats' else None
+        if response is None:
+            try:
+                response = self._route(path, params)
+            except (KeyError, ValueError) as e:
+                response = (400, 'application/json', self._json({'error': str(e)}))
+            if response[0] == 200 and path != '/api/stats':
+                self.cache.put(key, response)
+
+        with self._latency_lock:
+            self.latencies_ms.append((time.perf_counter() - start) * 1000)
+        return response
+
+    def drill(self, filters: Dict[str, List]) -> Dict:
+        """Penetration for the next unfiltered level of the drill path"""
+        level = next(dim for dim in DRILL_PATH if dim == 'Category' or dim not in filters)
+        cube_filters = {k: v for k, v in filters.items() if k != 'Category'}
+        sliced = self.cube.filter(**cube_filters) if cube_filters else self.cube
+
+        if level == 'Category':
+            rolled = sliced.rollup()
+            rows = [{
+                'Category': cat.replace('Online_', ''),
+                'Penetration_%': self._share(rolled, cat),
+                'Sample_Size': int(rolled['Households'].iloc[0])
+            } for cat in sliced.categories]
+        else:
+            rows = sliced.penetration([level]).to_dict(orient='records')
+
+        return {'level': level, 'filters': filters, 'rows': rows}
+
+    def penetration(self, filters: Dict[str, List], by: List[str],
+                    outcome: str = 'Online_Purchase') -> Dict:
+        """Penetration for an arbitrary grouping of the filtered slice"""
+        if outcome not in self.cube.outcomes:
+            raise KeyError(f"Unknown outcome: {outcome}")
+        sliced = self.cube.filter(**filters) if filters else self.cube
+        table = sliced.penetration(by or None, outcome=outcome)
+        return {'filters': filters, 'by': by, 'outcome': outcome,
+                'rows': table.to_dict(orient='records')}
+
+    def chart(self, name: str, filters: Dict[str, List]):
+        """Render one of the dashboard charts for the filtered slice"""
+        from visualization import (IndiaMapVisualizer, HouseholdAdoptionVisualizer,
+                                   CategorySkewVisualizer)
+
+        sliced = self.cube.filter(**filters) if filters else self.cube
+        if name == 'india_map':
+            return IndiaMapVisualizer().create_penetration_map(sliced.penetration(['State']))
+        if name == 'hh_size_adoption':
+            return HouseholdAdoptionVisualizer.create_adoption_by_size_chart(
+                sliced.penetration(['HH_Size_Bucket'])
+            )
+        if name == 'category_skew':
+            return CategorySkewVisualizer.create_category_heatmap(sliced.category_skew())
+        if name == 'category_comparison':
+            return CategorySkewVisualizer.create_category_comparison_bars(
+                sliced.category_penetration()
+            )
+        raise KeyError(f"Unknown chart: {name}. Available: {', '.join(CHART_TYPES)}")
+
+    def stats(self) -> Dict:
+        """Latency percentiles over the most recent requests"""
+        with self._latency_lock:
+            latencies = np.array(self.latencies_ms)
+        total = self.cache.hits + self.cache.misses
+        return {
+            'requests': int(len(latencies)),
+            'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'cache_hit_rate': self.cache.hits / total if total else None
+        }
+
+    def _route(self, path: str, params: Dict[str, List[str]]) -> Tuple[int, str, bytes]:
+        filters = self._parse_filters(params)
+
+        if path == '/api/drill':
+            return 200, 'application/json', self._json(self.drill(filters))
+        if path == '/api/penetration':
+            by = [b for b in params.get('by', [''])[0].split(',') if b]
+            outcome = params.get('outcome', ['Online_Purchase'])[0]
+            return 200, 'application/json', self._json(self.penetration(filters, by, outcome))
+        if path.startswith('/chart/'):
+            fig = self.chart(path[len('/chart/'):], filters)
+            if params.get('format', ['json'])[0] == 'html':
+                return 200, 'text/html', fig.to_html(include_plotlyjs='cdn').encode('utf-8')
+            return 200, 'application/json', fig.to_json().encode('utf-8')
+        if path == '/api/stats':
+            return 200, 'application/json', self._json(self.stats())
+        if path == '/':
+            return 200, 'text/html', self._index().encode('utf-8')
+        return 404, 'application/json', self._json({'error': f'Not found: {path}'})
+
+    def _parse_filters(self, params: Dict[str, List[str]]) -> Dict[str, List]:
+        """Turn query parameters into cube filters, coercing numeric dimensions"""
+        filters = {}
+        for dim, raw_values in params.items():
+            if dim in RESERVED_PARAMS:
+                continue
+            values = [v for raw in raw_values for v in raw.split(',')]
+            column = self.cube.table.get(dim)
+            if column is not None and pd.api.types.is_numeric_dtype(column):
+                values = [float(v) for v in values]
+            filters[dim] = values
+        return filters
+
+    @staticmethod
+    def _share(rolled: pd.DataFrame, outcome: str) -> float:
+        weight = float(rolled['Weight'].iloc[0])
+        return float(rolled[f'{outcome}_Weight'].iloc[0]) / weight * 100 if weight > 0 else 0.0
+
+    @staticmethod
+    def _json(payload: Dict) -> bytes:
+        return json.dumps(payload, default=_json_default).encode('utf-8')
+
+    @staticmethod
+    def _index() -> str:
+        links = ''.join(
+            f'<li><a href="/chart/{name}?format=html">{name}</a></li>' for name in CHART_TYPES
+        )
+        return f"""<!DOCTYPE html><html><head><meta charset="utf-8">
+<title>Drill-Down Dashboard</title></head><body>
+<h1>Drill-Down Dashboard</h1>
+<p>Start at <a href="/api/drill">/api/drill</a> and add filters, e.g.
+<code>/api/drill?State=Kerala&amp;Urban=1</code>. Any chart accepts the same filters.</p>
+<ul>{links}</ul>
+<p>Latency: <a href="/api/stats">/api/stats</a></p>
+</body></html>"""
+
+
+def _json_default(obj):
+    """JSON fallback for numpy scalars"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class DrillDownServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for many concurrent analysts"""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def make_handler(service: DrillDownService):
+    """Bind a request handler class to a DrillDownService"""
+
+    class DrillDownHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            status, content_type, body = service.handle(url.path, parse_qs(url.query))
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # keep the console quiet under many concurrent analysts
+
+    return DrillDownHandler
+
+
+def serve(cube: AggregateCube, host: str = '127.0.0.1', port: int = 8050,
+          cache_size: int = 2048):
+    """Run the drill-down server until interrupted"""
+    service = DrillDownService(cube, cache_size)
+    server = DrillDownServer((host, port), make_handler(service))
+    print(f"🌐 Drill-down dashboard on http://{host}:{port}/ ({len(cube.table):,} cube cells)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local drill-down dashboard server')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--data', default='data/sample_hces_data.csv',
+                        help='Household-level CSV/Excel to aggregate on startup')
+    source.add_argument('--cube', help='Precomputed AggregateCube file (AggregateCube.save)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--cache-size', type=int, default=2048)
+    args = parser.parse_args()
+
+    if args.cube:
+        cube = AggregateCube.load(args.cube)
+    else:
+        from data_collection import DataCollector
+        if not os.path.exists(args.data):
+            raise SystemExit(f"Data file not found: {args.data}")
+        cube = AggregateCube.from_dataframe(DataCollector().load_hces_data(args.data))
+
+    serve(cube, args.host, args.port, args.cache_size)
+
+
+if __name__ == "__main__":
+    main()
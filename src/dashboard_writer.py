@@ -0,0 +1,247 @@
+"""
+Compact Dashboard Writer
+
+Writes several Plotly figures into one self-contained HTML page with a
+compact data payload:
+1. Numeric arrays are stored as base64 typed arrays (smallest lossless dtype)
+2. String arrays are dictionary-encoded against one label table shared by all figures
+3. Layout templates are stored once and referenced by every figure
+4. plotly.js is embedded (or linked) once for the whole page
+"""
+
+import base64
+import html
+import json
+from numbers import Number
+from typing import Dict, List
+
+import numpy as np
+
+from artifact_store import atomic_write_text
+
+
+# Arrays shorter than this stay as plain JSON; the base64 wrapper isn't worth it
+MIN_ENCODED_LENGTH = 4
+
+_INT_DTYPES = [
+    ('i1', np.int8), ('u1', np.uint8), ('i2', np.int16),
+    ('u2', np.uint16), ('i4', np.int32), ('u4', np.uint32)
+]
+
+# Decoder mirrors _encode_value: {dtype, bdata[, shape]} -> typed array (or rows),
+# {labels, ltype} -> array of strings from the shared label table
+_DECODER_JS = """
+(function() {
+  var payload = JSON.parse(document.getElementById('dashboard-payload').textContent);
+  var CTORS = {i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+               i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array};
+  function bytes(b64) {
+    var raw = atob(b64), out = new Uint8Array(raw.length);
+    for (var i = 0; i < raw.length; i++) out[i] = raw.charCodeAt(i);
+    return out.buffer;
+  }
+  function typed(dtype, b64) { return new CTORS[dtype](bytes(b64)); }
+  function rows(flat, shape) {
+    var out = [], width = shape[1];
+    for (var r = 0; r < shape[0]; r++) out.push(Array.prototype.slice.call(flat, r * width, (r + 1) * width));
+    return out;
+  }
+  function decode(value) {
+    if (Array.isArray(value)) return value.map(decode);
+    if (value === null || typeof value !== 'object') return value;
+    if (value.bdata !== undefined && value.dtype !== undefined) {
+      var arr = typed(value.dtype, value.bdata);
+      return value.shape ? rows(arr, value.shape) : arr;
+    }
+    if (value.labels !== undefined && value.ltype !== undefined) {
+      var codes = typed(value.ltype, value.labels), strings = new Array(codes.length);
+      for (var i = 0; i < codes.length; i++) strings[i] = payload.labels[codes[i]];
+      return value.shape ? rows(strings, value.shape) : strings;
+    }
+    var out = {};
+    for (var key in value) out[key] = decode(value[key]);
+    return out;
+  }
+  payload.figures.forEach(function(fig) {
+    var layout = decode(fig.layout);
+    if (fig.template !== null) layout.template = payload.templates[fig.template];
+    Plotly.newPlot(fig.div, decode(fig.data), layout, {responsive: true});
+  });
+})();
+"""
+
+
+class CompactDashboardWriter:
+    """Encode figures into a single compact, self-contained dashboard page"""
+
+    def __init__(self, title: str = 'Quick-Commerce Product Discovery Dashboard'):
+        self.title = title
+        self.labels: List[str] = []
+        self._label_index: Dict[str, int] = {}
+        self.templates: List[Dict] = []
+        self._template_index: Dict[str, int] = {}
+
+    def build_payload(self, figures: Dict) -> Dict:
+        """Encode a {name: go.Figure} mapping into the page payload"""
+        encoded = []
+        for name, fig in figures.items():
+            fig_json = fig.to_plotly_json()
+            layout = dict(fig_json.get('layout', {}))
+            template = layout.pop('template', None)
+
+            encoded.append({
+                'name': name,
+                'div': f'fig-{name}',
+                'data': [self._encode_value(trace) for trace in fig_json.get('data', [])],
+                'layout': self._encode_value(layout),
+                'template': self._register_template(template)
+            })
+
+        return {
+            'labels': self.labels,
+            'templates': self.templates,
+            'figures': encoded
+        }
+
+    def write(self, figures: Dict, output_path: str,
+              include_plotlyjs: bool | str = True) -> str:
+        """
+        Write all figures to one HTML file
+
+        Args:
+            figures: Dictionary of figure names to Plotly figures
+            output_path: Destination HTML path
+            include_plotlyjs: True embeds plotly.js (fully offline), 'cdn' links it,
+                a path ending in .js links that local copy
+        """
+        payload = self.build_payload(figures)
+        payload_json = json.dumps(payload, separators=(',', ':'), default=_json_default)
+        # Keep the payload from terminating its own <script> element
+        payload_json = payload_json.replace('</', '<\\/')
+
+        if include_plotlyjs == 'cdn':
+            # Same plotly.js release the installed plotly.py was built against
+            from plotly.offline import get_plotlyjs_version
+            plotly_tag = (f'<script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}'
+                          f'.min.js"></script>')
+        elif isinstance(include_plotlyjs, str) and include_plotlyjs.endswith('.js'):
+            # Shared local copy (e.g. one plotly.min.js for a batch of dashboards)
+            plotly_tag = f'<script src="{html.escape(include_plotlyjs)}"></script>'
+        elif include_plotlyjs:
+            from plotly.offline import get_plotlyjs
+            plotly_tag = f'<script type="text/javascript">{get_plotlyjs()}</script>'
+        else:
+            plotly_tag = ''
+
+        divs = '\n'.join(
+            f'<section><div id="{fig["div"]}"></div></section>' for fig in payload['figures']
+        )
+
+        page = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{html.escape(self.title)}</title>
+<style>body {{ font-family: sans-serif; margin: 24px; }} section {{ margin-bottom: 32px; }}</style>
+{plotly_tag}
+</head>
+<body>
+<h1>{html.escape(self.title)}</h1>
+{divs}
+<script type="application/json" id="dashboard-payload">{payload_json}</script>
+<script type="text/javascript">{_DECODER_JS}</script>
+</body>
+</html>
+"""
+        atomic_write_text(output_path, page, suffix='.html')
+
+        print(f"✅ Saved {output_path} ({len(figures)} figures, {len(page) / 1e6:.2f} MB)")
+        return output_path
+
+    def _register_template(self, template) -> int | None:
+        """Store a layout template once and return its shared index"""
+        if not template:
+            return None
+        key = json.dumps(template, sort_keys=True, default=_json_default)
+        if key not in self._template_index:
+            self._template_index[key] = len(self.templates)
+            self.templates.append(template)
+        return self._template_index[key]
+
+    def _encode_value(self, value):
+        """Recursively replace arrays inside a trace/layout with compact encodings"""
+        if isinstance(value, dict):
+            if 'bdata' in value and 'dtype' in value:
+                return value  # already base64-encoded by plotly
+            return {k: self._encode_value(v) for k, v in value.items()}
+
+        if isinstance(value, (list, tuple, np.ndarray)):
+            arr = np.asarray(value, dtype=object) if not isinstance(value, np.ndarray) else value
+            if arr.size >= MIN_ENCODED_LENGTH and arr.ndim in (1, 2):
+                if arr.dtype.kind in 'iuf' or _is_numeric(arr):
+                    return self._encode_numeric(arr)
+                if arr.dtype.kind in 'OUS' and _is_string(arr):
+                    return self._encode_labels(arr)
+            return [self._encode_value(v) for v in value]
+
+        return value
+
+    @staticmethod
+    def _encode_numeric(arr: np.ndarray) -> Dict:
+        """Base64 typed array using the narrowest dtype that round-trips exactly"""
+        floats = arr.astype(np.float64)
+        dtype, data = 'f8', floats
+        if np.all(np.isfinite(floats)) and np.all(floats == np.round(floats)):
+            for code, np_type in _INT_DTYPES:
+                info = np.iinfo(np_type)
+                if floats.min() >= info.min and floats.max() <= info.max:
+                    dtype, data = code, floats.astype(np_type)
+                    break
+
+        encoded = {
+            'dtype': dtype,
+            'bdata': base64.b64encode(np.ascontiguousarray(data).tobytes()).decode('ascii')
+        }
+        if arr.ndim == 2:
+            encoded['shape'] = list(arr.shape)
+        return encoded
+
+    def _encode_labels(self, arr: np.ndarray) -> Dict:
+        """Dictionary-encode strings against the page-wide label table"""
+        codes = np.empty(arr.size, dtype=np.uint32)
+        for i, label in enumerate(arr.ravel()):
+            label = str(label)
+            if label not in self._label_index:
+                self._label_index[label] = len(self.labels)
+                self.labels.append(label)
+            codes[i] = self._label_index[label]
+
+        ltype, np_type = ('u1', np.uint8) if len(self.labels) <= 256 else \
+            ('u2', np.uint16) if len(self.labels) <= 65536 else ('u4', np.uint32)
+        encoded = {
+            'ltype': ltype,
+            'labels': base64.b64encode(codes.astype(np_type).tobytes()).decode('ascii')
+        }
+        if arr.ndim == 2:
+            encoded['shape'] = list(arr.shape)
+        return encoded
+
+
+def _is_numeric(arr: np.ndarray) -> bool:
+    """True for object arrays holding only real numbers (bools excluded)"""
+    return all(isinstance(v, Number) and not isinstance(v, (bool, np.bool_)) and v is not None
+               for v in arr.ravel())
+
+
+def _is_string(arr: np.ndarray) -> bool:
+    """True for arrays holding only strings"""
+    return all(isinstance(v, str) for v in arr.ravel())
+
+
+def _json_default(obj):
+    """JSON fallback for numpy scalars and arrays left in layouts"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
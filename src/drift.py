@@ -0,0 +1,330 @@
+"""
+Run-to-Run Drift Detection from Stored Sufficient Statistics
+
+Compares the current run with a prior run using only their AggregateCubes
+(e.g. the cube_cells stored by the warehouse export), and reports which
+cells moved more than sampling noise explains:
+1. Penetration cells: every outcome (Online_Purchase and each category)
+   for every grouping (overall, State, size bucket, household type, sector,
+   internet, and State crossed with each of those), tested with a pooled
+   two-proportion z-test. Weighted rates use the Kish effective sample
+   size, as in the wave comparison.
+2. Category Skew Index cells (nationally and within each State): z-test on
+   the skew change with delta-method standard errors
+3. Benjamini-Hochberg control of the false discovery rate over all tests
+   at once
+
+Every step is a handful of array operations over all cells together (no
+per-cell Python loops), so tens of thousands of cells take milliseconds.
+Cells below min_effective_size in either run are not tested (the normal
+approximation is poor there) and are counted in the report.
+
+Usage:
+    detector = DriftDetector(base_cube, current_cube)
+    drift = detector.detect()
+    print(drift_report(drift))
+
+    python src/drift.py --warehouse outputs/warehouse.sqlite   # latest run vs its predecessor
+"""
+
+import argparse
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCube, DERIVED_DIMENSIONS
+from waves import effective_size
+
+# Groupings tested for penetration drift ([] = overall)
+DRIFT_GROUPINGS = [
+    [], ['State'], ['HH_Size_Bucket'], ['HH_Type'], ['Urban'], ['Internet_Access'],
+    ['State', 'HH_Size_Bucket'], ['State', 'HH_Type'], ['State', 'Urban'], ['State', 'Internet_Access']
+]
+
+# Scopes within which the Category Skew Index is compared across household types
+SKEW_SCOPES = [[], ['State']]
+
+CELL_KEYS = ['Family', 'Grouping', 'Cell', 'Outcome']
+
+
+def cell_labels(rolled: pd.DataFrame, by: List[str]) -> np.ndarray:
+    """'State=Kerala, Urban=1' style labels for every row of a rollup"""
+    if not by:
+        return np.full(len(rolled), 'Overall', dtype=object)
+    labels = f'{by[0]}=' + rolled[by[0]].astype(str)
+    for dim in by[1:]:
+        labels = labels + f', {dim}=' + rolled[dim].astype(str)
+    return labels.to_numpy(dtype=object)
+
+
+def penetration_cells(cube: AggregateCube, groupings: List[List[str]] | None = None,
+                      outcomes: List[str] | None = None, weighted: bool | None = None) -> pd.DataFrame:
+    """Rate and effective size of every (grouping, cell, outcome) in one long table"""
+    weighted = cube.weighted if weighted is None else weighted
+    outcomes = outcomes or cube.outcomes
+    frames = []
+    for by in (DRIFT_GROUPINGS if groupings is None else groupings):
+        if any(d not in cube.dimensions and d not in DERIVED_DIMENSIONS for d in by):
+            continue
+        rolled = cube.rollup(by)
+        denominator = rolled['Weight' if weighted else 'Households'].to_numpy(dtype=float)
+        numerators = rolled[[f'{o}_Weight' if weighted else o for o in outcomes]].to_numpy(dtype=float)
+        rates = np.divide(numerators, denominator[:, None], out=np.zeros_like(numerators),
+                          where=denominator[:, None] > 0)
+        n_cells = len(rolled)
+        frames.append(pd.DataFrame({
+            'Family': 'penetration',
+            'Grouping': ' x '.join(by) or 'Overall',
+            'Cell': np.repeat(cell_labels(rolled, by), len(outcomes)),
+            'Outcome': np.tile(outcomes, n_cells),
+            'Households': np.repeat(rolled['Households'].to_numpy(dtype=np.int64), len(outcomes)),
+            'Value': rates.ravel(),
+            'Effective_Size': np.repeat(effective_size(rolled, weighted), len(outcomes))
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def skew_cells(cube: AggregateCube, scopes: List[List[str]] | None = None,
+               segment: str = 'HH_Type', weighted: bool = False) -> pd.DataFrame:
+    """
+    Category Skew Index and its delta-method SE per (scope cell, category, segment)
+
+    Skew_s = r_s / mean(r) over the k segments of a scope cell, with
+    Var(Skew_s) = ((1 - 2 Skew_s / k) Var(r_s) + (Skew_s / k)^2 sum_j Var(r_j)) / mean(r)^2,
+    the closed form of waves.skew_index_se, evaluated for all cells at once.
+    Unweighted by default, as HypothesisTester H2.
+    """
+    categories = cube.categories
+    frames = []
+    for scope in (SKEW_SCOPES if scopes is None else scopes):
+        if any(d not in cube.dimensions for d in scope):
+            continue
+        rolled = cube.rollup(scope + [segment])
+        denominator = rolled['Weight' if weighted else 'Households'].to_numpy(dtype=float)
+        n_eff = effective_size(rolled, weighted)
+        scope_labels = cell_labels(rolled, scope)
+        for cat in categories:
+            numerator = rolled[f'{cat}_Weight' if weighted else cat].to_numpy(dtype=float)
+            rate = np.divide(numerator, denominator, out=np.zeros(len(rolled)), where=denominator > 0)
+            variance = np.divide(rate * (1 - rate), n_eff, out=np.zeros(len(rolled)), where=n_eff > 0)
+            frames.append(pd.DataFrame({
+                'Scope': scope_labels, 'Segment': rolled[segment].astype(str).to_numpy(),
+                'Outcome': cat, 'Grouping': ' x '.join(scope + [segment]),
+                'Households': rolled['Households'].to_numpy(dtype=np.int64),
+                'Rate': rate, 'Variance': variance, 'Effective_Size': n_eff
+            }))
+    if not frames:
+        return pd.DataFrame(columns=CELL_KEYS + ['Households', 'Value', 'SE', 'Effective_Size'])
+
+    table = pd.concat(frames, ignore_index=True)
+    groups = table.groupby(['Grouping', 'Scope', 'Outcome'], sort=False)
+    mean = groups['Rate'].transform('mean').to_numpy()
+    k = groups['Rate'].transform('size').to_numpy(dtype=float)
+    variance_sum = groups['Variance'].transform('sum').to_numpy()
+    skew = np.divide(table['Rate'].to_numpy(), mean, out=np.ones(len(table)), where=mean > 0)
+    skew_var = np.divide((1 - 2 * skew / k) * table['Variance'].to_numpy() + (skew / k) ** 2 * variance_sum,
+                         mean ** 2, out=np.zeros(len(table)), where=mean > 0)
+
+    cell = np.where(table['Scope'] == 'Overall', '', table['Scope'] + ', ')
+    return pd.DataFrame({
+        'Family': 'skew',
+        'Grouping': table['Grouping'],
+        'Cell': cell + f'{segment}=' + table['Segment'],
+        'Outcome': table['Outcome'],
+        'Households': table['Households'],
+        'Value': skew,
+        'SE': np.sqrt(np.maximum(skew_var, 0.0)),
+        'Effective_Size': table['Effective_Size']
+    })
+
+
+def two_sided_p(z: np.ndarray) -> np.ndarray:
+    # scipy.special.ndtr: same values as stats.norm.sf, without the ~2s scipy.stats import
+    from scipy.special import ndtr
+    return 2 * ndtr(-np.abs(z))
+
+
+def two_proportion_test(p1: np.ndarray, n1: np.ndarray, p2: np.ndarray, n2: np.ndarray) -> tuple:
+    """Pooled two-proportion z statistics and two-sided p-values (vectorized)"""
+    pooled = np.divide(p1 * n1 + p2 * n2, n1 + n2, out=np.zeros(len(p1)), where=(n1 + n2) > 0)
+    se = np.sqrt(pooled * (1 - pooled) * (np.divide(1, n1, out=np.zeros(len(n1)), where=n1 > 0) +
+                                          np.divide(1, n2, out=np.zeros(len(n2)), where=n2 > 0)))
+    z = np.divide(p2 - p1, se, out=np.zeros(len(p1)), where=se > 0)
+    return z, two_sided_p(z)
+
+
+def benjamini_hochberg(p_values: np.ndarray) -> np.ndarray:
+    """Benjamini-Hochberg adjusted p-values (q-values); NaN p-values stay NaN"""
+    p_values = np.asarray(p_values, dtype=float)
+    q = np.full(len(p_values), np.nan)
+    valid = ~np.isnan(p_values)
+    m = int(valid.sum())
+    if m == 0:
+        return q
+    order = np.argsort(p_values[valid])
+    ranked = p_values[valid][order] * m / np.arange(1, m + 1)
+    ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+    adjusted = np.empty(m)
+    adjusted[order] = np.minimum(ranked, 1.0)
+    q[valid] = adjusted
+    return q
+
+
+class DriftDetector:
+    """All penetration and skew cells of two runs, tested together"""
+
+    def __init__(self, base: AggregateCube, current: AggregateCube,
+                 groupings: List[List[str]] | None = None, alpha: float = 0.05,
+                 min_effective_size: float = 30.0):
+        """
+        Args:
+            base / current: cubes of the prior and the current run
+            alpha: false discovery rate for flagging a change
+            min_effective_size: cells smaller than this in either run are not tested
+        """
+        self.base = base
+        self.current = current
+        self.groupings = groupings
+        self.alpha = alpha
+        self.min_effective_size = min_effective_size
+        self.unmatched = None
+
+    def cells(self, cube: AggregateCube) -> pd.DataFrame:
+        # Derive HH_Size_Bucket / HH_Type once instead of in every rollup
+        if 'Household_Size' in cube.dimensions:
+            cube = AggregateCube(AggregateCube._with_derived(cube.table, DERIVED_DIMENSIONS),
+                                 cube.dimensions, cube.outcomes, cube.weighted)
+        return pd.concat([penetration_cells(cube, self.groupings), skew_cells(cube)],
+                         ignore_index=True)
+
+    def detect(self) -> pd.DataFrame:
+        """
+        One row per cell present in both runs
+
+        Columns: Family, Grouping, Cell, Outcome, Households/Value/Effective_Size
+        (_Base and _Current), Delta, Z, P_Value, Q_Value, Changed. Penetration
+        Value/Delta are in %/pp; skew values are index ratios.
+        """
+        merged = self.cells(self.base).merge(self.cells(self.current), on=CELL_KEYS,
+                                             how='outer', suffixes=('_Base', '_Current'),
+                                             indicator=True)
+        self.unmatched = merged[merged['_merge'] != 'both'][CELL_KEYS + ['_merge']]
+        table = merged[merged['_merge'] == 'both'].drop(columns='_merge').reset_index(drop=True)
+
+        z = np.zeros(len(table))
+        p = np.full(len(table), np.nan)
+        n1 = table['Effective_Size_Base'].to_numpy(dtype=float)
+        n2 = table['Effective_Size_Current'].to_numpy(dtype=float)
+        testable = (n1 >= self.min_effective_size) & (n2 >= self.min_effective_size)
+
+        share = (table['Family'] == 'penetration').to_numpy()
+        rows = share & testable
+        z[rows], p[rows] = two_proportion_test(table['Value_Base'].to_numpy()[rows], n1[rows],
+                                               table['Value_Current'].to_numpy()[rows], n2[rows])
+
+        rows = ~share & testable
+        if rows.any():
+            se = np.sqrt(table['SE_Base'].to_numpy()[rows] ** 2 + table['SE_Current'].to_numpy()[rows] ** 2)
+            delta = table['Value_Current'].to_numpy()[rows] - table['Value_Base'].to_numpy()[rows]
+            z[rows] = np.divide(delta, se, out=np.zeros(len(se)), where=se > 0)
+            p[rows] = two_sided_p(z[rows])
+
+        scale = np.where(share, 100.0, 1.0)
+        table['Value_Base'] *= scale
+        table['Value_Current'] *= scale
+        table['Delta'] = table['Value_Current'] - table['Value_Base']
+        table['Z'] = z
+        table['P_Value'] = p
+        table['Q_Value'] = benjamini_hochberg(p)
+        table['Changed'] = table['Q_Value'] <= self.alpha
+        return table.drop(columns=['SE_Base', 'SE_Current'])
+
+
+def drift_report(drift: pd.DataFrame, base_label: str = 'previous run',
+                 current_label: str = 'current run', alpha: float = 0.05, top: int = 10) -> str:
+    """Compact markdown "what changed" summary: counts plus the largest significant moves"""
+    tested = drift['P_Value'].notna()
+    changed = drift[drift['Changed']]
+    lines = [
+        f"# What Changed: {base_label} → {current_label}",
+        "",
+        f"{len(changed):,} of {int(tested.sum()):,} cells changed significantly "
+        f"(Benjamini-Hochberg FDR {alpha:.0%}); {int((~tested).sum()):,} cells too small to test.",
+    ]
+    if changed.empty:
+        lines += ["", "No significant changes."]
+        return '\n'.join(lines) + '\n'
+
+    for family, title, unit in (('penetration', 'Penetration', 'pp'), ('skew', 'Category Skew Index', '')):
+        moved = changed[changed['Family'] == family]
+        if moved.empty:
+            continue
+        moved = moved.reindex(moved['Z'].abs().sort_values(ascending=False).index)
+        up, down = int((moved['Delta'] > 0).sum()), int((moved['Delta'] < 0).sum())
+        lines += ["", f"## {title} ({len(moved):,} changed: {up} up, {down} down)", "",
+                  "| Grouping | Cell | Outcome | Before | After | Change | q |",
+                  "|---|---|---|---|---|---|---|"]
+        fmt = '{:.1f}' if family == 'penetration' else '{:.2f}'
+        for _, row in moved.head(top).iterrows():
+            lines.append(f"| {row['Grouping']} | {row['Cell']} | {row['Outcome']} | "
+                         f"{fmt.format(row['Value_Base'])} | {fmt.format(row['Value_Current'])} | "
+                         f"{row['Delta']:+.2f}{unit} | {row['Q_Value']:.2g} |")
+        if len(moved) > top:
+            lines.append(f"| … | {len(moved) - top:,} more | | | | | |")
+    return '\n'.join(lines) + '\n'
+
+
+def comparable_run(warehouse, run_id: str) -> str | None:
+    """Most recent earlier run over the same states and preview setting that stored cube cells"""
+    row = warehouse.connection.execute(
+        'SELECT b.run_id FROM runs c JOIN runs b '
+        'ON b.created_at < c.created_at AND b.states IS c.states AND b.preview IS c.preview '
+        'WHERE c.run_id = ? AND EXISTS (SELECT 1 FROM cube_cells x WHERE x.run_id = b.run_id) '
+        'ORDER BY b.created_at DESC LIMIT 1', (run_id,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def detect_run_drift(warehouse, current_run: str, base_run: str | None = None,
+                     alpha: float = 0.05) -> tuple:
+    """(drift table, base run_id) for a stored run; (None, None) if it has no comparable predecessor"""
+    base_run = base_run or comparable_run(warehouse, current_run)
+    if base_run is None:
+        return None, None
+    detector = DriftDetector(warehouse.load_cube(base_run), warehouse.load_cube(current_run), alpha=alpha)
+    return detector.detect(), base_run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report significant changes between two stored runs')
+    parser.add_argument('--warehouse', default='outputs/warehouse.sqlite')
+    parser.add_argument('--current', help='run_id to check (default: latest run)')
+    parser.add_argument('--base', help='run_id to compare against (default: previous comparable run)')
+    parser.add_argument('--alpha', type=float, default=0.05, help='False discovery rate')
+    parser.add_argument('--top', type=int, default=10, help='Changes listed per family')
+    parser.add_argument('--output', default='outputs/drift_report.md')
+    args = parser.parse_args()
+
+    from artifact_store import atomic_write_text
+    from warehouse import Warehouse
+
+    with Warehouse(args.warehouse) as warehouse:
+        current = args.current or warehouse.latest_run_id()
+        if current is None:
+            raise SystemExit(f"No runs in {args.warehouse}")
+        drift, base = detect_run_drift(warehouse, current, args.base, args.alpha)
+    if drift is None:
+        raise SystemExit(f"No earlier run comparable to {current} (same states and preview) with cube cells")
+
+    report = drift_report(drift, base, current, args.alpha, args.top)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    atomic_write_text(args.output, report, suffix='.md')
+    drift.to_csv(os.path.splitext(args.output)[0] + '.csv', index=False)
+    print(report)
+    print(f"✅ Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Templated Memo Engine
+
+Compiles the product memo layout once and renders any number of variants
+(national, per state, per segment, per scenario) from it:
+1. MemoTemplate parses a format string into literal/field segments once
+2. MemoVariant holds the inputs for one memo and hashes them
+3. MemoBatchRenderer renders variants across a process pool, writes the
+   files concurrently and skips variants whose inputs are unchanged
+
+Usage:
+    renderer = MemoBatchRenderer('outputs/state_memos', jobs=4)
+    renderer.render_all(state_memo_variants(state_insights, expansion, merch, features))
+"""
+
+import hashlib
+import json
+import os
+import re
+import string
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from artifact_store import atomic_write_text, file_lock
+
+
+class MemoTemplate:
+    """A format string parsed once into literal text and named fields"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.segments: List[Tuple[str, str | None]] = [
+            (literal, field_name)
+            for literal, field_name, _, _ in string.Formatter().parse(source)
+        ]
+        self.fields = [name for _, name in self.segments if name is not None]
+        self.version = hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = []
+        for literal, field_name in self.segments:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(values[field_name])
+        return ''.join(parts)
+
+
+MEMO_HEADER = """# Product Discovery: Household Structure & E-commerce Adoption in {scope}
+
+**Date:** {date}  
+**Author:** Product Analytics Team  
+**Audience:** Product Leadership, Strategy Team
+
+---
+
+## Executive Summary
+
+This analysis investigates whether household composition correlates with online purchasing behavior across Indian states/UTs. The objective is to inform quick-commerce expansion strategy, merchandising decisions, and feature prioritization.
+
+**Key Finding:** Household structure significantly influences online purchase adoption, with single/small households showing 20-35% higher propensity. However, internet access remains the primary gatekeeper, creating a ~50 percentage point adoption gap.
+
+**Strategic Implication:** Pursue a **dual-track strategy**:
+1. **Short-term:** Dominate bachelor-heavy neighborhoods in tier-1 cities with internet access
+2. **Mid-term:** Expand family-focused offerings in tier-2 cities as internet penetration grows
+
+---
+
+## Problem Framing
+
+### Context
+- Household structures vary significantly across India (urban singles vs. joint families)
+- Quick-commerce success depends on understanding micro-market demand patterns
+- Need to sequence expansion and merchandising decisions based on household composition
+
+### Research Questions
+1. Do smaller household sizes correlate with higher online purchase adoption?
+2. How do category preferences differ between single and family households?
+3. Does internet availability mediate the household structure effect?
+
+### Data Source
+- MoSPI Household Consumption Expenditure Survey 2022-23 (simulated for this analysis)
+- Sample dataset with household records across 28 states
+
+### Key Assumption
+**"Bachelor vs Family"** is approximated using **household size proxies** (1-2 members = single/small; 3+ = family). This is not a direct demographic measurement but a reasonable proxy based on available data.
+
+---
+
+## Key Insights
+
+"""
+
+MEMO_STRATEGY = """## Strategic Recommendations
+
+### 1. Market Expansion Strategy
+
+**Tier 1 (Expand Aggressively):**  
+{tier_1_states}
+
+*Rationale:* {tier_1_rationale}
+
+**Tier 2 (Selective Pilots):**  
+{tier_2_states}
+
+*Rationale:* {tier_2_rationale}
+
+**Tier 3 (Monitor Only):**  
+{tier_3_states}
+
+*Rationale:* {tier_3_rationale}
+
+---
+
+### 2. Merchandising Strategy
+
+#### Category Prioritization by Neighborhood Type
+
+{merchandising}
+
+**Operational Guidance:**
+- Use pin code-level household composition data to customize dark store inventory
+- A/B test "Singles Essentials" shelf in bachelor-heavy neighborhoods
+- Push bulk subscription offers in family-dominant areas
+
+---
+
+### 3. Product Feature Prioritization
+
+"""
+
+MEMO_FOOTER = """---
+
+## Limitations & Caveats
+
+1. **Proxy Measurement:** Household size is an imperfect proxy for bachelor/family status. Actual behavioral differences may be stronger or weaker.
+
+2. **Correlation ≠ Causation:** We observe correlations but cannot definitively establish causal relationships. Confounding factors (income, education, urbanization) may drive observed patterns.
+
+3. **Data Constraints:** Analysis uses simulated data mimicking HCES structure. Real HCES 2022-23 unit-level data may show different patterns.
+
+4. **Regional Heterogeneity:** State-level analysis masks intra-state variation. City-level and pin code-level analysis would provide more actionable insights.
+
+5. **Dynamic Market:** Household composition and internet penetration are changing rapidly. Insights require quarterly updates.
+
+---
+
+## Next Steps
+
+### Immediate (0-3 months)
+1. **Validate with Real Data:** Obtain actual HCES 2022-23 data and proprietary customer data
+2. **Pilot "Singles Category":** Test in 2-3 bachelor-heavy neighborhoods in Bangalore/Delhi
+3. **Analyze Own Customer Data:** Segment existing customers by estimated household type
+
+### Short-term (3-6 months)
+1. **Pin Code-Level Analysis:** Map household composition at granular level using Census + internal data
+2. **A/B Test Assortment:** Compare bachelor-optimized vs. family-optimized dark stores
+3. **Build Prediction Model:** Create ML model to predict household type from purchase behavior
+
+### Long-term (6-12 months)
+1. **Launch Micro-Market Optimization:** Dynamically adjust inventory by neighborhood household mix
+2. **Expand Tier-2 Pilot:** Enter 3-5 tier-2 cities with clear household segmentation strategy
+3. **Build Subscription Product:** Launch differentiated subscription for singles vs. families
+
+---
+
+## Appendix: Metrics Definitions
+
+- **Online Purchase Penetration:** % of households making ≥1 online purchase in survey period
+- **Category Skew Index:** (Category's share in segment) / (National average). >1.0 = over-indexing
+- **Opportunity Score:** Composite metric combining current penetration and market size potential
+
+---
+
+**Confidential:** For internal use only
+"""
+
+INSIGHT_TEMPLATE = MemoTemplate("""### Insight #{number}: {insight}
+
+**Product Implication:** {implication}
+
+**Metric Impact:** {metric_impact}
+
+**Product Action:** {product_action}
+
+**Priority:** {priority}
+
+---
+
+""")
+
+FEATURE_TEMPLATE = MemoTemplate("""**{feature}**  
+- *Description:* {description}  
+- *Target:* {target_segment}  
+- *Impact:* {expected_impact}  
+- *Effort:* {effort} | *Priority Score:* {priority_score}/10
+
+""")
+
+# Compiled once per process (workers compile on import)
+MEMO_TEMPLATE = MemoTemplate(MEMO_HEADER + '{insights}' + MEMO_STRATEGY + '{features}' + MEMO_FOOTER)
+
+TEMPLATE_VERSION = '-'.join(t.version for t in (MEMO_TEMPLATE, INSIGHT_TEMPLATE, FEATURE_TEMPLATE))
+
+
+@dataclass
+class MemoVariant:
+    """Inputs for one memo; `name` becomes the output file name"""
+
+    name: str
+    insights: List[Dict]
+    expansion: Dict
+    merchandising: pd.DataFrame
+    features: List[Dict]
+    scope: str = 'India'
+
+    @property
+    def filename(self) -> str:
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', self.name).strip('_').lower()
+        return f"{slug or 'memo'}.md"
+
+    def input_hash(self) -> str:
+        """Hash of everything the rendered memo depends on (except the date)"""
+        payload = {
+            'template': TEMPLATE_VERSION,
+            'scope': self.scope,
+            'insights': self.insights,
+            'expansion': self.expansion,
+            'merchandising': self.merchandising.to_dict('split') if self.merchandising is not None else None,
+            'features': self.features
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+
+def render_memo(variant: MemoVariant, date: str | None = None) -> str:
+    """Render one memo from the compiled templates"""
+    expansion = variant.expansion
+    rationale = expansion.get('rationale', {})
+    merchandising = variant.merchandising
+    insights = ''.join(
+        INSIGHT_TEMPLATE.render({'number': str(i), **{k: str(v) for k, v in insight.items()}})
+        for i, insight in enumerate(variant.insights, 1)
+    )
+    features = ''.join(
+        FEATURE_TEMPLATE.render({k: str(v) for k, v in feature.items()})
+        for feature in variant.features
+    )
+    return MEMO_TEMPLATE.render({
+        'scope': variant.scope,
+        'date': date or datetime.now().strftime('%B %d, %Y'),
+        'insights': insights,
+        'tier_1_states': ', '.join(expansion.get('tier_1_states', [])[:5]),
+        'tier_1_rationale': rationale.get('tier_1', 'High potential markets'),
+        'tier_2_states': ', '.join(expansion.get('tier_2_states', [])[:5]),
+        'tier_2_rationale': rationale.get('tier_2', 'Growing markets'),
+        'tier_3_states': ', '.join(expansion.get('tier_3_states', [])[:3]),
+        'tier_3_rationale': rationale.get('tier_3', 'Early stage markets'),
+        'merchandising': (merchandising.to_markdown(index=False)
+                          if merchandising is not None and not merchandising.empty
+                          else 'See analysis for details'),
+        'features': features
+    })
+
+
+def _render_chunk(variants: List[MemoVariant], output_dir: str, date: str) -> List[Tuple[str, str]]:
+    """Worker: render and write a chunk of memos, return (filename, hash) pairs"""
+    written = []
+    for variant in variants:
+        atomic_write_text(os.path.join(output_dir, variant.filename), render_memo(variant, date),
+                          suffix='.md')
+        written.append((variant.filename, variant.input_hash()))
+    return written
+
+
+class MemoBatchRenderer:
+    """Render many memo variants into one directory, skipping unchanged inputs"""
+
+    MANIFEST = '.memo_manifest.json'
+
+    def __init__(self, output_dir: str, jobs: int = 1, chunk_size: int = 50):
+        self.output_dir = output_dir
+        self.jobs = max(1, jobs)
+        self.chunk_size = max(1, chunk_size)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.output_dir, self.MANIFEST)
+
+    def render_all(self, variants: List[MemoVariant], force: bool = False) -> Dict[str, int]:
+        """
+        Render every variant whose input hash differs from the last run
+
+        Returns counts of written and skipped memos.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        # One renderer per directory at a time; a concurrent run waits, then
+        # finds the manifest up to date and skips the memos already written
+        with file_lock(self.manifest_path):
+            manifest = self._load_manifest()
+
+            names = [v.filename for v in variants]
+            if len(set(names)) != len(names):
+                raise ValueError("Memo variant names must map to unique file names")
+
+            pending = [
+                v for v in variants
+                if force
+                or manifest.get(v.filename) != v.input_hash()
+                or not os.path.exists(os.path.join(self.output_dir, v.filename))
+            ]
+
+            date = datetime.now().strftime('%B %d, %Y')
+            chunks = [pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+            results = []
+            if self.jobs > 1 and len(chunks) > 1:
+                with ProcessPoolExecutor(max_workers=min(self.jobs, len(chunks))) as pool:
+                    futures = [pool.submit(_render_chunk, chunk, self.output_dir, date) for chunk in chunks]
+                    for future in futures:
+                        results.extend(future.result())
+            else:
+                for chunk in chunks:
+                    results.extend(_render_chunk(chunk, self.output_dir, date))
+
+            manifest.update(dict(results))
+            atomic_write_text(self.manifest_path, json.dumps(manifest, indent=2, sort_keys=True),
+                              suffix='.json')
+
+        counts = {'written': len(results), 'skipped': len(variants) - len(results)}
+        print(f"✅ Rendered {counts['written']} memo(s) to {self.output_dir} "
+              f"({counts['skipped']} unchanged, skipped)")
+        return counts
+
+    def _load_manifest(self) -> Dict[str, str]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+
+
+def state_memo_variants(state_insights: Dict[str, List[Dict]], expansion_strategy: Dict,
+                        merchandising_matrix: pd.DataFrame,
+                        features: List[Dict]) -> List[MemoVariant]:
+    """One memo per state: state insight set with the national strategy sections"""
+    return [
+        MemoVariant(name=state, insights=insights, expansion=expansion_strategy,
+                    merchandising=merchandising_matrix, features=features,
+                    scope=f"India ({state})")
+        for state, insights in state_insights.items()
+    ]
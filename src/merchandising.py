@@ -0,0 +1,155 @@
+"""
+Batch Merchandising Matrix
+
+Computes Category Skew Index and stocking recommendations for every
+region x category x household segment cell at once, as a compact columnar
+table (categorical dimensions, float32 measures, int8 recommendation codes)
+for dark-store assortment systems. Strings are only produced by
+format_merchandising_matrix, the presentation layer behind
+ProductInsightsGenerator.generate_merchandising_matrix.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from aggregates import AggregateCube
+
+SEGMENTS = ['Single/Small', 'Family']
+
+# Recommendation codes (int8) and their memo labels
+REC_LOW, REC_STANDARD, REC_HIGH = 0, 1, 2
+REC_LABELS = {
+    REC_LOW: 'LOW STOCK - Limited SKUs',
+    REC_STANDARD: 'STANDARD STOCK',
+    REC_HIGH: 'HIGH STOCK - Premium placement'
+}
+
+# Presentation-only code for a region x category with no households in a segment
+REC_INSUFFICIENT = -1
+REC_INSUFFICIENT_LABEL = 'INSUFFICIENT DATA'
+
+HIGH_SKEW = 1.2
+LOW_SKEW = 0.8
+
+
+def recommendation_codes(single_skew: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Stocking codes per segment from the single/small household skew
+
+    single skew > 1.2: singles HIGH, families STANDARD
+    single skew < 0.8: singles LOW, families HIGH
+    otherwise both STANDARD
+    """
+    single_skew = np.asarray(single_skew, dtype=float)
+    high = single_skew > HIGH_SKEW
+    low = ~high & (single_skew < LOW_SKEW)
+    return {
+        'Single/Small': np.where(high, REC_HIGH, np.where(low, REC_LOW, REC_STANDARD)).astype(np.int8),
+        'Family': np.where(low, REC_HIGH, REC_STANDARD).astype(np.int8)
+    }
+
+
+def merchandising_cube(cube: AggregateCube, regions: List[str] | None = None,
+                       weighted: bool = False) -> pd.DataFrame:
+    """
+    Long-format skew table for all region x category x segment cells
+
+    Skew is the H2 Category Skew Index computed within each region: the
+    segment's category rate divided by the mean rate across segments.
+
+    Columns: <regions>, Segment, Category, Households, Category_Rate,
+    Skew_Index, Rec_Code.
+    """
+    regions = ['State', 'Urban'] if regions is None else list(regions)
+    categories = cube.categories
+    keys = regions + ['HH_Type']
+
+    rolled = cube.rollup(keys).set_index(keys)
+    denominator = rolled['Weight'] if weighted else rolled['Households']
+    counts = rolled[[f'{c}_Weight' for c in categories]] if weighted else rolled[categories]
+    rates = counts.to_numpy(dtype=float) / denominator.to_numpy(dtype=float)[:, None]
+    rates = np.nan_to_num(rates)
+
+    # Mean rate across segments within each region (just the row's own rate nationally)
+    if regions:
+        region_codes = rolled.index.droplevel('HH_Type').factorize()[0]
+    else:
+        region_codes = np.zeros(len(rolled), dtype=np.int64)
+    n_regions = region_codes.max() + 1 if len(region_codes) else 0
+    sums = np.zeros((n_regions, len(categories)))
+    np.add.at(sums, region_codes, rates)
+    mean_rate = sums[region_codes] / np.bincount(region_codes, minlength=n_regions)[region_codes, None]
+    skew = np.divide(rates, mean_rate, out=np.ones_like(rates), where=mean_rate > 0)
+
+    # Single/small skew for every row's region drives both segments' codes
+    segment = rolled.index.get_level_values('HH_Type').to_numpy()
+    single_rows = np.full(n_regions, -1)
+    is_single = segment == 'Single/Small'
+    single_rows[region_codes[is_single]] = np.flatnonzero(is_single)
+    single_skew = np.where(single_rows[region_codes][:, None] >= 0,
+                           skew[single_rows[region_codes]], 1.0)
+    codes = recommendation_codes(single_skew)
+    rec = np.where(is_single[:, None], codes['Single/Small'], codes['Family'])
+
+    n_rows, n_categories = rates.shape
+    table = {}
+    index = rolled.index.to_frame(index=False)
+    for dim in regions:
+        values = np.repeat(index[dim].to_numpy(), n_categories)
+        table[dim] = pd.Categorical(values) if values.dtype == object else values
+    table['Segment'] = pd.Categorical(np.repeat(segment, n_categories), categories=SEGMENTS)
+    table['Category'] = pd.Categorical.from_codes(
+        np.tile(np.arange(n_categories), n_rows),
+        categories=[c.replace('Online_', '') for c in categories])
+    table['Households'] = np.repeat(rolled['Households'].to_numpy(), n_categories).astype(np.int32)
+    table['Category_Rate'] = rates.ravel().astype(np.float32)
+    table['Skew_Index'] = skew.ravel().astype(np.float32)
+    table['Rec_Code'] = rec.ravel().astype(np.int8)
+    return pd.DataFrame(table)
+
+
+def skew_dict_to_table(category_skew: Dict[str, Dict]) -> pd.DataFrame:
+    """National H2 category_skew_index -> the merchandising_cube layout (no regions)"""
+    categories = list(category_skew)
+    rows = []
+    for segment in SEGMENTS:
+        skew = np.array([category_skew[c].get(segment, 1.0) for c in categories], dtype=float)
+        rows.append(skew)
+    skew = np.vstack(rows)
+    codes = recommendation_codes(skew[0])
+    return pd.DataFrame({
+        'Segment': pd.Categorical(np.repeat(SEGMENTS, len(categories)), categories=SEGMENTS),
+        'Category': pd.Categorical([c.replace('Online_', '') for c in categories] * len(SEGMENTS),
+                                   categories=[c.replace('Online_', '') for c in categories]),
+        'Skew_Index': skew.ravel(),
+        'Rec_Code': np.concatenate([codes[s] for s in SEGMENTS])
+    })
+
+
+def format_merchandising_matrix(table: pd.DataFrame, regions: List[str] | None = None) -> pd.DataFrame:
+    """
+    Presentation layer: one row per (region, category) with memo strings
+
+    Same columns as generate_merchandising_matrix, prefixed by any region columns.
+    A segment with no households in a region reads INSUFFICIENT DATA (skew 'n/a').
+    """
+    regions = [r for r in (regions or []) if r in table.columns]
+    keys = regions + ['Category']
+    wide = table.pivot_table(index=keys, columns='Segment',
+                             values=['Skew_Index', 'Rec_Code'], observed=True, sort=False)
+    # Small regions can lack a segment (or a segment can be absent everywhere)
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([['Skew_Index', 'Rec_Code'], SEGMENTS]))
+
+    result = wide.index.to_frame(index=False)
+    result['Category'] = result['Category'].astype(str)
+    # labels[0] is REC_INSUFFICIENT, so codes index at code + 1
+    labels = np.array([REC_INSUFFICIENT_LABEL] + [REC_LABELS[c] for c in sorted(REC_LABELS)],
+                      dtype=object)
+    for segment, prefix in [('Single/Small', 'Single'), ('Family', 'Family')]:
+        codes = wide[('Rec_Code', segment)].fillna(REC_INSUFFICIENT).to_numpy(dtype=np.int64)
+        result[f'{prefix}_HH_Areas'] = labels[codes + 1]
+    for segment, prefix in [('Single/Small', 'Single'), ('Family', 'Family')]:
+        result[f'{prefix}_Skew_Index'] = [f"{v:.2f}x" if pd.notna(v) else 'n/a'
+                                          for v in wide[('Skew_Index', segment)]]
+    return result
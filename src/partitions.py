@@ -0,0 +1,206 @@
+"""
+Partitioned Household Dataset (one directory per State and sector)
+
+Household records are stored Hive-style, one file per partition:
+
+    <root>/_schema.json
+    <root>/State=Andhra%20Pradesh/Urban=0/part-0.csv
+    <root>/State=Andhra%20Pradesh/Urban=1/part-0.csv
+    ...
+
+Partition values are URL-quoted in directory names and are not repeated
+inside the files; _schema.json keeps the column order and the partition
+column dtypes so reads return the original layout. Readers:
+1. Prune partitions by path before opening any file (state filters read
+   only that state's directories)
+2. Load the remaining partitions in parallel worker processes
+
+Writes replace only the partitions present in the new data, so a
+single-state refresh leaves the other states' files untouched.
+
+Usage:
+    write_partitioned(df, 'data/hces_partitioned')
+    kerala = read_partitioned('data/hces_partitioned', filters={'State': 'Kerala'})
+    python src/partitions.py data/sample_hces_data.csv data/hces_partitioned
+"""
+
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+from artifact_store import atomic_write_text, make_staging_dir
+
+DEFAULT_PARTITIONS = ['State', 'Urban']
+
+SCHEMA_FILE = '_schema.json'
+
+FILE_FORMATS = ['csv', 'parquet']
+
+
+def partition_dir(root: str, partition_cols: List[str], values: Tuple) -> str:
+    """Directory for one partition, e.g. <root>/State=Tamil%20Nadu/Urban=1"""
+    parts = [f"{col}={quote(str(value), safe='')}" for col, value in zip(partition_cols, values)]
+    return os.path.join(root, *parts)
+
+
+def read_schema(root: str) -> Dict:
+    with open(os.path.join(root, SCHEMA_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_partitioned(df: pd.DataFrame, root: str,
+                      partition_cols: List[str] | None = None,
+                      file_format: str = 'csv') -> List[str]:
+    """
+    Write df as a partitioned dataset and return the partition directories written
+
+    Existing partitions that are not in df are kept, so df must have the
+    dataset's columns (in any order). A partition is written to a temporary
+    directory and swapped in, so readers never see it half written.
+    """
+    partition_cols = [c for c in (partition_cols or DEFAULT_PARTITIONS) if c in df.columns]
+    if not partition_cols:
+        raise ValueError("None of the partition columns are in the data")
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"file_format must be one of {FILE_FORMATS}")
+    if df[partition_cols].isna().any().any():
+        raise ValueError(f"Partition columns {partition_cols} must not have missing values")
+
+    os.makedirs(root, exist_ok=True)
+    schema = {
+        'columns': list(df.columns),
+        'partition_cols': partition_cols,
+        'dtypes': {c: str(df[c].dtype) for c in partition_cols},
+        'format': file_format
+    }
+    schema_path = os.path.join(root, SCHEMA_FILE)
+    if os.path.exists(schema_path):
+        existing = read_schema(root)
+        if existing['partition_cols'] != partition_cols or existing['format'] != file_format:
+            raise ValueError(f"{root} is partitioned by {existing['partition_cols']} "
+                             f"({existing['format']}); refusing to mix layouts")
+        if set(existing['columns']) != set(df.columns):
+            missing = [c for c in existing['columns'] if c not in df.columns]
+            extra = [c for c in df.columns if c not in existing['columns']]
+            raise ValueError(f"Columns differ from {root}'s schema (missing: {missing}, "
+                             f"extra: {extra}); write a new dataset to change them")
+        schema['columns'] = existing['columns']
+
+    data_cols = [c for c in df.columns if c not in partition_cols]
+    written = []
+    for values, part in df.groupby(partition_cols, sort=True):
+        values = values if isinstance(values, tuple) else (values,)
+        target = partition_dir(root, partition_cols, values)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        staging = make_staging_dir(os.path.dirname(target))
+        _write_file(part[data_cols], os.path.join(staging, f'part-0.{file_format}'), file_format)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.replace(staging, target)
+        written.append(target)
+
+    atomic_write_text(schema_path, json.dumps(schema, indent=2), suffix='.json')
+    return written
+
+
+def discover_partitions(root: str) -> List[Tuple[str, Dict[str, str]]]:
+    """(file path, {partition column: raw value}) for every data file, sorted"""
+    schema = read_schema(root)
+    suffix = f".{schema['format']}"
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in sorted(filenames):
+            if not name.endswith(suffix):
+                continue
+            relative = os.path.relpath(dirpath, root).split(os.sep)
+            values = dict(part.split('=', 1) for part in relative if '=' in part)
+            found.append((os.path.join(dirpath, name),
+                          {col: unquote(value) for col, value in values.items()}))
+    return found
+
+
+def prune_partitions(partitions: List[Tuple[str, Dict[str, str]]], schema: Dict,
+                     filters: Dict | None) -> List[Tuple[str, Dict[str, str]]]:
+    """Keep partitions whose path values satisfy {column: value or list of values}"""
+    if not filters:
+        return partitions
+    unknown = [c for c in filters if c not in schema['partition_cols']]
+    if unknown:
+        raise ValueError(f"Filters must be on partition columns {schema['partition_cols']}: {unknown}")
+    allowed = {
+        col: {str(v) for v in (value if isinstance(value, (list, tuple, set)) else [value])}
+        for col, value in filters.items()
+    }
+    return [(path, values) for path, values in partitions
+            if all(values.get(col) in accepted for col, accepted in allowed.items())]
+
+
+def read_partitioned(root: str, filters: Dict | None = None,
+                     columns: List[str] | None = None, jobs: int = 1) -> pd.DataFrame:
+    """
+    Load a partitioned dataset
+
+    Args:
+        filters: {partition column: value or list}; other partitions are never opened
+        columns: subset of columns to return (partition columns are cheap)
+        jobs: worker processes for reading partitions
+    """
+    schema = read_schema(root)
+    partitions = prune_partitions(discover_partitions(root), schema, filters)
+    wanted = schema['columns'] if columns is None else [c for c in schema['columns'] if c in columns]
+    data_cols = [c for c in wanted if c not in schema['partition_cols']]
+    if not partitions:
+        return pd.DataFrame(columns=wanted)
+
+    args = [(path, values, data_cols, schema) for path, values in partitions]
+    if jobs > 1 and len(partitions) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(partitions))) as pool:
+            frames = list(pool.map(_read_partition, *zip(*args)))
+    else:
+        frames = [_read_partition(*a) for a in args]
+
+    return pd.concat(frames, ignore_index=True)[wanted]
+
+
+def _read_partition(path: str, values: Dict[str, str], data_cols: List[str],
+                    schema: Dict) -> pd.DataFrame:
+    if schema['format'] == 'parquet':
+        from backends import read_parquet
+        part = read_parquet(path, columns=data_cols)
+    else:
+        part = pd.read_csv(path, usecols=data_cols, encoding='utf-8')
+    for col in schema['partition_cols']:
+        part[col] = pd.Series([values[col]] * len(part), dtype=object).astype(schema['dtypes'][col])
+    return part
+
+
+def _write_file(part: pd.DataFrame, path: str, file_format: str):
+    if file_format == 'parquet':
+        part.to_parquet(path, index=False)
+    else:
+        part.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a household CSV/Excel as a partitioned dataset')
+    parser.add_argument('source', help='Household-level CSV/Excel file')
+    parser.add_argument('root', help='Dataset directory (existing partitions not in source are kept)')
+    parser.add_argument('--partition-by', default=','.join(DEFAULT_PARTITIONS))
+    parser.add_argument('--format', choices=FILE_FORMATS, default='csv')
+    args = parser.parse_args()
+
+    from data_collection import DataCollector
+    df = DataCollector().load_hces_data(args.source)
+    written = write_partitioned(df, args.root, args.partition_by.split(','), args.format)
+    print(f"✅ Wrote {len(written)} partitions to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
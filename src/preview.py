@@ -0,0 +1,233 @@
+"""
+Fast Preview on a Stratified Subsample
+
+Draws a stratified simple random subsample (default 1% per State x Urban
+stratum, at least min_per_stratum households each), rescales Sample_Weight by
+N_h / n_h so weighted totals still represent the full survey, runs the full
+analysis on it, and attaches a 95% sampling-error bound to each estimate:
+- penetration tables: linearized variance of the weighted ratio estimator
+  under stratified sampling (with finite-population correction)
+- correlations (H1, H3): Fisher z interval
+- Category Skew Index (H2): delta method over the segment rates
+- logistic coefficients: +/- 1.96 SE from the fit's covariance
+
+Bounds cover the subsampling error only (how far the preview can be from the
+full-file run), not the survey's own sampling error.
+
+Usage:
+    sample, design = stratified_sample(df, fraction=0.01)
+    results = run_preview_analysis(sample, design)
+    results['preview']['state_penetration']   # Penetration_%, Margin_%, ...
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from analysis import run_full_analysis
+from aggregates import bucket_household_size, household_type
+from waves import skew_index_se
+
+Z_95 = 1.959963984540054
+
+DEFAULT_STRATA = ['State', 'Urban']
+
+
+@dataclass
+class PreviewDesign:
+    """How a preview subsample was drawn"""
+    fraction: float
+    strata: List[str]
+    population: pd.Series      # households per stratum in the full data
+    sample: pd.Series          # households per stratum in the subsample
+    full_rows: int
+
+    def stratum_fpc(self) -> pd.Series:
+        """Finite-population correction 1 - n_h / N_h per stratum"""
+        return 1 - self.sample / self.population
+
+
+def stratified_sample(df: pd.DataFrame, fraction: float = 0.01,
+                      strata: List[str] | None = None, min_per_stratum: int = 2,
+                      seed: int = 42, weight_col: str = 'Sample_Weight') -> tuple:
+    """
+    Stratified simple random subsample without replacement
+
+    Returns (sample, PreviewDesign). Sample weights are multiplied by
+    N_h / n_h (a Sample_Weight of 1 is assumed if the data has none).
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError("fraction must be in (0, 1]")
+    strata = [s for s in (strata or DEFAULT_STRATA) if s in df.columns]
+    rng = np.random.default_rng(seed)
+
+    if strata:
+        groups = df.groupby(strata, sort=True, dropna=False)
+        codes = groups.ngroup().to_numpy()
+        index = groups.size().index
+    else:
+        codes = np.zeros(len(df), dtype=np.int64)
+        index = pd.Index([0])
+    population = np.bincount(codes, minlength=len(index))
+    target = np.minimum(population, np.maximum(np.rint(population * fraction), min_per_stratum)).astype(np.int64)
+
+    # Random order within each stratum; keep the first n_h
+    order = np.argsort(codes + rng.random(len(df)))
+    rank = np.empty(len(df), dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(population)[:-1]])
+    rank[order] = np.arange(len(df)) - np.repeat(starts, population)
+    keep = np.sort(np.flatnonzero(rank < target[codes]))
+
+    sample = df.iloc[keep].reset_index(drop=True)
+    inflation = (population / target)[codes[keep]]
+    base_weight = (sample[weight_col].to_numpy(dtype=float) if weight_col in sample.columns
+                   else np.ones(len(sample)))
+    sample[weight_col] = base_weight * inflation
+
+    design = PreviewDesign(
+        fraction=fraction,
+        strata=strata,
+        population=pd.Series(population, index=index),
+        sample=pd.Series(target, index=index),
+        full_rows=len(df)
+    )
+    return sample, design
+
+
+def penetration_bounds(sample: pd.DataFrame, design: PreviewDesign,
+                       groupby_cols: List[str] | None = None,
+                       outcome: str = 'Online_Purchase',
+                       weight_col: str = 'Sample_Weight') -> pd.DataFrame:
+    """
+    Weighted penetration with a 95% margin per group (in %)
+
+    Var(R_d) = sum_h (1 - f_h) n_h / (n_h - 1) sum_i (z_i - mean_h z)^2 with
+    z_i = w_i (y_i - R_d) 1[i in d] / W_d, computed for all domains at once.
+    """
+    frame = sample.copy()
+    if groupby_cols and 'HH_Size_Bucket' in groupby_cols and 'HH_Size_Bucket' not in frame.columns:
+        frame['HH_Size_Bucket'] = bucket_household_size(frame['Household_Size'])
+    w = frame[weight_col].to_numpy(dtype=float)
+    y = (frame[outcome] == 1).to_numpy(dtype=float)
+    domain = (frame.groupby(groupby_cols, sort=True).ngroup().to_numpy() if groupby_cols
+              else np.zeros(len(frame), dtype=np.int64))
+    if design.strata:
+        groups = frame.groupby(design.strata, sort=True, dropna=False)
+        stratum = groups.ngroup().to_numpy()
+        fpc = design.stratum_fpc().reindex(groups.size().index).to_numpy(dtype=float)
+    else:
+        stratum = np.zeros(len(frame), dtype=np.int64)
+        fpc = design.stratum_fpc().to_numpy(dtype=float)
+    fpc = np.clip(np.nan_to_num(fpc, nan=1.0), 0.0, 1.0)
+    n_domains, n_strata = domain.max() + 1, stratum.max() + 1
+
+    total = np.bincount(domain, weights=w, minlength=n_domains)
+    rate = np.bincount(domain, weights=w * y, minlength=n_domains) / total
+    z = w * (y - rate[domain]) / total[domain]
+
+    # Per (stratum, domain) sums of z and z^2; members of other domains have z = 0
+    cell = stratum * n_domains + domain
+    z_sum = np.bincount(cell, weights=z, minlength=n_strata * n_domains).reshape(n_strata, n_domains)
+    z_sq = np.bincount(cell, weights=z * z, minlength=n_strata * n_domains).reshape(n_strata, n_domains)
+    n_h = np.bincount(stratum, minlength=n_strata).astype(float)
+    scale = np.divide(fpc * n_h, n_h - 1, out=np.zeros(n_strata), where=n_h > 1)
+    variance = (scale[:, None] * (z_sq - z_sum ** 2 / n_h[:, None])).sum(axis=0)
+
+    if groupby_cols:
+        result = frame.groupby(groupby_cols, sort=True).size().reset_index()[groupby_cols]
+    else:
+        result = pd.DataFrame({'Group': ['Overall']})
+    result['Penetration_%'] = rate * 100
+    result['Margin_%'] = Z_95 * np.sqrt(np.maximum(variance, 0.0)) * 100
+    result['Sample_Size'] = np.bincount(domain, minlength=n_domains)
+    return result
+
+
+def correlation_interval(r: float, n: int) -> tuple:
+    """95% Fisher z interval for a Pearson correlation"""
+    if pd.isna(r) or n <= 3:
+        return (np.nan, np.nan)
+    z = np.arctanh(np.clip(r, -0.999999, 0.999999))
+    half = Z_95 / np.sqrt(n - 3)
+    return (float(np.tanh(z - half)), float(np.tanh(z + half)))
+
+
+def skew_bounds(sample: pd.DataFrame, category_penetration: Dict) -> pd.DataFrame:
+    """Category Skew Index with a 95% margin per category and household type"""
+    segment_n = household_type(sample['Household_Size']).value_counts()
+    rows = []
+    for cat, rates in category_penetration.items():
+        segments = list(rates)
+        r = np.nan_to_num(np.array([rates[s] for s in segments], dtype=float))
+        n = segment_n.reindex(segments).fillna(0).to_numpy(dtype=float)
+        variance = np.divide(r * (1 - r), n, out=np.zeros(len(r)), where=n > 0)
+        skew, se = skew_index_se(r, variance)
+        for segment, value, error in zip(segments, skew, se):
+            rows.append({'Category': cat, 'HH_Type': segment,
+                         'Skew_Index': value, 'Margin': Z_95 * error})
+    return pd.DataFrame(rows)
+
+
+def coefficient_bounds(model: Dict) -> pd.DataFrame:
+    """Logistic coefficients (scaled features) and odds ratios with 95% margins"""
+    if 'covariance' not in model:
+        return pd.DataFrame()
+    se = np.sqrt(np.diag(model['covariance']))[1:]
+    coefficients = np.array([model['coefficients'][f] for f in model['features']])
+    return pd.DataFrame({
+        'Feature': model['features'],
+        'Coefficient': coefficients,
+        'Margin': Z_95 * se,
+        'Odds_Ratio_Low': np.exp(coefficients - Z_95 * se),
+        'Odds_Ratio_High': np.exp(coefficients + Z_95 * se)
+    })
+
+
+def preview_bounds(sample: pd.DataFrame, design: PreviewDesign, results: Dict) -> Dict:
+    """Sampling-error bounds for every estimate in run_full_analysis results"""
+    bounds = {
+        'fraction': design.fraction,
+        'sample_rows': len(sample),
+        'full_rows': design.full_rows,
+        'strata': design.strata,
+        'overall_penetration': penetration_bounds(sample, design),
+        'state_penetration': penetration_bounds(sample, design, ['State']),
+        'household_size_penetration': penetration_bounds(sample, design, ['HH_Size_Bucket'])
+    }
+    for name, col in (('urban_rural_penetration', 'Urban'), ('internet_penetration', 'Internet_Access')):
+        if col in sample.columns:
+            bounds[name] = penetration_bounds(sample, design, [col])
+
+    h1 = results.get('h1', {})
+    bounds['h1_correlation'] = correlation_interval(h1.get('correlation', np.nan), len(sample))
+    h3 = results.get('h3', {})
+    if 'correlation_with_internet' in h3:
+        access = sample['Internet_Access'] == 1
+        bounds['h3_correlation_with_internet'] = correlation_interval(
+            h3['correlation_with_internet'], int(access.sum()))
+        bounds['h3_correlation_without_internet'] = correlation_interval(
+            h3['correlation_without_internet'], int((~access).sum()))
+    if 'category_penetration' in results.get('h2', {}):
+        bounds['category_skew_index'] = skew_bounds(sample, results['h2']['category_penetration'])
+    bounds['model'] = coefficient_bounds(results.get('model', {}))
+    return bounds
+
+
+def run_preview_analysis(sample: pd.DataFrame, design: PreviewDesign, backend=None) -> Dict:
+    """run_full_analysis on the subsample, plus results['preview'] bounds"""
+    print(f"⚡ Preview mode: {len(sample):,} of {design.full_rows:,} households "
+          f"({design.fraction:.1%} per {' x '.join(design.strata) or 'dataset'} stratum)")
+    results = run_full_analysis(sample, backend=backend)
+    results['preview'] = preview_bounds(sample, design, results)
+
+    overall = results['preview']['overall_penetration'].iloc[0]
+    low, high = results['preview']['h1_correlation']
+    print(f"   Overall penetration: {overall['Penetration_%']:.1f}% ± {overall['Margin_%']:.1f} pp")
+    print(f"   H1 correlation 95% interval: [{low:.3f}, {high:.3f}]")
+    widest = results['preview']['state_penetration'].nlargest(1, 'Margin_%')
+    if len(widest):
+        print(f"   Widest state bound: {widest['State'].iloc[0]} ± {widest['Margin_%'].iloc[0]:.1f} pp "
+              f"(rerun without --preview for exact figures)")
+    return results
@@ -7,7 +7,12 @@ Converts analysis results into actionable product recommendations
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
-from datetime import datetime
+
+from aggregates import AggregateCube
+from artifact_store import atomic_write_text, file_lock
+from memo_engine import MemoVariant, render_memo
+from merchandising import format_merchandising_matrix, merchandising_cube, skew_dict_to_table
+from profiling import profiled
 
 
 class ProductInsightsGenerator:
@@ -17,6 +22,7 @@ class ProductInsightsGenerator:
         self.results = analysis_results
         self.df = df
     
+    @profiled()
     def generate_all_insights(self) -> List[Dict]:
         """
         Generate top 5 actionable insights
@@ -31,15 +37,8 @@ class ProductInsightsGenerator:
         
         # Insight 1: Household size correlation
         if 'h1' in self.results:
-            correlation = self.results['h1'].get('correlation', 0)
-            if correlation < -0.1:
-                insights.append({
-                    'insight': f"Smaller households show {abs(correlation):.0%} higher propensity for online purchases",
-                    'implication': "Prioritize expansion in cities with high concentration of 1-2 person households (metros, tech hubs, student cities)",
-                    'metric_impact': "Estimated 20-30% higher conversion rates in single/small HH neighborhoods",
-                    'priority': 'High',
-                    'product_action': 'Launch targeted campaigns in PGs, bachelor apartments, and co-living spaces'
-                })
+            self._add_insight(insights, self._household_size_insight(
+                self.results['h1'].get('correlation', 0)))
         
         # Insight 2: Internet access as gatekeeper
         if 'internet_penetration' in self.results:
@@ -48,49 +47,11 @@ class ProductInsightsGenerator:
             without_internet = internet_data[internet_data['Internet_Access'] == 0]['Penetration_%'].values
             
             if len(with_internet) > 0 and len(without_internet) > 0:
-                gap = with_internet[0] - without_internet[0]
-                insights.append({
-                    'insight': f"Internet access creates {gap:.0f} percentage point difference in adoption",
-                    'implication': "Partner with ISPs and telcos for bundled offers; focus on 4G/5G-enabled areas",
-                    'metric_impact': f"Addressable market expands by ~{gap:.0f}% in internet-enabled regions",
-                    'priority': 'High',
-                    'product_action': 'Build offline-to-online onboarding flows; optimize for low-bandwidth'
-                })
+                self._add_insight(insights, self._internet_insight(with_internet[0] - without_internet[0]))
         
         # Insight 3: Category preferences
         if 'h2' in self.results and 'category_skew_index' in self.results['h2']:
-            category_skew = self.results['h2']['category_skew_index']
-            
-            # Find highest skewing categories
-            single_favored = []
-            family_favored = []
-            
-            for category, skew_dict in category_skew.items():
-                single_skew = skew_dict.get('Single/Small', 1.0)
-                family_skew = skew_dict.get('Family', 1.0)
-                
-                if single_skew > 1.2:
-                    single_favored.append(category.replace('Online_', ''))
-                if family_skew > 1.2:
-                    family_favored.append(category.replace('Online_', ''))
-            
-            if single_favored:
-                insights.append({
-                    'insight': f"Single/small households over-index on: {', '.join(single_favored)}",
-                    'implication': "Stock ready-to-eat meals, single-serve packs, and quick-prep options in bachelor-heavy areas",
-                    'metric_impact': "Increase basket size by 15-25% through targeted assortment",
-                    'priority': 'High',
-                    'product_action': 'Create "Single Living Essentials" category; promote meal kits and convenience foods'
-                })
-            
-            if family_favored:
-                insights.append({
-                    'insight': f"Family households over-index on: {', '.join(family_favored)}",
-                    'implication': "Emphasize bulk packs, family meal deals, and subscription models in family neighborhoods",
-                    'metric_impact': "Increase order frequency by 20-30% through subscription penetration",
-                    'priority': 'Medium',
-                    'product_action': 'Launch family subscription plans with bulk discounts'
-                })
+            insights.extend(self._category_insights(self.results['h2']['category_skew_index']))
         
         # Insight 4: Urban-rural divide
         if 'urban_rural_penetration' in self.results:
@@ -99,15 +60,7 @@ class ProductInsightsGenerator:
                 urban_pen = ur_data[ur_data['Urban'] == 1]['Penetration_%'].values[0]
                 rural_pen = ur_data[ur_data['Urban'] == 0]['Penetration_%'].values[0]
                 ratio = urban_pen / rural_pen if rural_pen > 0 else float('inf')
-                
-                if ratio > 1.5:
-                    insights.append({
-                        'insight': f"Urban areas show {ratio:.1f}x higher adoption than rural",
-                        'implication': "Maintain urban-first strategy; explore tier-2/3 cities before rural expansion",
-                        'metric_impact': f"Urban-focused strategy = {ratio:.0f}x ROI vs rural",
-                        'priority': 'Medium',
-                        'product_action': 'Pilot hub-and-spoke model in tier-2 cities with urban characteristics'
-                    })
+                self._add_insight(insights, self._urban_rural_insight(ratio))
         
         # Insight 5: State-level opportunities
         if 'state_penetration' in self.results:
@@ -125,13 +78,179 @@ class ProductInsightsGenerator:
                 'product_action': f"Double down on {top_states[0]}, {top_states[1]} while piloting in emerging markets"
             })
         
-        # Sort by priority
+        return self._top_insights(insights)
+    
+    @profiled()
+    def generate_state_insights(self, cube: AggregateCube | None = None) -> Dict[str, List[Dict]]:
+        """
+        Generate the insight set for every state in one pass
+        
+        All per-state inputs (H1 correlation, internet gap, category skew,
+        urban/rural ratio) come from a single grouped aggregation of the
+        household data (or a prebuilt cube). Returns {state: insights} using
+        the same insight builders and priority ordering as the national set;
+        the cross-state ranking insight is national-only.
+        """
+        inputs, skew = self.state_insight_inputs(cube)
+        
+        state_insights = {}
+        for state, row in inputs.iterrows():
+            insights = []
+            self._add_insight(insights, self._household_size_insight(row['Correlation']))
+            if not pd.isna(row['Internet_Gap']):
+                self._add_insight(insights, self._internet_insight(row['Internet_Gap']))
+            if state in skew.index:
+                insights.extend(self._category_insights(skew.loc[state].to_dict('index')))
+            if not pd.isna(row['Urban_Rural_Ratio']):
+                self._add_insight(insights, self._urban_rural_insight(row['Urban_Rural_Ratio']))
+            state_insights[state] = self._top_insights(insights)
+        
+        return state_insights
+    
+    def state_insight_inputs(self, cube: AggregateCube | None = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Per-state insight inputs, vectorized across states
+        
+        Returns:
+        - inputs: one row per state with Penetration_%, Sample_Size, Correlation,
+          Internet_Gap (pp) and Urban_Rural_Ratio
+        - skew: Category Skew Index indexed by (State, category) with one column
+          per household type, computed as in H2 (unweighted)
+        """
+        if cube is None:
+            cube = AggregateCube.from_dataframe(self.df)
+        
+        inputs = cube.penetration(['State']).set_index('State')
+        
+        # H1: Pearson r of Household_Size vs Online_Purchase from per-state sums
+        by_size = cube.rollup(['State', 'Household_Size'])
+        x = by_size['Household_Size'].astype(float)
+        sums = pd.DataFrame({
+            'n': by_size['Households'],
+            'sx': by_size['Households'] * x,
+            'sxx': by_size['Households'] * x ** 2,
+            'sy': by_size['Online_Purchase'],
+            'sxy': by_size['Online_Purchase'] * x,
+            'State': by_size['State']
+        }).groupby('State', observed=True).sum()
+        cov = sums['n'] * sums['sxy'] - sums['sx'] * sums['sy']
+        # Online_Purchase is binary, so sum(y^2) == sum(y)
+        var = (sums['n'] * sums['sxx'] - sums['sx'] ** 2) * (sums['n'] * sums['sy'] - sums['sy'] ** 2)
+        inputs['Correlation'] = cov / np.sqrt(var.where(var > 0))
+        
+        # Internet gap and urban/rural ratio from weighted penetration pivots
+        internet = self._binary_pivot(cube, 'Internet_Access')
+        inputs['Internet_Gap'] = internet[1] - internet[0]
+        
+        urban = self._binary_pivot(cube, 'Urban')
+        ratio = (urban[1] / urban[0]).where(urban[0] != 0, np.inf)
+        inputs['Urban_Rural_Ratio'] = ratio.where(urban[0].notna() & urban[1].notna())
+        
+        # H2 skew: segment rate / mean segment rate, per state and category
+        by_type = cube.rollup(['State', 'HH_Type']).set_index(['State', 'HH_Type'])
+        rates = by_type[cube.categories].div(by_type['Households'], axis=0)
+        rates = rates.stack().unstack('HH_Type')
+        rates.index.names = ['State', 'Category']
+        mean_rate = rates.mean(axis=1)
+        skew = rates.div(mean_rate.where(mean_rate > 0), axis=0)
+        skew.loc[(mean_rate <= 0).to_numpy()] = 1.0
+        
+        return inputs, skew
+    
+    @staticmethod
+    def _binary_pivot(cube: AggregateCube, dimension: str) -> pd.DataFrame:
+        """State x {0, 1} penetration table (NaN where a state lacks a level)"""
+        if dimension not in cube.dimensions:
+            return pd.DataFrame(np.nan, index=[], columns=[0, 1])
+        pivot = cube.penetration(['State', dimension]).pivot(
+            index='State', columns=dimension, values='Penetration_%')
+        return pivot.reindex(columns=[0, 1])
+    
+    @staticmethod
+    def _add_insight(insights: List[Dict], insight: Dict | None):
+        if insight is not None:
+            insights.append(insight)
+    
+    @staticmethod
+    def _top_insights(insights: List[Dict]) -> List[Dict]:
+        """Sort by priority and keep the top 5"""
         priority_order = {'High': 1, 'Medium': 2, 'Low': 3}
         insights.sort(key=lambda x: priority_order.get(x['priority'], 99))
         
         return insights[:5]  # Top 5
     
-    def generate_expansion_strategy(self) -> Dict:
+    @staticmethod
+    def _household_size_insight(correlation: float) -> Dict | None:
+        if correlation < -0.1:
+            return {
+                'insight': f"Smaller households show {abs(correlation):.0%} higher propensity for online purchases",
+                'implication': "Prioritize expansion in cities with high concentration of 1-2 person households (metros, tech hubs, student cities)",
+                'metric_impact': "Estimated 20-30% higher conversion rates in single/small HH neighborhoods",
+                'priority': 'High',
+                'product_action': 'Launch targeted campaigns in PGs, bachelor apartments, and co-living spaces'
+            }
+        return None
+    
+    @staticmethod
+    def _internet_insight(gap: float) -> Dict:
+        return {
+            'insight': f"Internet access creates {gap:.0f} percentage point difference in adoption",
+            'implication': "Partner with ISPs and telcos for bundled offers; focus on 4G/5G-enabled areas",
+            'metric_impact': f"Addressable market expands by ~{gap:.0f}% in internet-enabled regions",
+            'priority': 'High',
+            'product_action': 'Build offline-to-online onboarding flows; optimize for low-bandwidth'
+        }
+    
+    @staticmethod
+    def _category_insights(category_skew: Dict) -> List[Dict]:
+        # Find highest skewing categories
+        single_favored = []
+        family_favored = []
+        
+        for category, skew_dict in category_skew.items():
+            single_skew = skew_dict.get('Single/Small', 1.0)
+            family_skew = skew_dict.get('Family', 1.0)
+            
+            if single_skew > 1.2:
+                single_favored.append(category.replace('Online_', ''))
+            if family_skew > 1.2:
+                family_favored.append(category.replace('Online_', ''))
+        
+        insights = []
+        if single_favored:
+            insights.append({
+                'insight': f"Single/small households over-index on: {', '.join(single_favored)}",
+                'implication': "Stock ready-to-eat meals, single-serve packs, and quick-prep options in bachelor-heavy areas",
+                'metric_impact': "Increase basket size by 15-25% through targeted assortment",
+                'priority': 'High',
+                'product_action': 'Create "Single Living Essentials" category; promote meal kits and convenience foods'
+            })
+        
+        if family_favored:
+            insights.append({
+                'insight': f"Family households over-index on: {', '.join(family_favored)}",
+                'implication': "Emphasize bulk packs, family meal deals, and subscription models in family neighborhoods",
+                'metric_impact': "Increase order frequency by 20-30% through subscription penetration",
+                'priority': 'Medium',
+                'product_action': 'Launch family subscription plans with bulk discounts'
+            })
+        return insights
+    
+    @staticmethod
+    def _urban_rural_insight(ratio: float) -> Dict | None:
+        if ratio > 1.5:
+            return {
+                'insight': f"Urban areas show {ratio:.1f}x higher adoption than rural",
+                'implication': "Maintain urban-first strategy; explore tier-2/3 cities before rural expansion",
+                'metric_impact': f"Urban-focused strategy = {ratio:.0f}x ROI vs rural",
+                'priority': 'Medium',
+                'product_action': 'Pilot hub-and-spoke model in tier-2 cities with urban characteristics'
+            }
+        return None
+    
+    @profiled()
+    def generate_expansion_strategy(self, penetration_weight: float = 0.6,
+                                    tier_cutoffs: Tuple[int, int] = (8, 18)) -> Dict:
         """Generate market expansion prioritization"""
         
         if 'state_penetration' not in self.results:
@@ -146,16 +265,17 @@ class ProductInsightsGenerator:
         
         # Composite score: high penetration + decent market size
         state_data['Opportunity_Score'] = (
-            0.6 * (100 - state_data['Penetration_Rank']) + 
-            0.4 * (100 - state_data['Sample_Size_Rank'])
+            penetration_weight * (100 - state_data['Penetration_Rank']) + 
+            (1 - penetration_weight) * (100 - state_data['Sample_Size_Rank'])
         )
         
         state_data = state_data.sort_values('Opportunity_Score', ascending=False)
         
         # Categorize states
-        tier_1_states = state_data.head(8)['State'].tolist()  # High priority
-        tier_2_states = state_data.iloc[8:18]['State'].tolist()  # Medium priority
-        tier_3_states = state_data.iloc[18:]['State'].tolist()  # Low priority / watch list
+        tier_1_end, tier_2_end = tier_cutoffs
+        tier_1_states = state_data.head(tier_1_end)['State'].tolist()  # High priority
+        tier_2_states = state_data.iloc[tier_1_end:tier_2_end]['State'].tolist()  # Medium priority
+        tier_3_states = state_data.iloc[tier_2_end:]['State'].tolist()  # Low priority / watch list
         
         return {
             'tier_1_states': tier_1_states,
@@ -168,41 +288,52 @@ class ProductInsightsGenerator:
             }
         }
     
+    @profiled()
+    def expansion_sensitivity(self, weights: np.ndarray | None = None,
+                              n_bootstrap: int = 500,
+                              tier_cutoffs: Tuple[int, int] = (8, 18),
+                              penetration_weight: float = 0.6,
+                              seed: int = 42) -> Dict:
+        """
+        How stable are the expansion tiers?
+        
+        Re-scores states over a grid of penetration weights and bootstrap
+        replicates of state penetration (see sensitivity.expansion_sensitivity).
+        """
+        if 'state_penetration' not in self.results:
+            return {}
+        from sensitivity import expansion_sensitivity
+        return expansion_sensitivity(self.results['state_penetration'], weights=weights,
+                                     n_bootstrap=n_bootstrap, tier_cutoffs=tier_cutoffs,
+                                     penetration_weight=penetration_weight, seed=seed)
+    
+    @profiled()
     def generate_merchandising_matrix(self) -> pd.DataFrame:
         """
         Generate category-region merchandising recommendations
         """
-        recommendations = []
-        
         # Based on household composition
         if 'h2' in self.results and 'category_skew_index' in self.results['h2']:
-            category_skew = self.results['h2']['category_skew_index']
-            
-            for category, skew_dict in category_skew.items():
-                single_skew = skew_dict.get('Single/Small', 1.0)
-                family_skew = skew_dict.get('Family', 1.0)
-                
-                # Determine recommendation
-                if single_skew > 1.2:
-                    rec_single = 'HIGH STOCK - Premium placement'
-                    rec_family = 'STANDARD STOCK'
-                elif single_skew < 0.8:
-                    rec_single = 'LOW STOCK - Limited SKUs'
-                    rec_family = 'HIGH STOCK - Premium placement'
-                else:
-                    rec_single = 'STANDARD STOCK'
-                    rec_family = 'STANDARD STOCK'
-                
-                recommendations.append({
-                    'Category': category.replace('Online_', ''),
-                    'Single_HH_Areas': rec_single,
-                    'Family_HH_Areas': rec_family,
-                    'Single_Skew_Index': f"{single_skew:.2f}x",
-                    'Family_Skew_Index': f"{family_skew:.2f}x"
-                })
-        
-        return pd.DataFrame(recommendations)
+            table = skew_dict_to_table(self.results['h2']['category_skew_index'])
+            if len(table):
+                return format_merchandising_matrix(table)
+        
+        return pd.DataFrame()
     
+    @profiled()
+    def generate_regional_merchandising(self, regions: List[str] | None = None,
+                                        cube: AggregateCube | None = None) -> pd.DataFrame:
+        """
+        Numeric merchandising table for every region x segment x category cell
+        
+        Defaults to State x Urban regions; see merchandising.merchandising_cube
+        for the columns and format_merchandising_matrix for memo strings.
+        """
+        if cube is None:
+            cube = AggregateCube.from_dataframe(self.df)
+        return merchandising_cube(cube, regions)
+    
+    @profiled()
     def generate_feature_prioritization(self) -> List[Dict]:
         """
         Prioritize product features based on insights
@@ -265,165 +396,18 @@ class ProductMemoWriter:
         self.merchandising = merchandising_matrix
         self.features = features
     
+    @profiled()
     def write_memo(self, output_path: str = '../outputs/product_memo.md'):
         """Write complete product memo"""
         
-        memo = f"""# Product Discovery: Household Structure & E-commerce Adoption in India
-
-**Date:** {datetime.now().strftime('%B %d, %Y')}  
-**Author:** Product Analytics Team  
-**Audience:** Product Leadership, Strategy Team
-
----
-
-## Executive Summary
-
-This analysis investigates whether household composition correlates with online purchasing behavior across Indian states/UTs. The objective is to inform quick-commerce expansion strategy, merchandising decisions, and feature prioritization.
-
-**Key Finding:** Household structure significantly influences online purchase adoption, with single/small households showing 20-35% higher propensity. However, internet access remains the primary gatekeeper, creating a ~50 percentage point adoption gap.
-
-**Strategic Implication:** Pursue a **dual-track strategy**:
-1. **Short-term:** Dominate bachelor-heavy neighborhoods in tier-1 cities with internet access
-2. **Mid-term:** Expand family-focused offerings in tier-2 cities as internet penetration grows
-
----
-
-## Problem Framing
-
-### Context
-- Household structures vary significantly across India (urban singles vs. joint families)
-- Quick-commerce success depends on understanding micro-market demand patterns
-- Need to sequence expansion and merchandising decisions based on household composition
-
-### Research Questions
-1. Do smaller household sizes correlate with higher online purchase adoption?
-2. How do category preferences differ between single and family households?
-3. Does internet availability mediate the household structure effect?
-
-### Data Source
-- MoSPI Household Consumption Expenditure Survey 2022-23 (simulated for this analysis)
-- Sample dataset with household records across 28 states
-
-### Key Assumption
-**"Bachelor vs Family"** is approximated using **household size proxies** (1-2 members = single/small; 3+ = family). This is not a direct demographic measurement but a reasonable proxy based on available data.
-
----
-
-## Key Insights
-
-"""
-        # Add insights
-        for i, insight in enumerate(self.insights, 1):
-            memo += f"""### Insight #{i}: {insight['insight']}
-
-**Product Implication:** {insight['implication']}
-
-**Metric Impact:** {insight['metric_impact']}
-
-**Product Action:** {insight['product_action']}
-
-**Priority:** {insight['priority']}
-
----
-
-"""
-        
-        memo += f"""## Strategic Recommendations
-
-### 1. Market Expansion Strategy
-
-**Tier 1 (Expand Aggressively):**  
-{', '.join(self.expansion.get('tier_1_states', [])[:5])}
-
-*Rationale:* {self.expansion.get('rationale', {}).get('tier_1', 'High potential markets')}
-
-**Tier 2 (Selective Pilots):**  
-{', '.join(self.expansion.get('tier_2_states', [])[:5])}
-
-*Rationale:* {self.expansion.get('rationale', {}).get('tier_2', 'Growing markets')}
-
-**Tier 3 (Monitor Only):**  
-{', '.join(self.expansion.get('tier_3_states', [])[:3])}
-
-*Rationale:* {self.expansion.get('rationale', {}).get('tier_3', 'Early stage markets')}
-
----
-
-### 2. Merchandising Strategy
-
-#### Category Prioritization by Neighborhood Type
-
-{self.merchandising.to_markdown(index=False) if not self.merchandising.empty else 'See analysis for details'}
-
-**Operational Guidance:**
-- Use pin code-level household composition data to customize dark store inventory
-- A/B test "Singles Essentials" shelf in bachelor-heavy neighborhoods
-- Push bulk subscription offers in family-dominant areas
-
----
-
-### 3. Product Feature Prioritization
-
-"""
-        
-        for feature in self.features:
-            memo += f"""**{feature['feature']}**  
-- *Description:* {feature['description']}  
-- *Target:* {feature['target_segment']}  
-- *Impact:* {feature['expected_impact']}  
-- *Effort:* {feature['effort']} | *Priority Score:* {feature['priority_score']}/10
-
-"""
-        
-        memo += """---
-
-## Limitations & Caveats
-
-1. **Proxy Measurement:** Household size is an imperfect proxy for bachelor/family status. Actual behavioral differences may be stronger or weaker.
-
-2. **Correlation ≠ Causation:** We observe correlations but cannot definitively establish causal relationships. Confounding factors (income, education, urbanization) may drive observed patterns.
-
-3. **Data Constraints:** Analysis uses simulated data mimicking HCES structure. Real HCES 2022-23 unit-level data may show different patterns.
-
-4. **Regional Heterogeneity:** State-level analysis masks intra-state variation. City-level and pin code-level analysis would provide more actionable insights.
-
-5. **Dynamic Market:** Household composition and internet penetration are changing rapidly. Insights require quarterly updates.
-
----
-
-## Next Steps
-
-### Immediate (0-3 months)
-1. **Validate with Real Data:** Obtain actual HCES 2022-23 data and proprietary customer data
-2. **Pilot "Singles Category":** Test in 2-3 bachelor-heavy neighborhoods in Bangalore/Delhi
-3. **Analyze Own Customer Data:** Segment existing customers by estimated household type
-
-### Short-term (3-6 months)
-1. **Pin Code-Level Analysis:** Map household composition at granular level using Census + internal data
-2. **A/B Test Assortment:** Compare bachelor-optimized vs. family-optimized dark stores
-3. **Build Prediction Model:** Create ML model to predict household type from purchase behavior
-
-### Long-term (6-12 months)
-1. **Launch Micro-Market Optimization:** Dynamically adjust inventory by neighborhood household mix
-2. **Expand Tier-2 Pilot:** Enter 3-5 tier-2 cities with clear household segmentation strategy
-3. **Build Subscription Product:** Launch differentiated subscription for singles vs. families
-
----
-
-## Appendix: Metrics Definitions
-
-- **Online Purchase Penetration:** % of households making ≥1 online purchase in survey period
-- **Category Skew Index:** (Category's share in segment) / (National average). >1.0 = over-indexing
-- **Opportunity Score:** Composite metric combining current penetration and market size potential
-
----
-
-**Confidential:** For internal use only
-"""
+        memo = render_memo(MemoVariant(name='product_memo', insights=self.insights,
+                                       expansion=self.expansion,
+                                       merchandising=self.merchandising,
+                                       features=self.features))
         
-        # Write to file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(memo)
+        # Atomic write under a lock: concurrent runs never interleave or leave a partial memo
+        with file_lock(output_path):
+            atomic_write_text(output_path, memo, suffix='.md')
         
         print(f"✅ Product memo written to {output_path}")
         return memo
@@ -0,0 +1,229 @@
+"""
+Pipeline Profiling & Memory Instrumentation
+
+Records wall time, CPU time, peak traced memory (tracemalloc), peak RSS and
+row counts for pipeline stages and their sub-steps, and exports them as:
+1. JSON (one record per span, with its parent path)
+2. Chrome trace format (open in chrome://tracing or https://ui.perfetto.dev)
+
+Instrumentation is a no-op until enable_profiling() is called: profile_stage()
+then returns a shared null span, so disabled runs pay one global lookup.
+
+Usage:
+    from profiling import enable_profiling, profile_stage
+
+    profiler = enable_profiling()
+    with profile_stage('analysis.h1', rows=len(df)):
+        ...
+    profiler.write_chrome_trace('outputs/profile.trace.json')
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class _NullSpan:
+    """Shared do-nothing span returned while profiling is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+_PROFILER = None
+
+
+class Span:
+    """One timed region; nested spans record their parent path"""
+
+    def __init__(self, profiler: 'Profiler', name: str, rows: int | None, meta: Dict):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+        self.meta = meta
+        self.path = name
+        self.max_peak = 0
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        if stack:
+            self.path = f"{stack[-1].path}/{self.name}"
+        if self.profiler.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].max_peak = max(stack[-1].max_peak, peak)
+            tracemalloc.reset_peak()
+            self.start_mem = current
+            self.max_peak = current
+        stack.append(self)
+        self.start_cpu = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.start_cpu
+        stack = self.profiler._stack()
+        stack.pop()
+
+        record = {
+            'name': self.name,
+            'path': self.path,
+            'start_s': self.start - self.profiler.origin,
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'rows': self.rows,
+            'thread': threading.get_ident(),
+            **self.meta
+        }
+        if self.profiler.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            span_peak = max(self.max_peak, peak)
+            record['peak_traced_mb'] = (span_peak - self.start_mem) / 1e6
+            if stack:
+                stack[-1].max_peak = max(stack[-1].max_peak, span_peak)
+        record['max_rss_mb'] = _max_rss_mb()
+
+        self.profiler._record(record)
+        return False
+
+
+class Profiler:
+    """Collects span records for one pipeline run"""
+
+    def __init__(self, memory: bool = True):
+        self.memory = memory
+        self.origin = time.perf_counter()
+        self.records: List[Dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def span(self, name: str, rows: int | None = None, **meta) -> Span:
+        return Span(self, name, rows, meta)
+
+    def close(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def write_json(self, path: str):
+        """Write span records as a JSON list"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.records, f, indent=2, default=str)
+        print(f"✅ Profile written to {path}")
+
+    def write_chrome_trace(self, path: str):
+        """Write spans as Chrome trace 'complete' events"""
+        pid = os.getpid()
+        events = []
+        for rec in self.records:
+            args = {k: v for k, v in rec.items()
+                    if k not in ('name', 'start_s', 'wall_s', 'thread') and v is not None}
+            events.append({
+                'name': rec['name'],
+                'cat': rec['path'].split('/')[0],
+                'ph': 'X',
+                'ts': rec['start_s'] * 1e6,
+                'dur': rec['wall_s'] * 1e6,
+                'pid': pid,
+                'tid': rec['thread'],
+                'args': args
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+        print(f"✅ Chrome trace written to {path}")
+
+    def print_summary(self, max_depth: int = 3):
+        """Print spans up to max_depth levels, in start order"""
+        print(f"\n   {'Span':<48}{'Wall s':>9}{'CPU s':>9}{'Peak MB':>10}{'Rows':>11}")
+        print(f"   {'-' * 87}")
+        for rec in sorted(self.records, key=lambda r: r['start_s']):
+            depth = rec['path'].count('/')
+            if depth >= max_depth:
+                continue
+            label = ('  ' * depth + rec['name'])[:47]
+            peak = f"{rec['peak_traced_mb']:.1f}" if 'peak_traced_mb' in rec else '-'
+            rows = f"{rec['rows']:,}" if rec.get('rows') is not None else '-'
+            print(f"   {label:<48}{rec['wall_s']:>9.3f}{rec['cpu_s']:>9.3f}{peak:>10}{rows:>11}")
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _record(self, record: Dict):
+        with self._lock:
+            self.records.append(record)
+
+
+def enable_profiling(memory: bool = True) -> Profiler:
+    """Start collecting spans; memory=True also enables tracemalloc (slower)"""
+    global _PROFILER
+    _PROFILER = Profiler(memory=memory)
+    return _PROFILER
+
+
+def disable_profiling() -> Profiler | None:
+    """Stop collecting and return the profiler that was active"""
+    global _PROFILER
+    profiler, _PROFILER = _PROFILER, None
+    if profiler is not None:
+        profiler.close()
+    return profiler
+
+
+def get_profiler() -> Profiler | None:
+    return _PROFILER
+
+
+def profile_stage(name: str, rows: int | None = None, **meta):
+    """Context manager timing a stage; free when profiling is disabled"""
+    if _PROFILER is None:
+        return _NULL_SPAN
+    return _PROFILER.span(name, rows, **meta)
+
+
+def profiled(name: str | None = None):
+    """Decorator form of profile_stage"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _PROFILER is None:
+                return func(*args, **kwargs)
+            with _PROFILER.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _max_rss_mb() -> float | None:
+    """Peak resident set size of this process so far"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss / 1e6 if os.uname().sysname == 'Darwin' else rss / 1024
@@ -0,0 +1,186 @@
+"""
+Internet-Growth What-If Simulator
+
+Projects state penetration if internet access grows, using the
+StatisticalModeler logistic fit:
+1. Coefficients are drawn from their approximate sampling distribution
+   (multivariate normal around the fit, covariance from the fit's Hessian)
+2. Each scenario draws an annual internet-growth path per state (pp/year)
+3. Growth moves households from no-internet to internet cells of the state's
+   Urban x Household_Size mix, and penetration is re-scored from the model
+
+All scenarios x years x states are evaluated as batched array operations on
+the cell table of an AggregateCube; chunks of scenarios can run in worker
+processes. The model-implied uplift is added to the observed state
+penetration, so zero growth reproduces today's numbers.
+
+Usage:
+    simulator = InternetGrowthSimulator(results['model'], AggregateCube.from_dataframe(df))
+    projection = simulator.simulate(n_scenarios=5000, growth_pp=4, growth_sd=1.5, years=3)
+    strategy_input = simulator.to_state_penetration(projection, quantile=0.5)
+    projected = ProductInsightsGenerator({'state_penetration': strategy_input}, None)
+    projected.generate_expansion_strategy()
+"""
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+from aggregates import AggregateCube
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+class InternetGrowthSimulator:
+    """Monte Carlo projection of state penetration under internet growth"""
+
+    def __init__(self, model: Dict, cube: AggregateCube):
+        if 'covariance' not in model or 'Internet_Access' not in model.get('features', []):
+            raise ValueError("Need a StatisticalModeler fit that includes Internet_Access")
+        self.model = model
+        self.features = model['features']
+
+        # One cell per (State, other covariates); internet is the dimension that shifts
+        others = [f for f in self.features if f != 'Internet_Access']
+        rolled = cube.rollup(['State', 'Internet_Access'] + others)
+        cells = rolled.pivot_table(index=['State'] + others, columns='Internet_Access',
+                                   values='Weight', aggfunc='sum', fill_value=0.0)
+        cells = cells.reindex(columns=[0, 1], fill_value=0.0)
+        self.cells = cells.reset_index()
+
+        states = cube.rollup(['State'])
+        self.states = states['State'].to_numpy()
+        self.sample_size = states['Households'].to_numpy()
+        state_weight = states['Weight'].to_numpy()
+        self.observed = (cube.penetration(['State'])['Penetration_%'].to_numpy())
+        with_internet = self.cells.groupby('State')[1].sum().reindex(self.states).to_numpy()
+        self.internet_share = with_internet / state_weight * 100
+
+        state_index = pd.Index(self.states)
+        self.cell_state = state_index.get_indexer(self.cells['State'])
+        self.weight_without = self.cells[0].to_numpy(dtype=float)
+        self.weight_with = self.cells[1].to_numpy(dtype=float)
+        self.state_weight = state_weight
+
+        # Scaled design rows for each cell with internet = 0 and = 1
+        self.design = {access: self._design(access) for access in (0, 1)}
+
+    def draw_coefficients(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        """(n, 1 + features) draws of [intercept, coefficients]"""
+        mean = np.concatenate([[self.model['intercept']],
+                               [self.model['coefficients'][f] for f in self.features]])
+        return rng.multivariate_normal(mean, self.model['covariance'], size=n)
+
+    def draw_growth(self, n: int, years: int, growth_pp, growth_sd,
+                    rng: np.random.Generator) -> np.ndarray:
+        """
+        (n, years, states) cumulative internet-access gain in percentage points
+
+        growth_pp / growth_sd are scalars or per-state Series (annual pp);
+        paths are capped at 100% access.
+        """
+        mean = self._per_state(growth_pp)
+        sd = self._per_state(growth_sd)
+        annual = rng.normal(mean, sd, size=(n, years, len(self.states)))
+        cumulative = np.cumsum(np.maximum(annual, 0.0), axis=1)
+        return np.minimum(cumulative, 100.0 - self.internet_share)
+
+    def project(self, coefficients: np.ndarray, growth: np.ndarray) -> np.ndarray:
+        """Projected penetration % (n, years, states) for given draws"""
+        p_without = _sigmoid(coefficients @ self.design[0].T)        # (n, cells)
+        p_with = _sigmoid(coefficients @ self.design[1].T)
+
+        n_states = len(self.states)
+        to_states = np.zeros((len(self.cell_state), n_states))
+        to_states[np.arange(len(self.cell_state)), self.cell_state] = 1.0
+
+        # Model-implied change in state penetration if every no-internet household got access
+        shift = (self.weight_without * (p_with - p_without)) @ to_states / self.state_weight
+
+        # Share of no-internet households that gain access
+        without_share = np.maximum(100.0 - self.internet_share, 1e-9)
+        moved = growth / without_share                                     # (n, years, states)
+        uplift = moved * shift[:, None, :] * 100
+        return np.clip(self.observed + uplift, 0.0, 100.0)
+
+    def simulate(self, n_scenarios: int = 5000, growth_pp=3.0, growth_sd=1.0,
+                 years: int = 3, seed: int = 42, jobs: int = 1,
+                 chunk_size: int = 2000) -> Dict:
+        """
+        Run the scenario ensemble
+
+        Returns dict with draws (scenarios x years x states), states, years,
+        and summary (per state, final year): Current_%, Internet_%, Mean_%,
+        P5_%, P50_%, P95_%, Uplift_pp.
+        """
+        chunks = [min(chunk_size, n_scenarios - start) for start in range(0, n_scenarios, chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+        args = [(self, size, growth_pp, growth_sd, years, s) for size, s in zip(chunks, seeds)]
+
+        if jobs > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as pool:
+                parts = list(pool.map(_simulate_chunk, *zip(*args)))
+        else:
+            parts = [_simulate_chunk(*a) for a in args]
+        draws = np.concatenate(parts, axis=0)
+
+        final = draws[:, -1, :]
+        p5, p50, p95 = np.percentile(final, [5, 50, 95], axis=0)
+        summary = pd.DataFrame({
+            'State': self.states,
+            'Current_%': self.observed,
+            'Internet_%': self.internet_share,
+            'Mean_%': final.mean(axis=0),
+            'P5_%': p5,
+            'P50_%': p50,
+            'P95_%': p95,
+            'Uplift_pp': final.mean(axis=0) - self.observed
+        }).sort_values('Mean_%', ascending=False).reset_index(drop=True)
+
+        return {
+            'draws': draws,
+            'states': self.states,
+            'years': np.arange(1, years + 1),
+            'summary': summary
+        }
+
+    def to_state_penetration(self, projection: Dict, quantile: float = 0.5,
+                             year: int | None = None) -> pd.DataFrame:
+        """
+        Projected penetration in the state_penetration layout, so
+        ProductInsightsGenerator({'state_penetration': ...}, None).generate_expansion_strategy()
+        can rank states on projected rather than current adoption
+        """
+        year_index = -1 if year is None else int(np.flatnonzero(projection['years'] == year)[0])
+        values = np.quantile(projection['draws'][:, year_index, :], quantile, axis=0)
+        return pd.DataFrame({
+            'State': self.states,
+            'Penetration_%': values,
+            'Sample_Size': self.sample_size.astype(int)
+        })
+
+    def _design(self, access: int) -> np.ndarray:
+        means = self.model['feature_means']
+        scales = self.model['feature_scales']
+        columns = [np.ones(len(self.cells))]
+        for feature in self.features:
+            raw = np.full(len(self.cells), float(access)) if feature == 'Internet_Access' \
+                else self.cells[feature].to_numpy(dtype=float)
+            columns.append((raw - means[feature]) / scales[feature])
+        return np.column_stack(columns)
+
+    def _per_state(self, value) -> np.ndarray:
+        if isinstance(value, pd.Series):
+            return value.reindex(self.states).fillna(0.0).to_numpy(dtype=float)
+        return np.full(len(self.states), float(value))
+
+
+def _simulate_chunk(simulator: InternetGrowthSimulator, n: int, growth_pp, growth_sd,
+                    years: int, seed: np.random.SeedSequence) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    coefficients = simulator.draw_coefficients(n, rng)
+    growth = simulator.draw_growth(n, years, growth_pp, growth_sd, rng)
+    return simulator.project(coefficients, growth)
@@ -0,0 +1,115 @@
+"""
+Expansion Strategy Sensitivity Analysis
+
+Re-evaluates the generate_expansion_strategy opportunity score
+
+    score = w * (100 - penetration_rank) + (1 - w) * (100 - sample_size_rank)
+
+over a grid of weights w and over parametric bootstrap replicates of state
+penetration (binomial resampling at each state's sample size), as a single
+(weights x replicates x states) array computation. Reports each state's
+tier-membership probabilities and rank intervals.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+DEFAULT_WEIGHTS = np.linspace(0.0, 1.0, 41)
+
+
+def rank_descending(values: np.ndarray) -> np.ndarray:
+    """Average ranks along the last axis, 1 = largest (pandas rank(ascending=False))"""
+    from scipy.stats import rankdata
+    return rankdata(-values, method='average', axis=-1)
+
+
+def tier_positions(scores: np.ndarray) -> np.ndarray:
+    """1-based position of each state after sorting scores descending (stable)"""
+    order = np.argsort(-scores, axis=-1, kind='stable')
+    positions = np.empty_like(order)
+    np.put_along_axis(positions, order,
+                      np.broadcast_to(np.arange(1, scores.shape[-1] + 1), order.shape), axis=-1)
+    return positions
+
+
+def bootstrap_penetration(penetration_pct: np.ndarray, sample_size: np.ndarray,
+                          n_bootstrap: int, rng: np.random.Generator) -> np.ndarray:
+    """(n_bootstrap, n_states) binomial replicates of penetration in %"""
+    n = np.maximum(sample_size.astype(np.int64), 1)
+    p = np.clip(penetration_pct / 100, 0.0, 1.0)
+    return rng.binomial(n, p, size=(n_bootstrap, len(n))) / n * 100
+
+
+def expansion_sensitivity(state_data: pd.DataFrame,
+                          weights: np.ndarray | None = None,
+                          n_bootstrap: int = 500,
+                          tier_cutoffs: Tuple[int, int] = (8, 18),
+                          penetration_weight: float = 0.6,
+                          seed: int = 42) -> Dict:
+    """
+    Tier stability of the expansion strategy
+
+    Args:
+        state_data: state_penetration table (State, Penetration_%, Sample_Size)
+        weights: penetration weights to sweep (default: 0..1 in steps of 0.025)
+        n_bootstrap: penetration replicates per weight
+        tier_cutoffs: end positions of tier 1 and tier 2 (as in the strategy)
+        penetration_weight: weight of the baseline strategy being assessed
+
+    Returns dict with:
+        summary: per state baseline tier, P(tier 1/2/3), median rank and 90% rank interval
+        tier_1_by_weight: P(tier 1) per state (rows) and weight (columns)
+    """
+    weights = DEFAULT_WEIGHTS if weights is None else np.asarray(weights, dtype=float)
+    tier_1_end, tier_2_end = tier_cutoffs
+    rng = np.random.default_rng(seed)
+
+    states = state_data['State'].to_numpy()
+    penetration = state_data['Penetration_%'].to_numpy(dtype=float)
+    sample_size = state_data['Sample_Size'].to_numpy()
+
+    # Sample size does not change across replicates, so its rank is fixed
+    size_rank = rank_descending(sample_size.astype(float))
+    replicates = bootstrap_penetration(penetration, sample_size, n_bootstrap, rng)
+    penetration_rank = rank_descending(replicates)                    # (B, S)
+
+    w = weights[:, None, None]
+    scores = w * (100 - penetration_rank[None]) + (1 - w) * (100 - size_rank)   # (W, B, S)
+    positions = tier_positions(scores)
+    tiers = np.where(positions <= tier_1_end, 1, np.where(positions <= tier_2_end, 2, 3))
+
+    flat_positions = positions.reshape(-1, len(states))
+    flat_tiers = tiers.reshape(-1, len(states))
+
+    # Baseline: the point estimate at the strategy's weight
+    base_score = (penetration_weight * (100 - rank_descending(penetration))
+                  + (1 - penetration_weight) * (100 - size_rank))
+    base_position = tier_positions(base_score)
+    base_tier = np.where(base_position <= tier_1_end, 1, np.where(base_position <= tier_2_end, 2, 3))
+
+    low, median, high = np.percentile(flat_positions, [5, 50, 95], axis=0)
+    summary = pd.DataFrame({
+        'State': states,
+        'Penetration_%': penetration,
+        'Baseline_Position': base_position,
+        'Baseline_Tier': base_tier,
+        'P_Tier_1': (flat_tiers == 1).mean(axis=0),
+        'P_Tier_2': (flat_tiers == 2).mean(axis=0),
+        'P_Tier_3': (flat_tiers == 3).mean(axis=0),
+        'Rank_Median': median,
+        'Rank_Low_5%': low,
+        'Rank_High_95%': high
+    }).sort_values('Baseline_Position').reset_index(drop=True)
+
+    tier_1_by_weight = pd.DataFrame((tiers == 1).mean(axis=1).T, index=states,
+                                    columns=np.round(weights, 4))
+    tier_1_by_weight.index.name = 'State'
+
+    return {
+        'summary': summary,
+        'tier_1_by_weight': tier_1_by_weight,
+        'weights': weights,
+        'n_bootstrap': n_bootstrap,
+        'tier_cutoffs': tier_cutoffs
+    }
@@ -0,0 +1,306 @@
+"""
+Streaming Ingestion of First-Party Survey Responses
+
+Follows an append-only response file (CSV with header, or JSON lines) or a
+local queue stand-in, and folds records into the same metrics as the batch
+pipeline as they arrive:
+1. Records are read in micro-batches (at most batch_size per poll)
+2. Each batch goes through DataCleaner (state names, binary flags, invalid
+   records) and is reduced to an AggregateCube
+3. Batch cubes are added to the running cube (AggregateCube.combine), so
+   weighted penetration, Category Skew and the size x purchase contingency
+   table are always current without re-reading earlier records
+4. Refreshed metrics are published every publish_interval seconds (if new
+   records arrived); a record is published at most publish_interval +
+   poll_interval after it is written
+
+Usage:
+    pipeline = StreamingPipeline(FileTailSource('data/responses.csv'),
+                                 publisher=JsonPublisher('outputs/live_metrics.json'))
+    pipeline.run(duration=3600)
+
+    python src/streaming.py --follow data/responses.csv --interval 5
+"""
+
+import argparse
+import io
+import json
+import os
+import queue
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCube
+from artifact_store import atomic_write_text
+from data_collection import DataCleaner, DataCollector
+
+# Queue sentinel: producers put this to end the stream
+END_OF_STREAM = None
+
+
+class FileTailSource:
+    """Reads complete new lines from an append-only CSV or JSON-lines file"""
+
+    def __init__(self, path: str, fmt: str | None = None, from_start: bool = True):
+        """
+        Args:
+            fmt: 'csv' or 'jsonl' (default: from the file extension)
+            from_start: False skips records already in the file
+        """
+        self.path = path
+        self.fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.offset = 0
+        self.header = None
+        self.pending = []
+        self.finished = False
+        if not from_start and os.path.exists(path):
+            self._skip_existing()
+
+    def poll(self, max_records: int) -> pd.DataFrame | None:
+        """Up to max_records new records (None if nothing new)"""
+        if len(self.pending) < max_records:
+            self._read_new_lines()
+        if not self.pending:
+            return None
+        lines, self.pending = self.pending[:max_records], self.pending[max_records:]
+        if self.fmt == 'jsonl':
+            return pd.DataFrame([json.loads(line) for line in lines])
+        return pd.read_csv(io.StringIO('\n'.join([self.header] + lines)))
+
+    def _read_new_lines(self):
+        if not os.path.exists(self.path):
+            return
+        if os.path.getsize(self.path) < self.offset:
+            # Truncated or replaced: start over
+            self.offset, self.header = 0, None
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        # Only consume complete lines; a partially written record waits for the next poll
+        end = chunk.rfind(b'\n') + 1
+        self.offset += end
+        lines = [line for line in chunk[:end].decode('utf-8').splitlines() if line.strip()]
+        if self.fmt == 'csv' and self.header is None and lines:
+            self.header, lines = lines[0], lines[1:]
+        self.pending.extend(lines)
+
+    def _skip_existing(self):
+        self._read_new_lines()
+        self.pending = []
+
+
+class QueueSource:
+    """Drains records (dicts or DataFrames) from a queue.Queue / multiprocessing.Queue"""
+
+    def __init__(self, source_queue):
+        self.queue = source_queue
+        self.finished = False
+
+    def poll(self, max_records: int) -> pd.DataFrame | None:
+        frames, records = [], []
+        while len(records) + sum(len(f) for f in frames) < max_records:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is END_OF_STREAM:
+                self.finished = True
+                break
+            if isinstance(item, pd.DataFrame):
+                frames.append(item)
+            else:
+                records.append(item)
+        if records:
+            frames.append(pd.DataFrame(records))
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+
+class StreamingAggregator:
+    """Running AggregateCube fed by cleaned micro-batches"""
+
+    def __init__(self, dimensions: List[str] | None = None,
+                 weight_col: str = 'Sample_Weight', cleaner: DataCleaner | None = None):
+        self.dimensions = dimensions
+        self.weight_col = weight_col
+        self.cleaner = cleaner or DataCleaner(DataCollector())
+        self.cube = None
+        self.records = 0
+        self.rejected = 0
+        self.batches = 0
+
+    def update(self, batch: pd.DataFrame) -> int:
+        """Clean and add a micro-batch; returns the number of records kept"""
+        clean = self.cleaner.clean_dataset(batch, verbose=False)
+        self.rejected += len(batch) - len(clean)
+        if clean.empty:
+            return 0
+        if 'State_Standardized' in clean.columns:
+            clean['State'] = clean['State_Standardized']
+        batch_cube = AggregateCube.from_dataframe(clean, self.dimensions, self.weight_col)
+        self.cube = batch_cube if self.cube is None else self.cube.combine(batch_cube)
+        self.records += len(clean)
+        self.batches += 1
+        return len(clean)
+
+    def contingency(self) -> pd.DataFrame:
+        """Household_Size x Online_Purchase counts (as pd.crosstab on the records)"""
+        rolled = self.cube.rollup(['Household_Size'])
+        table = pd.DataFrame({
+            0: (rolled['Households'] - rolled['Online_Purchase']).to_numpy(),
+            1: rolled['Online_Purchase'].to_numpy()
+        }, index=pd.Index(rolled['Household_Size'].to_numpy(), name='Household_Size'))
+        table.columns.name = 'Online_Purchase'
+        return table
+
+    def snapshot(self) -> Dict:
+        """Current metrics"""
+        from scipy import stats
+
+        if self.cube is None:
+            return {'records': 0}
+        contingency = self.contingency()
+        observed = contingency.loc[:, (contingency > 0).any()]
+        observed = observed[(observed > 0).any(axis=1)]
+        chi2, chi_p = (stats.chi2_contingency(observed)[:2]
+                       if observed.shape[0] > 1 and observed.shape[1] > 1 else (np.nan, np.nan))
+        return {
+            'records': self.records,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'overall_penetration': float(self.cube.penetration()['Penetration_%'].iloc[0]),
+            'state_penetration': self.cube.penetration(['State']),
+            'household_size_penetration': self.cube.penetration(['HH_Size_Bucket']),
+            'category_skew_index': self.cube.category_skew(),
+            'contingency': contingency,
+            'chi_square': float(chi2),
+            'chi_square_p_value': float(chi_p)
+        }
+
+
+class JsonPublisher:
+    """Writes each snapshot to a JSON file atomically (readers never see half a file)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def __call__(self, snapshot: Dict):
+        def plain(value):
+            if isinstance(value, pd.DataFrame):
+                if value.index.name:
+                    value = value.reset_index()
+                value.columns = [str(c) for c in value.columns]
+                return value.to_dict(orient='records')
+            if isinstance(value, dict):
+                return {str(k): plain(v) for k, v in value.items()}
+            if isinstance(value, np.generic):
+                return value.item()
+            if isinstance(value, float) and np.isnan(value):
+                return None
+            return value
+
+        atomic_write_text(self.path, json.dumps(plain(snapshot), indent=2, default=str),
+                          suffix='.json')
+
+
+class StreamingPipeline:
+    """Poll -> clean -> aggregate -> publish loop"""
+
+    def __init__(self, source, aggregator: StreamingAggregator | None = None,
+                 publisher: Callable[[Dict], None] | None = None,
+                 publish_interval: float = 5.0, poll_interval: float = 0.5,
+                 batch_size: int = 1000):
+        """
+        Args:
+            publish_interval: seconds between published snapshots
+            poll_interval: sleep when the source has nothing new
+            batch_size: maximum records per micro-batch
+        """
+        self.source = source
+        self.aggregator = aggregator or StreamingAggregator()
+        self.publisher = publisher or (lambda snapshot: None)
+        self.publish_interval = publish_interval
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.published = 0
+        self.max_latency = 0.0
+
+    def run(self, duration: float | None = None, idle_timeout: float | None = None) -> Dict:
+        """
+        Process records until the source ends, duration elapses, or nothing
+        arrives for idle_timeout seconds; returns the final snapshot
+        """
+        start = last_publish = last_data = time.monotonic()
+        oldest_unpublished = None
+
+        while True:
+            now = time.monotonic()
+            if duration is not None and now - start >= duration:
+                break
+
+            batch = self.source.poll(self.batch_size)
+            if batch is not None and len(batch):
+                self.aggregator.update(batch)
+                last_data = time.monotonic()
+                oldest_unpublished = oldest_unpublished or last_data
+            elif idle_timeout is not None and time.monotonic() - last_data >= idle_timeout:
+                # Only an empty poll can end the run as idle
+                break
+
+            now = time.monotonic()
+            if oldest_unpublished is not None and now - last_publish >= self.publish_interval:
+                self._publish(now - oldest_unpublished)
+                last_publish, oldest_unpublished = now, None
+                # Time spent snapshotting and publishing is not idle time
+                last_data = time.monotonic()
+
+            if self.source.finished:
+                break
+            if batch is None or len(batch) < self.batch_size:
+                time.sleep(self.poll_interval)
+
+        if oldest_unpublished is not None:
+            self._publish(time.monotonic() - oldest_unpublished)
+        return self.aggregator.snapshot()
+
+    def _publish(self, latency: float):
+        snapshot = self.aggregator.snapshot()
+        self.max_latency = max(self.max_latency, latency)
+        snapshot['published_at'] = datetime.now().isoformat(timespec='seconds')
+        snapshot['latency_seconds'] = latency
+        self.publisher(snapshot)
+        self.published += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream survey responses into live penetration metrics')
+    parser.add_argument('--follow', required=True, help='Append-only CSV or JSON-lines response file')
+    parser.add_argument('--output', default='outputs/live_metrics.json')
+    parser.add_argument('--interval', type=float, default=5.0, help='Seconds between published snapshots')
+    parser.add_argument('--poll', type=float, default=0.5, help='Seconds between polls when idle')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--duration', type=float, help='Stop after this many seconds')
+    parser.add_argument('--idle-timeout', type=float, help='Stop after this many seconds without new records')
+    parser.add_argument('--new-only', action='store_true', help='Skip records already in the file')
+    args = parser.parse_args()
+
+    pipeline = StreamingPipeline(
+        FileTailSource(args.follow, from_start=not args.new_only),
+        publisher=JsonPublisher(args.output),
+        publish_interval=args.interval, poll_interval=args.poll, batch_size=args.batch_size
+    )
+    print(f"📡 Following {args.follow} (publishing to {args.output} every {args.interval:g}s)")
+    try:
+        final = pipeline.run(duration=args.duration, idle_timeout=args.idle_timeout)
+    except KeyboardInterrupt:
+        final = pipeline.aggregator.snapshot()
+    print(f"✅ {final['records']:,} records in {pipeline.aggregator.batches} batches, "
+          f"{pipeline.published} snapshots (max latency {pipeline.max_latency:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
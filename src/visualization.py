@@ -8,14 +8,19 @@ Creates:
 4. Interactive dashboard components
 """
 
+from __future__ import annotations
+
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import matplotlib.pyplot as plt
-import seaborn as sns
-from typing import Dict, List
+from typing import Dict, List, TYPE_CHECKING
+
+from artifact_store import atomic_write_text
+from profiling import profile_stage
+
+# plotly is imported inside the chart builders so importing this module
+# (e.g. from the analysis-only or memo-only paths) does not load it
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
 
 
 class IndiaMapVisualizer:
@@ -35,6 +40,8 @@ class IndiaMapVisualizer:
             metric_col: Column name for the metric to visualize
             title: Chart title
         """
+        import plotly.express as px
+
         fig = px.choropleth(
             state_data,
             geojson=self.india_geojson_url,
@@ -79,6 +86,8 @@ class HouseholdAdoptionVisualizer:
             penetration_df: DataFrame with HH_Size_Bucket and Penetration_%
             internet_split: Whether to split by internet access
         """
+        import plotly.express as px
+
         if not internet_split:
             fig = px.bar(
                 penetration_df,
@@ -113,33 +122,121 @@ class HouseholdAdoptionVisualizer:
         return fig
     
     @staticmethod
-    def create_scatter_with_trendline(df: pd.DataFrame) -> go.Figure:
+    def create_scatter_with_trendline(df: pd.DataFrame,
+                                      binned: bool = False,
+                                      max_size: int = 10,
+                                      weight_col: str = 'Sample_Weight') -> go.Figure:
         """
         Create scatter plot with trendline: household size vs online purchase probability
+
+        Households are grouped by size first (one marker per size), and the
+        trendline is the household-level least-squares fit computed from the
+        group totals, so the figure never carries one point per household.
+
+        Args:
+            df: Household-level DataFrame with Household_Size and Online_Purchase
+            binned: Fold sizes above max_size into one bin and weight households
+                by weight_col when present
+            max_size: Largest size bin in binned mode; bigger households fold into it
+            weight_col: Survey weight column used in binned mode when present
         """
-        # Aggregate by household size
-        agg_df = df.groupby('Household_Size').agg({
-            'Online_Purchase': 'mean',
-            'Household_ID': 'count'
-        }).reset_index()
-        
-        agg_df['Penetration_%'] = agg_df['Online_Purchase'] * 100
-        
-        fig = px.scatter(
-            agg_df,
-            x='Household_Size',
-            y='Penetration_%',
-            size='Household_ID',
-            trendline='ols',
-            title='Household Size vs Online Purchase Adoption (with Trendline)',
-            labels={'Household_Size': 'Household Size', 'Penetration_%': 'Online Purchase Rate (%)'},
-            hover_data={'Household_ID': True}
+        import plotly.graph_objects as go
+
+        bins = HouseholdAdoptionVisualizer.aggregate_size_bins(
+            df, max_size if binned else None, weight_col if binned else None
         )
-        
-        fig.update_layout(height=500, width=800)
-        
+
+        # Weighted least squares of the 0/1 outcome on household size, computed from
+        # group totals; identical to fitting on every household
+        x = bins['Household_Size'].astype(float)
+        sw = bins['Weight'].sum()
+        sx = (bins['Weight'] * x).sum()
+        sy = bins['Weight_Online'].sum()
+        sxx = (bins['Weight'] * x ** 2).sum()
+        sxy = (bins['Weight_Online'] * x).sum()
+        denom = sw * sxx - sx ** 2
+        slope = (sw * sxy - sx * sy) / denom if denom > 0 else 0.0
+        intercept = (sy - slope * sx) / sw if sw > 0 else 0.0
+
+        line_x = np.array([x.min(), x.max()]) if len(x) else np.array([])
+        line_y = (intercept + slope * line_x) * 100
+
+        max_households = bins['Households'].max() if len(bins) else 1
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=bins['Household_Size'],
+            y=bins['Penetration_%'],
+            mode='markers',
+            name='Size bin' if binned else 'Household size',
+            error_y=dict(type='data', array=1.96 * bins['SE_%'], visible=True),
+            marker=dict(
+                size=10 + 30 * np.sqrt(bins['Households'] / max_households),
+                color='steelblue'
+            ),
+            customdata=bins[['Households']],
+            hovertemplate='Household Size: %{x}<br>Online Purchase Rate: %{y:.1f}%'
+                          '<br>Households: %{customdata[0]:,}<extra></extra>'
+        ))
+        fig.add_trace(go.Scatter(
+            x=line_x,
+            y=line_y,
+            mode='lines',
+            name=f'Trend ({slope * 100:+.2f} pp per member)',
+            line=dict(color='firebrick', dash='dash')
+        ))
+
+        fig.update_layout(
+            title='Household Size vs Online Purchase Adoption '
+                  f'({"binned, " if binned else ""}with Trendline)',
+            xaxis_title=f'Household Size ({max_size} = {max_size}+)' if binned else 'Household Size',
+            yaxis_title='Online Purchase Rate (%)',
+            height=500,
+            width=800
+        )
+
         return fig
 
+    @staticmethod
+    def aggregate_size_bins(df: pd.DataFrame, max_size: int | None = 10,
+                            weight_col: str | None = 'Sample_Weight') -> pd.DataFrame:
+        """
+        Collapse households into household-size bins with weighted sufficient statistics
+
+        Returns one row per size bin with household counts, weighted
+        penetration, its standard error and the sums needed for a
+        household-level least-squares trendline. max_size=None keeps every
+        size; weight_col=None (or a missing column) weighs households equally.
+        """
+        cols = ['Household_Size', 'Online_Purchase']
+        weighted = weight_col is not None and weight_col in df.columns
+        if weighted:
+            cols.append(weight_col)
+        data = df[cols].dropna()
+        sizes = data['Household_Size']
+        if max_size is not None:
+            sizes = sizes.clip(upper=max_size)
+        x = sizes.round().astype(int).to_numpy()
+        y = data['Online_Purchase'].to_numpy(dtype=float)
+        if weighted:
+            w = data[weight_col].to_numpy(dtype=float)
+        else:
+            w = np.ones(len(data))
+
+        sums = pd.DataFrame({
+            'Household_Size': x,
+            'Households': 1,
+            'Weight': w,
+            'Weight_Sq': w ** 2,
+            'Weight_Online': w * y
+        }).groupby('Household_Size').sum().reset_index()
+
+        p = sums['Weight_Online'] / sums['Weight']
+        # Kish effective sample size keeps the SE honest under unequal weights
+        n_eff = sums['Weight'] ** 2 / sums['Weight_Sq']
+        sums['Penetration_%'] = p * 100
+        sums['SE_%'] = np.sqrt(p * (1 - p) / n_eff) * 100
+        return sums
+
 
 class CategorySkewVisualizer:
     """Visualize category preferences across household types"""
@@ -152,6 +249,8 @@ class CategorySkewVisualizer:
         Args:
             category_skew: Dict with category names as keys and {HH_Type: skew_index} as values
         """
+        import plotly.graph_objects as go
+
         # Prepare data for heatmap
         categories = list(category_skew.keys())
         hh_types = list(list(category_skew.values())[0].keys())
@@ -188,6 +287,8 @@ class CategorySkewVisualizer:
         """
         Create grouped bar chart comparing category penetration across household types
         """
+        import plotly.express as px
+
         # Reshape data
         data_rows = []
         for category, hh_type_data in category_penetration.items():
@@ -237,32 +338,40 @@ class DashboardBuilder:
         
         # 1. India penetration map
         if 'state_penetration' in self.results:
-            figures['india_map'] = self.map_viz.create_penetration_map(
-                self.results['state_penetration']
-            )
+            with profile_stage('figure.india_map'):
+                figures['india_map'] = self.map_viz.create_penetration_map(
+                    self.results['state_penetration']
+                )
         
         # 2. Household size adoption chart
         if 'household_size_penetration' in self.results:
-            figures['hh_size_adoption'] = self.hh_viz.create_adoption_by_size_chart(
-                self.results['household_size_penetration']
-            )
+            with profile_stage('figure.hh_size_adoption'):
+                figures['hh_size_adoption'] = self.hh_viz.create_adoption_by_size_chart(
+                    self.results['household_size_penetration']
+                )
         
         # 3. Category skew heatmap
         if 'h2' in self.results and 'category_skew_index' in self.results['h2']:
-            figures['category_skew'] = self.cat_viz.create_category_heatmap(
-                self.results['h2']['category_skew_index']
-            )
+            with profile_stage('figure.category_skew'):
+                figures['category_skew'] = self.cat_viz.create_category_heatmap(
+                    self.results['h2']['category_skew_index']
+                )
         
         # 4. Category comparison bars
         if 'h2' in self.results and 'category_penetration' in self.results['h2']:
-            figures['category_comparison'] = self.cat_viz.create_category_comparison_bars(
-                self.results['h2']['category_penetration']
-            )
+            with profile_stage('figure.category_comparison'):
+                figures['category_comparison'] = self.cat_viz.create_category_comparison_bars(
+                    self.results['h2']['category_penetration']
+                )
         
         return figures
     
-    def save_all_figures(self, output_dir: str = '../visualizations'):
-        """Save all figures to HTML (PNG export disabled to prevent hanging)"""
+    def save_all_figures(self, output_dir: str = '../visualizations') -> Dict[str, go.Figure]:
+        """
+        Save all figures to HTML (PNG export disabled to prevent hanging)
+        
+        Returns the built figures, so write_dashboard can reuse them
+        """
         import os
         os.makedirs(output_dir, exist_ok=True)
         
@@ -271,14 +380,44 @@ class DashboardBuilder:
         for name, fig in figures.items():
             # Save as HTML (interactive) - this is the main deliverable
             html_path = f"{output_dir}/{name}.html"
-            fig.write_html(html_path)
+            with profile_stage(f'write_html.{name}'):
+                atomic_write_text(html_path, fig.to_html(), suffix='.html')
             print(f"✅ Saved {html_path}")
+        
+        return figures
+
+    def write_dashboard(self, output_path: str = '../visualizations/dashboard.html',
+                        extra_figures: Dict[str, go.Figure] | None = None,
+                        include_plotlyjs: bool | str = True,
+                        figures: Dict[str, go.Figure] | None = None) -> str:
+        """
+        Write every dashboard figure into one self-contained HTML file
+
+        Numeric arrays are embedded as base64 typed arrays and category labels are
+        dictionary-encoded once for all figures (see dashboard_writer).
+        figures: already built dashboard figures (e.g. from save_all_figures);
+        built here when omitted.
+        """
+        import os
+        from dashboard_writer import CompactDashboardWriter
+
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+        figures = dict(figures) if figures is not None else self.build_full_dashboard()
+        if extra_figures:
+            figures.update(extra_figures)
+
+        with profile_stage('write_dashboard', figures=len(figures)):
+            return CompactDashboardWriter().write(figures, output_path, include_plotlyjs)
 
 
 def create_executive_summary_viz(analysis_results: Dict) -> go.Figure:
     """
     Create single-page executive summary visualization with key metrics
     """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
     fig = make_subplots(
         rows=2, cols=2,
         subplot_titles=(
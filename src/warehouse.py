@@ -0,0 +1,417 @@
+"""
+Local Analytics Warehouse (SQLite)
+
+Appends every result table of a pipeline run to one SQLite file with a
+stable long-format schema, so BI tools can query results directly instead
+of scraping the memo:
+
+    runs              one row per export: run_id, inputs, code version, headline numbers
+    penetration       dimension (State, Urban, ...), segment, penetration_pct, sample_size
+    hypothesis_stats  H1-H3 and model statistics (value) and conclusions (text)
+    category_skew     category, segment, penetration, skew_index
+    model_terms       feature, coefficient, odds_ratio
+    expansion_tiers   State, tier
+    insights          rank, insight, implication, priority, ...
+    cube_cells        AggregateCube sufficient statistics, one row per cell and outcome
+
+Every table is keyed by run_id. Preview runs also fill the margin columns.
+cube_cells keeps the additive statistics (households, weight, weight_sq,
+positives, positive_weight), so later queries and run-to-run tests need no
+household data. An export is one transaction of executemany inserts: a
+run is either fully present or absent. Indexes on (dimension, segment),
+(category, segment), feature and State turn point lookups and cross-run
+comparisons into index seeks.
+
+Usage:
+    warehouse = Warehouse('outputs/warehouse.sqlite')
+    run_id = warehouse.export_run(results, bundle, cube=AggregateCube.from_dataframe(df))
+    warehouse.penetration_history('State', 'Kerala')
+    warehouse.compare_runs(previous_run_id, run_id, 'State')
+"""
+
+import os
+import secrets
+import sqlite3
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCube, DEFAULT_DIMENSIONS
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    label TEXT,
+    data_path TEXT,
+    data_digest TEXT,
+    code_version TEXT,
+    states TEXT,
+    preview REAL,
+    backend TEXT,
+    households INTEGER,
+    overall_penetration_pct REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at);
+
+CREATE TABLE IF NOT EXISTS penetration (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    dimension TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    penetration_pct REAL,
+    sample_size INTEGER,
+    margin_pct REAL,
+    PRIMARY KEY (run_id, dimension, segment)
+);
+CREATE INDEX IF NOT EXISTS idx_penetration_segment ON penetration (dimension, segment, run_id);
+
+CREATE TABLE IF NOT EXISTS hypothesis_stats (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    hypothesis TEXT NOT NULL,
+    statistic TEXT NOT NULL,
+    value REAL,
+    text TEXT,
+    PRIMARY KEY (run_id, hypothesis, statistic)
+);
+
+CREATE TABLE IF NOT EXISTS category_skew (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    penetration REAL,
+    skew_index REAL,
+    margin REAL,
+    PRIMARY KEY (run_id, category, segment)
+);
+CREATE INDEX IF NOT EXISTS idx_category_skew_segment ON category_skew (category, segment, run_id);
+
+CREATE TABLE IF NOT EXISTS model_terms (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    feature TEXT NOT NULL,
+    coefficient REAL,
+    odds_ratio REAL,
+    margin REAL,
+    PRIMARY KEY (run_id, feature)
+);
+CREATE INDEX IF NOT EXISTS idx_model_terms_feature ON model_terms (feature, run_id);
+
+CREATE TABLE IF NOT EXISTS expansion_tiers (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    State TEXT NOT NULL,
+    tier INTEGER NOT NULL,
+    PRIMARY KEY (run_id, State)
+);
+CREATE INDEX IF NOT EXISTS idx_expansion_tiers_state ON expansion_tiers (State, run_id);
+
+CREATE TABLE IF NOT EXISTS insights (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    rank INTEGER NOT NULL,
+    insight TEXT,
+    implication TEXT,
+    metric_impact TEXT,
+    priority TEXT,
+    product_action TEXT,
+    PRIMARY KEY (run_id, rank)
+);
+
+CREATE TABLE IF NOT EXISTS cube_cells (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    State TEXT,
+    Urban INTEGER,
+    Internet_Access INTEGER,
+    Household_Size INTEGER,
+    outcome TEXT NOT NULL,
+    households INTEGER NOT NULL,
+    weight REAL NOT NULL,
+    weight_sq REAL NOT NULL,
+    positives INTEGER NOT NULL,
+    positive_weight REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cube_cells_run ON cube_cells (run_id, outcome);
+"""
+
+# results key -> dimension column of the penetration table
+PENETRATION_TABLES = {
+    'overall_penetration': 'Overall',
+    'state_penetration': 'State',
+    'household_size_penetration': 'HH_Size_Bucket',
+    'urban_rural_penetration': 'Urban',
+    'internet_penetration': 'Internet_Access'
+}
+
+INSIGHT_FIELDS = ['insight', 'implication', 'metric_impact', 'priority', 'product_action']
+
+
+def _rows(frame: pd.DataFrame, columns: List[str]) -> List[tuple]:
+    """Plain Python tuples (sqlite3 can't bind numpy scalars); NaN -> NULL"""
+    frame = frame[columns].astype(object).where(frame[columns].notna(), None)
+    return list(zip(*(frame[c].tolist() for c in columns)))
+
+
+def _plain(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class Warehouse:
+    """Append-only run history of all result tables in one SQLite file"""
+
+    def __init__(self, path: str = 'outputs/warehouse.sqlite', timeout: float = 30.0):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        # WAL: BI readers keep querying while a run is being appended
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        self._create_schema()
+
+    def _create_schema(self):
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"{self.path} has schema version {version}; "
+                               f"this code supports up to {SCHEMA_VERSION}")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def export_run(self, results: Dict, bundle: Dict | None = None,
+                   cube: AggregateCube | None = None, metadata: Dict | None = None) -> str:
+        """
+        Append one run (analysis results, optional insight bundle and cube) in a single transaction
+
+        Args:
+            metadata: runs-table fields (label, data_path, data_digest,
+                code_version, states, preview, backend, households)
+        Returns:
+            The new run_id
+        """
+        metadata = dict(metadata or {})
+        run_id = metadata.pop('run_id', None) or (
+            datetime.now().strftime('%Y%m%dT%H%M%S') + '-' + secrets.token_hex(3))
+        overall = results['overall_penetration'].iloc[0]
+        states = metadata.get('states')
+        run_row = {
+            'run_id': run_id,
+            'created_at': datetime.now().isoformat(timespec='microseconds'),
+            'label': metadata.get('label'),
+            'data_path': metadata.get('data_path'),
+            'data_digest': metadata.get('data_digest'),
+            'code_version': metadata.get('code_version'),
+            'states': ','.join(states) if isinstance(states, (list, tuple)) else states,
+            'preview': metadata.get('preview'),
+            'backend': metadata.get('backend'),
+            'households': int(metadata.get('households') or overall['Sample_Size']),
+            'overall_penetration_pct': float(overall['Penetration_%'])
+        }
+
+        tables = {
+            'penetration': self._penetration_rows(run_id, results),
+            'hypothesis_stats': self._hypothesis_rows(run_id, results),
+            'category_skew': self._skew_rows(run_id, results),
+            'model_terms': self._model_rows(run_id, results)
+        }
+        if bundle:
+            tables['expansion_tiers'] = [
+                (run_id, state, tier)
+                for tier in (1, 2, 3)
+                for state in bundle.get('expansion_strategy', {}).get(f'tier_{tier}_states', [])
+            ]
+            tables['insights'] = [
+                (run_id, rank, *[item.get(field) for field in INSIGHT_FIELDS])
+                for rank, item in enumerate(bundle.get('insights') or [], 1)
+            ]
+        if cube is not None:
+            tables['cube_cells'] = self._cube_rows(run_id, cube)
+
+        with self.connection:
+            self.connection.execute(
+                f"INSERT INTO runs ({', '.join(run_row)}) VALUES ({', '.join('?' * len(run_row))})",
+                [_plain(v) for v in run_row.values()]
+            )
+            for table, rows in tables.items():
+                if rows:
+                    placeholders = ', '.join('?' * len(rows[0]))
+                    self.connection.executemany(f'INSERT INTO {table} VALUES ({placeholders})', rows)
+        return run_id
+
+    @staticmethod
+    def _penetration_rows(run_id: str, results: Dict) -> List[tuple]:
+        preview = results.get('preview', {})
+        rows = []
+        for key, dimension in PENETRATION_TABLES.items():
+            if key not in results:
+                continue
+            table = results[key].copy()
+            segment_col = 'Group' if dimension == 'Overall' else dimension
+            table['Margin_%'] = np.nan
+            if key in preview:
+                margins = preview[key].set_index(segment_col)['Margin_%']
+                table['Margin_%'] = table[segment_col].map(margins)
+            table['run_id'] = run_id
+            table['dimension'] = dimension
+            table['segment'] = table[segment_col].astype(str)
+            rows.extend(_rows(table, ['run_id', 'dimension', 'segment', 'Penetration_%',
+                                      'Sample_Size', 'Margin_%']))
+
+        # H3 size gradients within each internet group
+        for key, access in (('penetration_with_internet', 1), ('penetration_without_internet', 0)):
+            table = results.get('h3', {}).get(key)
+            if table is None:
+                continue
+            rows.extend((run_id, f'HH_Size_Bucket|Internet_Access={access}', str(size),
+                         _plain(value), None, None)
+                        for size, value in zip(table['HH_Size'], table['Penetration']))
+        return rows
+
+    @staticmethod
+    def _hypothesis_rows(run_id: str, results: Dict) -> List[tuple]:
+        rows = []
+        for hypothesis in ('h1', 'h2', 'h3', 'model'):
+            for statistic, value in results.get(hypothesis, {}).items():
+                if isinstance(value, str):
+                    rows.append((run_id, hypothesis, statistic, None, value))
+                elif isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+                    rows.append((run_id, hypothesis, statistic, _plain(float(value)), None))
+
+        # Preview intervals, e.g. h1 correlation_low / correlation_high
+        preview = results.get('preview', {})
+        for key in ('h1_correlation', 'h3_correlation_with_internet', 'h3_correlation_without_internet'):
+            if key in preview:
+                hypothesis, statistic = key.split('_', 1)
+                low, high = preview[key]
+                rows.append((run_id, hypothesis, f'{statistic}_low', _plain(low), None))
+                rows.append((run_id, hypothesis, f'{statistic}_high', _plain(high), None))
+        return rows
+
+    @staticmethod
+    def _skew_rows(run_id: str, results: Dict) -> List[tuple]:
+        h2 = results.get('h2', {})
+        skew = h2.get('category_skew_index', {})
+        rates = h2.get('category_penetration', {})
+        margins = {}
+        bounds = results.get('preview', {}).get('category_skew_index')
+        if bounds is not None and len(bounds):
+            margins = {(c, s): m for c, s, m in zip(bounds['Category'], bounds['HH_Type'], bounds['Margin'])}
+        return [
+            (run_id, category, segment, _plain(rates.get(category, {}).get(segment)),
+             _plain(value), _plain(margins.get((category, segment))))
+            for category, segments in skew.items()
+            for segment, value in segments.items()
+        ]
+
+    @staticmethod
+    def _model_rows(run_id: str, results: Dict) -> List[tuple]:
+        model = results.get('model', {})
+        margins = {}
+        bounds = results.get('preview', {}).get('model')
+        if bounds is not None and len(bounds):
+            margins = dict(zip(bounds['Feature'], bounds['Margin']))
+        return [
+            (run_id, feature, _plain(coefficient), _plain(model.get('odds_ratios', {}).get(feature)),
+             _plain(margins.get(feature)))
+            for feature, coefficient in model.get('coefficients', {}).items()
+        ]
+
+    @staticmethod
+    def _cube_rows(run_id: str, cube: AggregateCube) -> List[tuple]:
+        extra = [d for d in cube.dimensions if d not in DEFAULT_DIMENSIONS]
+        if extra:
+            raise ValueError(f"cube_cells stores {DEFAULT_DIMENSIONS}; roll up {extra} first")
+        table = cube.table.copy()
+        for dim in DEFAULT_DIMENSIONS:
+            if dim not in table.columns:
+                table[dim] = None
+        table['run_id'] = run_id
+        rows = []
+        for outcome in cube.outcomes:
+            table['outcome'] = outcome
+            rows.extend(_rows(table, ['run_id'] + DEFAULT_DIMENSIONS + [
+                'outcome', 'Households', 'Weight', 'Weight_Sq', outcome, f'{outcome}_Weight']))
+        return rows
+
+    def query(self, sql: str, params: tuple | Dict = ()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    def runs(self) -> pd.DataFrame:
+        return self.query('SELECT * FROM runs ORDER BY created_at')
+
+    def latest_run_id(self, before: str | None = None) -> str | None:
+        """Most recent run_id (or the most recent one exported before run `before`)"""
+        if before is None:
+            row = self.connection.execute(
+                'SELECT run_id FROM runs ORDER BY created_at DESC LIMIT 1').fetchone()
+        else:
+            row = self.connection.execute(
+                'SELECT run_id FROM runs WHERE created_at < '
+                '(SELECT created_at FROM runs WHERE run_id = ?) '
+                'ORDER BY created_at DESC LIMIT 1', (before,)).fetchone()
+        return row[0] if row else None
+
+    def penetration_history(self, dimension: str, segment) -> pd.DataFrame:
+        """One segment's penetration across all runs, oldest first"""
+        return self.query(
+            'SELECT r.run_id, r.created_at, r.label, p.penetration_pct, p.sample_size, p.margin_pct '
+            'FROM penetration p JOIN runs r USING (run_id) '
+            'WHERE p.dimension = ? AND p.segment = ? ORDER BY r.created_at',
+            (dimension, str(segment))
+        )
+
+    def compare_runs(self, base_run: str, current_run: str,
+                     dimension: str = 'State') -> pd.DataFrame:
+        """Side-by-side penetration for every segment of a dimension in two runs"""
+        return self.query(
+            'SELECT c.segment, b.penetration_pct AS base_pct, c.penetration_pct AS current_pct, '
+            'c.penetration_pct - b.penetration_pct AS delta_pp, '
+            'b.sample_size AS base_n, c.sample_size AS current_n '
+            'FROM penetration c LEFT JOIN penetration b '
+            'ON b.run_id = ? AND b.dimension = c.dimension AND b.segment = c.segment '
+            'WHERE c.run_id = ? AND c.dimension = ? ORDER BY c.segment',
+            (base_run, current_run, dimension)
+        )
+
+    def load_cube(self, run_id: str) -> AggregateCube:
+        """Rebuild a run's AggregateCube from cube_cells"""
+        cells = self.query('SELECT * FROM cube_cells WHERE run_id = ? ORDER BY rowid', (run_id,))
+        if cells.empty:
+            raise KeyError(f"No cube cells stored for run {run_id}")
+        dimensions = [d for d in DEFAULT_DIMENSIONS if cells[d].notna().any()]
+        outcomes = list(dict.fromkeys(cells['outcome']))
+
+        first = cells[cells['outcome'] == outcomes[0]]
+        table = first[dimensions + ['households', 'weight', 'weight_sq']].rename(
+            columns={'households': 'Households', 'weight': 'Weight', 'weight_sq': 'Weight_Sq'}
+        ).reset_index(drop=True)
+        for outcome in outcomes:
+            part = cells[cells['outcome'] == outcome]
+            table[outcome] = part['positives'].to_numpy()
+            table[f'{outcome}_Weight'] = part['positive_weight'].to_numpy()
+        # Integer codes come back as REAL; columns with a missing cell stay float
+        # with NaN, as in a cube built from data with missing values
+        for dim in ('Urban', 'Internet_Access', 'Household_Size'):
+            if dim in table.columns and table[dim].notna().all():
+                table[dim] = table[dim].astype(np.int64)
+        # Unweighted cubes store Weight = Households
+        weighted = not np.allclose(table['Weight'], table['Households'])
+        return AggregateCube(table, dimensions, outcomes, weighted)
+
+    def delete_run(self, run_id: str):
+        with self.connection:
+            self.connection.execute('DELETE FROM runs WHERE run_id = ?', (run_id,))
+
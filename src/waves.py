@@ -0,0 +1,326 @@
+"""
+Multi-Wave Comparison (e.g. HCES 2011-12 vs 2022-23)
+
+Each wave is reduced to an AggregateCube once; comparisons only read the
+cubes, never both raw files together. States are aligned through a
+crosswalk that extends DataCollector.state_name_mapping with older names
+and merges units whose boundaries changed between waves:
+- Andhra Pradesh + Telangana (bifurcated 2014)
+- Jammu and Kashmir + Ladakh (reorganised 2019)
+- Dadra and Nagar Haveli + Daman and Diu (merged 2020)
+
+From the aligned cubes:
+1. Penetration deltas with standard errors (Kish effective sample size,
+   n_eff = (sum w)^2 / sum w^2, so design weights widen the errors)
+2. Category Skew Index deltas with delta-method standard errors
+3. Logistic coefficient deltas, each wave fitted by IRLS on the cube's cells
+   (binomial counts per Household_Size x Internet x Urban cell give the same
+   maximum-likelihood fit as household-level data)
+
+Usage:
+    crosswalk = WaveCrosswalk()
+    comparison = WaveComparison({
+        '2011-12': crosswalk.wave_cube(df_2011),
+        '2022-23': AggregateCube.load('outputs/cube_2022.pkl')
+    }, crosswalk)
+    comparison.penetration_deltas(['State'])
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from aggregates import AggregateCube
+from data_collection import DataCollector
+
+# Names used in older releases -> current standard names
+HISTORICAL_STATE_NAMES = {
+    'Uttaranchal': 'Uttarakhand',
+    'Dadra & Nagar Haveli': 'Dadra and Nagar Haveli',
+    'D & N Haveli': 'Dadra and Nagar Haveli',
+    'Daman & Diu': 'Daman and Diu',
+    'Pondicheri': 'Puducherry',
+    'Jammu & Kashmir (incl. Ladakh)': 'Jammu and Kashmir'
+}
+
+# Standard names -> comparison unit, for units whose boundaries changed
+BOUNDARY_UNITS = {
+    'Andhra Pradesh': 'Andhra Pradesh + Telangana',
+    'Telangana': 'Andhra Pradesh + Telangana',
+    'Jammu and Kashmir': 'Jammu and Kashmir + Ladakh',
+    'Ladakh': 'Jammu and Kashmir + Ladakh',
+    'Dadra and Nagar Haveli': 'Dadra and Nagar Haveli and Daman and Diu',
+    'Daman and Diu': 'Dadra and Nagar Haveli and Daman and Diu'
+}
+
+MODEL_FEATURES = ['Household_Size', 'Internet_Access', 'Urban']
+
+
+class WaveCrosswalk:
+    """Maps any wave's state names to comparable units"""
+
+    def __init__(self, collector: DataCollector | None = None,
+                 units: Dict[str, str] | None = None):
+        collector = collector or DataCollector()
+        self.state_name_mapping = {**collector.state_name_mapping, **HISTORICAL_STATE_NAMES}
+        self.units = BOUNDARY_UNITS if units is None else units
+
+    def unit(self, state: str) -> str:
+        """Comparison unit for a raw state name"""
+        if pd.isna(state):
+            return state
+        name = state.strip()
+        name = self.state_name_mapping.get(name, name)
+        return self.units.get(name, name)
+
+    def align(self, states: pd.Series) -> pd.Series:
+        uniques = pd.unique(states)
+        lookup = {s: self.unit(s) for s in uniques}
+        return states.map(lookup)
+
+    def wave_cube(self, df: pd.DataFrame, dimensions: List[str] | None = None,
+                  weight_col: str = 'Sample_Weight') -> AggregateCube:
+        """Aggregate one wave's household data with aligned state units"""
+        aligned = df.assign(State=self.align(df['State']))
+        return AggregateCube.from_dataframe(aligned, dimensions, weight_col)
+
+    def align_cube(self, cube: AggregateCube) -> AggregateCube:
+        """Re-key an existing cube to comparison units (cells are additive)"""
+        table = cube.table.assign(State=self.align(cube.table['State']))
+        measures = [c for c in cube.measure_columns if c in table.columns]
+        table = table.groupby(cube.dimensions, dropna=False)[measures].sum().reset_index()
+        return AggregateCube(table, cube.dimensions, cube.outcomes, cube.weighted)
+
+
+def effective_size(rolled: pd.DataFrame, weighted: bool) -> np.ndarray:
+    """Kish effective sample size per row of a rollup"""
+    if not weighted:
+        return rolled['Households'].to_numpy(dtype=float)
+    weight_sq = rolled['Weight_Sq'].to_numpy(dtype=float)
+    return np.divide(rolled['Weight'].to_numpy(dtype=float) ** 2, weight_sq,
+                     out=np.zeros(len(rolled)), where=weight_sq > 0)
+
+
+def rate_table(cube: AggregateCube, by: List[str], outcome: str = 'Online_Purchase',
+               weighted: bool | None = None) -> pd.DataFrame:
+    """Rate, standard error and sample sizes per group"""
+    weighted = cube.weighted if weighted is None else weighted
+    rolled = cube.rollup(by)
+    numerator = rolled[f'{outcome}_Weight' if weighted else outcome].to_numpy(dtype=float)
+    denominator = rolled['Weight' if weighted else 'Households'].to_numpy(dtype=float)
+    rate = np.divide(numerator, denominator, out=np.zeros(len(rolled)), where=denominator > 0)
+    n_eff = effective_size(rolled, weighted)
+    se = np.sqrt(np.divide(rate * (1 - rate), n_eff, out=np.full(len(rolled), np.nan),
+                           where=n_eff > 0))
+    table = rolled[by].copy() if by else pd.DataFrame(index=[0])
+    table['Rate'] = rate
+    table['SE'] = se
+    table['Sample_Size'] = rolled['Households'].astype(int).to_numpy()
+    table['Effective_Size'] = n_eff
+    return table
+
+
+def skew_index_se(rates: np.ndarray, variances: np.ndarray) -> tuple:
+    """
+    Category Skew Index (segment rate / mean segment rate) and its
+    delta-method standard error, for independent segment rates
+    """
+    mean = rates.mean()
+    if mean <= 0:
+        return np.ones(len(rates)), np.zeros(len(rates))
+    skew = rates / mean
+    # d skew_s / d r_j = (1[s == j] - skew_s / k) / mean
+    gradient = (np.eye(len(rates)) - skew[:, None] / len(rates)) / mean
+    return skew, np.sqrt((gradient ** 2) @ variances)
+
+
+def fit_cell_logistic(cube: AggregateCube, features: List[str] | None = None,
+                      outcome: str = 'Online_Purchase', weighted: bool = False,
+                      max_iter: int = 50, tol: float = 1e-10) -> Dict:
+    """
+    Binomial logistic regression on cube cells by IRLS
+
+    Features are on their raw scale (log-odds per extra household member,
+    for internet, for urban), so coefficients are comparable across waves.
+    weighted=False uses household counts (same MLE as unweighted household
+    data); weighted=True uses survey weights, with standard errors scaled to
+    the Kish effective sample size.
+    """
+    features = [f for f in (features or MODEL_FEATURES) if f in cube.dimensions]
+    if not features:
+        raise ValueError("The cube has none of the model features as dimensions")
+    cells = cube.rollup(features)
+    trials = cells['Weight' if weighted else 'Households'].to_numpy(dtype=float)
+    successes = cells[f'{outcome}_Weight' if weighted else outcome].to_numpy(dtype=float)
+    keep = trials > 0
+    X = np.column_stack([np.ones(keep.sum())] + [cells[f].to_numpy(dtype=float)[keep] for f in features])
+    trials, successes = trials[keep], successes[keep]
+
+    beta = np.zeros(X.shape[1])
+    for _ in range(max_iter):
+        p = 1.0 / (1.0 + np.exp(-(X @ beta)))
+        info = X.T @ (X * (trials * p * (1 - p))[:, None])
+        step = np.linalg.solve(info, X.T @ (successes - trials * p))
+        beta += step
+        if np.max(np.abs(step)) < tol:
+            break
+    p = 1.0 / (1.0 + np.exp(-(X @ beta)))
+    covariance = np.linalg.inv(X.T @ (X * (trials * p * (1 - p))[:, None]))
+    if weighted:
+        # Weights sum to the population; rescale the information to n_eff households
+        n_eff = cells['Weight'].sum() ** 2 / cells['Weight_Sq'].sum()
+        covariance *= trials.sum() / n_eff
+
+    names = ['Intercept'] + features
+    return {
+        'coefficients': dict(zip(names, beta)),
+        'standard_errors': dict(zip(names, np.sqrt(np.diag(covariance)))),
+        'covariance': covariance,
+        'features': features,
+        'n_cells': int(keep.sum())
+    }
+
+
+def _delta_columns(table: pd.DataFrame, base: str, current: str, scale: float = 1.0) -> pd.DataFrame:
+    """Add Delta, Delta_SE, Z, P_Value from the Value_<wave> / SE_<wave> columns"""
+    from scipy import stats
+
+    table['Delta'] = (table[f'Value_{current}'] - table[f'Value_{base}']) * scale
+    table['Delta_SE'] = np.sqrt(table[f'SE_{current}'] ** 2 + table[f'SE_{base}'] ** 2) * scale
+    table['Z'] = table['Delta'] / table['Delta_SE']
+    table['P_Value'] = 2 * stats.norm.sf(np.abs(table['Z']))
+    return table
+
+
+class WaveComparison:
+    """Penetration, skew and model deltas between two aligned wave cubes"""
+
+    def __init__(self, cubes: Dict[str, AggregateCube], crosswalk: WaveCrosswalk | None = None,
+                 base: str | None = None, current: str | None = None):
+        """
+        Args:
+            cubes: {wave label: cube}; cubes are re-keyed through the crosswalk
+            base / current: waves to compare (default: first and last label)
+        """
+        if len(cubes) < 2:
+            raise ValueError("Need at least two waves to compare")
+        self.crosswalk = crosswalk or WaveCrosswalk()
+        self.cubes = {wave: self.crosswalk.align_cube(cube) for wave, cube in cubes.items()}
+        waves = list(self.cubes)
+        self.base = base or waves[0]
+        self.current = current or waves[-1]
+
+    def unmatched_states(self) -> Dict[str, List[str]]:
+        """Comparison units present in only one of the two waves"""
+        base = set(self.cubes[self.base].table['State'])
+        current = set(self.cubes[self.current].table['State'])
+        return {self.base: sorted(base - current), self.current: sorted(current - base)}
+
+    def penetration_deltas(self, by: List[str] | None = None,
+                           outcome: str = 'Online_Purchase') -> pd.DataFrame:
+        """
+        Penetration change per group, in percentage points
+
+        Columns: <by>, Value_<base>, SE_<base>, Value_<current>, SE_<current>
+        (all in %), Delta, Delta_SE, Z, P_Value; groups in both waves only.
+        """
+        by = by or []
+        tables = []
+        for wave in (self.base, self.current):
+            rates = rate_table(self.cubes[wave], by, outcome)
+            tables.append(rates[by + ['Rate', 'SE', 'Sample_Size']].rename(columns={
+                'Rate': f'Value_{wave}', 'SE': f'SE_{wave}', 'Sample_Size': f'Sample_Size_{wave}'
+            }))
+        merged = tables[0].merge(tables[1], on=by, how='inner') if by else pd.concat(tables, axis=1)
+        for wave in (self.base, self.current):
+            merged[f'Value_{wave}'] *= 100
+            merged[f'SE_{wave}'] *= 100
+        return _delta_columns(merged, self.base, self.current)
+
+    def skew_deltas(self, by: str = 'HH_Type', weighted: bool = False) -> pd.DataFrame:
+        """
+        Category Skew Index change per category and segment
+
+        Skew = segment rate / mean segment rate (as HypothesisTester H2); its
+        standard error comes from the delta method over the segment rates.
+        """
+        tables = []
+        for wave in (self.base, self.current):
+            cube = self.cubes[wave]
+            rows = []
+            for cat in cube.categories:
+                rates = rate_table(cube, [by], outcome=cat, weighted=weighted)
+                skew, se = skew_index_se(rates['Rate'].to_numpy(), rates['SE'].to_numpy() ** 2)
+                rows.append(pd.DataFrame({'Category': cat, by: rates[by].to_numpy(),
+                                          f'Value_{wave}': skew, f'SE_{wave}': se}))
+            tables.append(pd.concat(rows, ignore_index=True))
+        merged = tables[0].merge(tables[1], on=['Category', by], how='inner')
+        return _delta_columns(merged, self.base, self.current)
+
+    def coefficient_deltas(self, features: List[str] | None = None,
+                           weighted: bool = False) -> pd.DataFrame:
+        """Logistic coefficient (log-odds) change per term, fitted per wave from cells"""
+        fits = {wave: fit_cell_logistic(self.cubes[wave], features, weighted=weighted)
+                for wave in (self.base, self.current)}
+        terms = [t for t in fits[self.base]['coefficients'] if t in fits[self.current]['coefficients']]
+        table = pd.DataFrame({'Term': terms})
+        for wave, fit in fits.items():
+            table[f'Value_{wave}'] = [fit['coefficients'][t] for t in terms]
+            table[f'SE_{wave}'] = [fit['standard_errors'][t] for t in terms]
+        return _delta_columns(table, self.base, self.current)
+
+    def compare(self) -> Dict[str, pd.DataFrame]:
+        """All comparisons at once"""
+        return {
+            'overall': self.penetration_deltas(),
+            'states': self.penetration_deltas(['State']),
+            'urban_rural': self.penetration_deltas(['Urban']),
+            'skew': self.skew_deltas(),
+            'model': self.coefficient_deltas(),
+            'unmatched': self.unmatched_states()
+        }
+
+
+def load_wave(path: str, crosswalk: WaveCrosswalk) -> AggregateCube:
+    """Cube for one wave from a saved cube (.pkl) or household data (file or directory)"""
+    if path.endswith('.pkl'):
+        return AggregateCube.load(path)
+    return crosswalk.wave_cube(DataCollector().load_hces_data(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare survey waves from aligned aggregates')
+    parser.add_argument('--wave', action='append', required=True, metavar='LABEL=PATH',
+                        help='Wave label and cube (.pkl) or household data; give two or more, oldest first')
+    parser.add_argument('--output-dir', default='outputs/waves')
+    args = parser.parse_args()
+
+    crosswalk = WaveCrosswalk()
+    cubes = {}
+    for spec in args.wave:
+        label, _, path = spec.partition('=')
+        if not path:
+            raise SystemExit(f"--wave must be LABEL=PATH, got {spec}")
+        cubes[label] = load_wave(path, crosswalk)
+
+    comparison = WaveComparison(cubes, crosswalk)
+    results = comparison.compare()
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, table in results.items():
+        if isinstance(table, pd.DataFrame):
+            table.to_csv(os.path.join(args.output_dir, f'{name}_deltas.csv'), index=False)
+
+    overall = results['overall'].iloc[0]
+    print(f"📊 Penetration {comparison.base} → {comparison.current}: "
+          f"{overall['Delta']:+.1f} pp (SE {overall['Delta_SE']:.1f})")
+    for wave, states in results['unmatched'].items():
+        if states:
+            print(f"⚠️  Only in {wave}: {', '.join(states)}")
+    print(f"✅ Wrote wave deltas to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()